@@ -0,0 +1,59 @@
+"""
+Micro-benchmark for loot table draws
+
+Compares the old inline ``random.choices`` draw with alias table draws, one
+at a time and batched, and checks the alias table's item frequencies.
+
+    python -m benchmarks.bench_loot [--draws N] [--tier crew]
+"""
+
+import argparse
+import random
+import time
+from collections import Counter
+
+from bot.loot import LootTables
+
+
+def report(name: str, draws: int, elapsed: float):
+    print(f"{name:<16}{draws / elapsed:>14,.0f} draws/sec  ({elapsed / draws * 1e9:.0f} ns/draw)")
+
+
+def run(draws: int, tier: str):
+    tables = LootTables()
+    tables.load()
+    table = tables.table(None, tier)
+    items, weights = table.items, table.weights
+
+    start = time.perf_counter()
+    for _ in range(draws):
+        random.choices(items, weights=weights)[0]
+    report("random.choices", draws, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(draws):
+        table.sample()
+    report("alias", draws, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    results = table.sample_many(draws)
+    report("alias batched", draws, time.perf_counter() - start)
+
+    # Observed vs configured share of each item
+    counts = Counter(results)
+    total = sum(weights)
+    print()
+    for item, weight in zip(items, weights):
+        print(f"{item:<20}{weight / total:>8.2%}{counts[item] / draws:>8.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--draws", type=int, default=1_000_000)
+    parser.add_argument("--tier", default="crew")
+    args = parser.parse_args()
+    run(args.draws, args.tier)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Micro-benchmark for the on_message hot loop
+
+Feeds synthetic messages through NoMansBot.on_message against a throwaway
+database and reports messages/sec on a single core.
+
+    python -m benchmarks.bench_on_message [--messages N] [--users N] [--backend sqlite|memory]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from bot.repository import BACKENDS, create_database
+from main import NoMansBot
+
+
+def make_messages(count: int, users: int, bot_share: float = 0.1, short_share: float = 0.2):
+    """Build a mix of chat, bot and too-short messages"""
+    guild = SimpleNamespace(id=1)
+    channel = SimpleNamespace(id=1)
+    messages = []
+    for i in range(count):
+        author = SimpleNamespace(id=1000 + i % users, bot=(i % 100) < bot_share * 100, roles=[])
+        content = "ok" if (i % 100) >= 100 - short_share * 100 else "ahoy there, matey!"
+        messages.append(SimpleNamespace(author=author, guild=guild, channel=channel, content=content))
+    return messages
+
+
+async def run(count: int, users: int, backend: str):
+    with tempfile.TemporaryDirectory() as tmp:
+        bot = NoMansBot(database=create_database(backend, os.path.join(tmp, "bench.db")))
+        await bot.database.initialize()
+        await bot.crew_index.load()
+
+        messages = make_messages(count, users)
+
+        # Pre-filter only: every author is already on cooldown
+        for message in messages:
+            bot.passive_filter.admit(message)
+        start = time.perf_counter()
+        for message in messages:
+            await bot.on_message(message)
+        elapsed = time.perf_counter() - start
+        print(f"ineligible:  {count / elapsed:>12,.0f} msgs/sec  ({elapsed / count * 1e6:.2f} us/msg)")
+
+        # Full pipeline: cooldowns cleared, so each user earns once
+        bot.passive_filter._next_eligible.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(bot.on_message(message) for message in messages))
+        elapsed = time.perf_counter() - start
+        print(f"mixed:       {count / elapsed:>12,.0f} msgs/sec  ({users} awards)")
+
+        await bot.database.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite")
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.users, args.backend))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Admission control for No Man's Bot
+
+Watches the database write queue and commit latency and sheds work by
+priority when the database falls behind:
+
+1. Elevated load: passive earnings are deferred in memory and written later
+   in one batch; once too many users are deferred they are sampled.
+2. Overloaded: read-only commands are answered from recently cached reads.
+3. Paid actions (/buy, /sell, /steal) are never shed and their writes skip
+   ahead of everything else queued for the writer.
+"""
+
+import time
+import random
+import asyncio
+import logging
+from enum import IntEnum
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from bot.utils.constants import *
+from bot.utils.metrics import Metrics
+from bot.writer import urgent_writes
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """How important a piece of work is, most important first"""
+    PAID = 0
+    INTERACTIVE = 1
+    READ_ONLY = 2
+    PASSIVE = 3
+
+
+class LoadLevel(IntEnum):
+    """How far behind the database is"""
+    NORMAL = 0
+    ELEVATED = 1
+    OVERLOADED = 2
+
+
+class AdmissionController:
+    """Decides what work to admit based on database backpressure"""
+
+    def __init__(self, database, metrics: Metrics):
+        self.database = database
+        self.metrics = metrics
+        # (guild_id, user_id) -> passive coins waiting to be written
+        self._deferred: Dict[Tuple[int, int], int] = {}
+        self._read_cache: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start writing deferred earnings in the background"""
+        self._task = asyncio.create_task(self._flush_loop(), name="admission-flush")
+
+    async def close(self):
+        """Stop the background task and write any deferred earnings"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush_deferred()
+
+    def level(self) -> LoadLevel:
+        """Current load level from the write queue depth and commit latency"""
+        depth = self.database.write_queue_depth
+        latency = self.database.write_latency
+        if depth >= ADMISSION_OVERLOADED_QUEUE_DEPTH or latency >= ADMISSION_OVERLOADED_LATENCY:
+            return LoadLevel.OVERLOADED
+        if depth >= ADMISSION_ELEVATED_QUEUE_DEPTH or latency >= ADMISSION_ELEVATED_LATENCY:
+            return LoadLevel.ELEVATED
+        return LoadLevel.NORMAL
+
+    def set_priority(self, priority: Priority):
+        """Mark the current command's work; paid actions get urgent writes"""
+        if priority == Priority.PAID:
+            urgent_writes.set(True)
+
+    def admit_passive(self, guild_id: int, user_id: int, coins: int) -> bool:
+        """Return True if a passive award should be written right away
+
+        Otherwise the award has been deferred or shed.
+        """
+        if self.level() == LoadLevel.NORMAL:
+            return True
+
+        key = (guild_id, user_id)
+        if key in self._deferred or len(self._deferred) < PASSIVE_DEFER_MAX_USERS:
+            self._deferred[key] = self._deferred.get(key, 0) + coins
+            self.metrics.inc("admission.passive_deferred")
+            return False
+
+        if random.random() < PASSIVE_SAMPLE_RATE:
+            self.metrics.inc("admission.passive_sampled")
+            return True
+        self.metrics.inc("admission.passive_shed")
+        return False
+
+    async def flush_deferred(self):
+        """Write all deferred passive earnings in one batch"""
+        if not self._deferred:
+            return
+        awards = [(guild_id, user_id, coins) for (guild_id, user_id), coins in self._deferred.items()]
+        # Awards deferred while the write is in flight start a new batch
+        self._deferred = {}
+        try:
+            await self.database.award_passive_coins_bulk(awards)
+        except Exception:
+            # Keep them for the next flush, on top of anything deferred since
+            for guild_id, user_id, coins in awards:
+                key = (guild_id, user_id)
+                self._deferred[key] = self._deferred.get(key, 0) + coins
+            raise
+        self.metrics.inc("admission.passive_flushed", len(awards))
+
+    async def _flush_loop(self):
+        """Write deferred earnings whenever the database has caught up"""
+        while True:
+            await asyncio.sleep(ADMISSION_FLUSH_INTERVAL)
+            level = self.level()
+            self.metrics.set_gauge("admission.level", int(level))
+            self.metrics.set_gauge("admission.passive_deferred_users", len(self._deferred))
+            if level == LoadLevel.NORMAL:
+                try:
+                    await self.flush_deferred()
+                except Exception as e:
+                    logger.error(f"Failed to write deferred passive earnings: {e}")
+
+    async def cached_read(self, key: Hashable, loader: Callable[[], Awaitable]):
+        """Run a read for a read-only command, or reuse a recent result when overloaded"""
+        if self.level() == LoadLevel.OVERLOADED:
+            entry = self._read_cache.get(key)
+            if entry and time.monotonic() - entry[0] <= READ_CACHE_MAX_AGE:
+                self.metrics.inc("admission.reads_from_cache")
+                return entry[1]
+
+        value = await loader()
+        self._read_cache[key] = (time.monotonic(), value)
+        self._read_cache.move_to_end(key)
+        if len(self._read_cache) > READ_CACHE_MAX_ENTRIES:
+            self._read_cache.popitem(last=False)
+        return value
@@ -0,0 +1,223 @@
+"""
+Economy analytics for No Man's Bot
+
+Exports the users, inventory and crew tables into a columnar snapshot (one
+``.npy`` file per column, written and read memory-mapped) and computes
+wealth and item aggregates over it with NumPy, covering every user rather
+than a leaderboard page.
+
+NumPy is optional (the ``analytics`` extra); without it exporting raises
+RuntimeError and the bot carries on.
+"""
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import logging
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bot.utils.constants import *
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from SQLite per chunk while exporting
+EXPORT_CHUNK_ROWS = 65536
+
+
+def gini(values) -> float:
+    """Gini coefficient of non-negative values (0 = equal, 1 = one pirate has everything)"""
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    total = values.sum()
+    if not len(values) or total <= 0:
+        return 0.0
+    ranks = np.arange(1, len(values) + 1)
+    return float((2 * ranks - len(values) - 1).dot(values) / (len(values) * total))
+
+
+def _export_table(cursor: sqlite3.Cursor, directory: str, query: str, columns: Dict[str, str], rows: int):
+    """Stream a query into one memory-mapped .npy file per column"""
+    arrays = {
+        name: np.lib.format.open_memmap(os.path.join(directory, f"{name}.npy"), mode="w+", dtype=dtype, shape=(rows,))
+        for name, dtype in columns.items()
+    }
+    cursor.execute(query)
+    offset = 0
+    while offset < rows:
+        chunk = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+        if not chunk:
+            break
+        block = np.array(chunk, dtype=np.int64).reshape(len(chunk), len(columns))
+        for i, array in enumerate(arrays.values()):
+            array[offset:offset + len(chunk)] = block[:, i]
+        offset += len(chunk)
+    for array in arrays.values():
+        array.flush()
+
+
+def export_snapshot(db_path: str, directory: str = ANALYTICS_DIR, keep: int = ANALYTICS_KEEP_SNAPSHOTS) -> str:
+    """Write a consistent columnar snapshot of the economy and return its path
+
+    Blocking; run it in a thread.
+    """
+    if np is None:
+        raise RuntimeError("Economy analytics need NumPy (pip install numpy)")
+
+    path = os.path.join(directory, f"snapshot-{time.strftime('%Y%m%d-%H%M%S')}")
+    os.makedirs(path, exist_ok=True)
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        cursor = conn.cursor()
+        # One read transaction so every table comes from the same moment
+        cursor.execute("BEGIN")
+        items = [row[0] for row in cursor.execute("SELECT DISTINCT item_name FROM inventory ORDER BY item_name")]
+        roles = cursor.execute("SELECT guild_id, role_id, role_name FROM crew_roles").fetchall()
+        counts = {
+            table: cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("users", "inventory", "crew_members")
+        }
+
+        _export_table(cursor, path, "SELECT guild_id, user_id, balance, total_earned FROM users ORDER BY guild_id, user_id",
+                      {"guild_id": "int64", "user_id": "int64", "balance": "int64", "total_earned": "int64"},
+                      counts["users"])
+
+        # Item names become codes indexing meta.json's item list
+        cursor.execute("CREATE TEMP TABLE snapshot_items (code INTEGER PRIMARY KEY, item_name TEXT UNIQUE)")
+        cursor.executemany("INSERT INTO snapshot_items VALUES (?, ?)", list(enumerate(items)))
+        _export_table(cursor, path,
+                      """SELECT i.guild_id, i.user_id, s.code, i.quantity FROM inventory i
+                         JOIN snapshot_items s ON s.item_name = i.item_name""",
+                      {"inventory_guild_id": "int64", "inventory_user_id": "int64", "inventory_item": "int32",
+                       "inventory_quantity": "int64"},
+                      counts["inventory"])
+
+        _export_table(cursor, path, "SELECT guild_id, role_id, user_id FROM crew_members",
+                      {"crew_guild_id": "int64", "crew_role_id": "int64", "crew_user_id": "int64"},
+                      counts["crew_members"])
+        conn.rollback()
+    finally:
+        conn.close()
+
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"created": time.time(), "items": items, "crew_roles": roles}, f)
+
+    # Keep only the newest snapshots
+    snapshots = sorted(name for name in os.listdir(directory) if name.startswith("snapshot-"))
+    for old in snapshots[:-keep]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+
+    logger.info(f"Exported economy snapshot of {counts['users']:,} users to {path}")
+    return path
+
+
+class Snapshot:
+    """A columnar snapshot opened memory-mapped"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.created: float = meta["created"]
+        self.items: List[str] = meta["items"]
+        # (guild_id, role_id) -> crew name
+        self.crew_names = {(guild_id, role_id): name for guild_id, role_id, name in meta["crew_roles"]}
+        self.columns = {
+            name[:-4]: np.load(os.path.join(path, name), mmap_mode="r")
+            for name in os.listdir(path) if name.endswith(".npy")
+        }
+
+    def __getitem__(self, column: str):
+        return self.columns[column]
+
+    def _guild_users(self, guild_id: Optional[int]) -> slice:
+        """Rows of one guild's users (users are sorted by guild), or every row"""
+        if guild_id is None:
+            return slice(None)
+        guilds = self["guild_id"]
+        return slice(int(np.searchsorted(guilds, guild_id, "left")), int(np.searchsorted(guilds, guild_id, "right")))
+
+    def wealth(self, guild_id: Optional[int] = None) -> dict:
+        """Balance distribution across every user, optionally in one guild"""
+        rows = self._guild_users(guild_id)
+        balance = self["balance"][rows]
+        if not len(balance):
+            return {"users": 0}
+        ordered = np.sort(balance)
+        total = int(ordered.sum())
+        top = max(1, len(ordered) // 100)
+        percentiles = np.percentile(ordered, [10, 25, 50, 75, 90, 99])
+        return {
+            "users": len(ordered),
+            "holders": int(np.count_nonzero(ordered)),
+            "total": total,
+            "total_earned": int(self["total_earned"][rows].sum()),
+            "mean": float(ordered.mean()),
+            "max": int(ordered[-1]),
+            "gini": gini(ordered),
+            "top_1_percent_share": float(ordered[-top:].sum() / total) if total else 0.0,
+            "percentiles": dict(zip((10, 25, 50, 75, 90, 99), (float(p) for p in percentiles))),
+        }
+
+    def items_held(self, guild_id: Optional[int] = None) -> Dict[str, dict]:
+        """Total quantity and holders of each item, optionally in one guild"""
+        codes = self["inventory_item"]
+        quantity = self["inventory_quantity"]
+        held = quantity > 0
+        if guild_id is not None:
+            held &= self["inventory_guild_id"] == guild_id
+        totals = np.bincount(codes[held], weights=quantity[held], minlength=len(self.items))
+        holders = np.bincount(codes[held], minlength=len(self.items))
+        return {
+            item: {"quantity": int(totals[i]), "holders": int(holders[i])}
+            for i, item in enumerate(self.items)
+        }
+
+    def crew_wealth(self, guild_id: Optional[int] = None) -> Dict[str, dict]:
+        """Members and combined balance of each crew, optionally in one guild"""
+        guilds = self["crew_guild_id"]
+        members = np.ones(len(guilds), dtype=bool) if guild_id is None else guilds == guild_id
+        roles = self["crew_role_id"][members]
+        guilds = guilds[members]
+        users = self["crew_user_id"][members]
+
+        # Users are sorted by guild then id, so each guild's balances are found
+        # by binary search within its slice
+        balances = np.zeros(len(users), dtype=np.int64)
+        for guild in np.unique(guilds):
+            rows = self._guild_users(int(guild))
+            user_ids = self["user_id"][rows]
+            in_guild = np.flatnonzero(guilds == guild)
+            positions = np.searchsorted(user_ids, users[in_guild])
+            found = positions < len(user_ids)
+            found[found] = user_ids[positions[found]] == users[in_guild][found]
+            balances[in_guild[found]] = self["balance"][rows][positions[found]]
+
+        crews = {}
+        keys, inverse = np.unique(np.stack([guilds, roles]), axis=1, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        totals = np.bincount(inverse, weights=balances, minlength=keys.shape[1])
+        counts = np.bincount(inverse, minlength=keys.shape[1])
+        for i, (guild, role) in enumerate(keys.T):
+            name = self.crew_names.get((int(guild), int(role)), str(role))
+            crews[name] = {
+                "members": int(counts[i]),
+                "total": int(totals[i]),
+                "mean": float(totals[i] / counts[i]) if counts[i] else 0.0,
+            }
+        return crews
+
+    def summary(self, guild_id: Optional[int] = None) -> dict:
+        """Everything above as plain data"""
+        return {
+            "created": self.created,
+            "wealth": self.wealth(guild_id),
+            "items": self.items_held(guild_id),
+            "crews": self.crew_wealth(guild_id),
+        }
@@ -0,0 +1,263 @@
+"""
+Read-only HTTP API for No Man's Bot
+
+Dashboards read balances, leaderboards, crew totals and economy stats as
+JSON from a small aiohttp server bound to localhost, instead of polling
+through Discord commands:
+
+    GET /api/guilds/{guild_id}/stats
+    GET /api/guilds/{guild_id}/leaderboard?page=1&per_page=25
+    GET /api/guilds/{guild_id}/crews?page=1&per_page=25
+    GET /api/guilds/{guild_id}/users/{user_id}
+
+Reads go through the same admission read cache and read connections as the
+commands, never the writer. Encoded responses are kept by the data versions
+they were built from, like rendered views, so repeated polls are a
+dictionary lookup. Passive earning changes balances on nearly every chat
+message, so a response is also served for ``API_MAX_STALENESS`` seconds
+after a write; a rebuild that encodes to the same body keeps its ETag.
+Every response carries an ETag; a matching
+``If-None-Match`` gets an empty 304. Discord IDs are sent as strings, since
+JSON numbers lose precision past 2^53.
+"""
+
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from aiohttp import web
+
+from bot.utils.constants import *
+from bot.versions import BALANCES, CREWS
+
+logger = logging.getLogger(__name__)
+
+
+class _Response(NamedTuple):
+    built_at: float
+    versions: Tuple[int, ...]
+    body: bytes
+    etag: str
+
+
+def _int_param(request: web.Request, name: str, default: int, low: int, high: int) -> int:
+    """An integer query parameter within [low, high], or 400"""
+    value = request.query.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        number = None
+    if number is None or not low <= number <= high:
+        raise web.HTTPBadRequest(
+            text=json.dumps({"error": f"{name} must be an integer from {low} to {high}"}),
+            content_type="application/json"
+        )
+    return number
+
+
+def _id_param(request: web.Request, name: str) -> int:
+    """A Discord ID path segment, or 404"""
+    try:
+        return int(request.match_info[name])
+    except ValueError:
+        raise web.HTTPNotFound(text=json.dumps({"error": f"invalid {name}"}), content_type="application/json")
+
+
+def _etag_matches(request: web.Request, etag: str) -> bool:
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ApiServer:
+    """Localhost JSON API answering from the bot's caches"""
+
+    def __init__(self, bot, host: str = API_HOST, port: int = API_PORT):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self._responses: "OrderedDict[Hashable, _Response]" = OrderedDict()
+        self._building: Dict[Tuple[Hashable, Tuple[int, ...]], "asyncio.Task[_Response]"] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.add_routes([
+            web.get("/api/guilds/{guild_id}/stats", self.stats),
+            web.get("/api/guilds/{guild_id}/leaderboard", self.leaderboard),
+            web.get("/api/guilds/{guild_id}/crews", self.crews),
+            web.get("/api/guilds/{guild_id}/users/{user_id}", self.user),
+        ])
+
+    async def start(self):
+        """Start listening; a port of 0 leaves the API off"""
+        if not self.port:
+            return
+        # No access log: at dashboard polling rates it costs more than the handlers
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"API listening on http://{self.host}:{self.port}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _respond(self, request: web.Request, key: Hashable, versions: Tuple[int, ...],
+                       build: Callable[[], Awaitable[dict]]) -> web.Response:
+        """Answer from the cached response built at these versions, building it on a miss
+
+        A response built less than ``API_MAX_STALENESS`` seconds ago is served
+        even if the data changed since.
+        """
+        entry = self._responses.get(key)
+        age = None if entry is None else time.monotonic() - entry.built_at
+        if age is None or age >= API_CACHE_TTL or (entry.versions != versions and age >= API_MAX_STALENESS):
+            self.bot.metrics.inc("api.misses")
+            # Concurrent polls of the same view share one build
+            task = self._building.get((key, versions))
+            if task is None:
+                task = self._building[(key, versions)] = asyncio.create_task(self._build(key, versions, build))
+                task.add_done_callback(lambda _: self._building.pop((key, versions), None))
+            entry = await asyncio.shield(task)
+        else:
+            self.bot.metrics.inc("api.hits")
+            self._responses.move_to_end(key)
+
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request, entry.etag):
+            self.bot.metrics.inc("api.not_modified")
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=entry.body, content_type="application/json", headers=headers)
+
+    async def _build(self, key: Hashable, versions: Tuple[int, ...], build: Callable[[], Awaitable[dict]]) -> _Response:
+        body = json.dumps(await build(), separators=(",", ":")).encode()
+        previous = self._responses.get(key)
+        if previous is not None and previous.body == body:
+            # Written to, but not in a way this view shows
+            self.bot.metrics.inc("api.reused")
+            body, etag = previous.body, previous.etag
+        else:
+            etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        entry = self._responses[key] = _Response(time.monotonic(), versions, body, etag)
+        self._responses.move_to_end(key)
+        if len(self._responses) > API_CACHE_SIZE:
+            self._responses.popitem(last=False)
+        return entry
+
+    def _page(self, request: web.Request) -> Tuple[int, int]:
+        """(page, per_page) from the query string, 1-based and bounded"""
+        per_page = _int_param(request, "per_page", API_PAGE_SIZE, 1, API_MAX_PAGE_SIZE)
+        page = _int_param(request, "page", 1, 1, API_MAX_OFFSET // per_page)
+        return page, per_page
+
+    async def stats(self, request: web.Request) -> web.Response:
+        guild_id = _id_param(request, "guild_id")
+        versions = self.bot.database.versions.snapshot((BALANCES, guild_id), (CREWS, guild_id))
+
+        async def build():
+            users, coins, earned = await self.bot.admission.cached_read(
+                ("economy_totals", guild_id), lambda: self.bot.database.get_economy_totals(guild_id))
+            guild = self.bot.get_guild(guild_id)
+            return {
+                "guild_id": str(guild_id),
+                "pirates": users,
+                "coins_in_circulation": coins,
+                "coins_earned": earned,
+                "crews": len(self.bot.crew_index.get_crew_roles(guild_id)),
+                "members": guild.member_count if guild else None,
+            }
+
+        return await self._respond(request, ("stats", guild_id), versions, build)
+
+    async def leaderboard(self, request: web.Request) -> web.Response:
+        guild_id = _id_param(request, "guild_id")
+        page, per_page = self._page(request)
+        offset = (page - 1) * per_page
+        versions = self.bot.database.versions.snapshot((BALANCES, guild_id), (CREWS, guild_id))
+
+        async def build():
+            # One extra row tells whether there is a next page
+            rows = await self.bot.admission.cached_read(
+                ("leaderboard", guild_id, per_page + 1, offset),
+                lambda: self.bot.database.get_leaderboard(guild_id, per_page + 1, offset))
+            return {
+                "page": page,
+                "per_page": per_page,
+                "has_more": len(rows) > per_page,
+                "entries": [
+                    {
+                        "rank": offset + i + 1,
+                        "user_id": str(user_id),
+                        "balance": balance,
+                        "total_earned": total_earned,
+                        "crew": self.bot.crew_index.get_user_crew(guild_id, user_id),
+                    }
+                    for i, (user_id, balance, total_earned) in enumerate(rows[:per_page])
+                ],
+            }
+
+        return await self._respond(request, ("leaderboard", guild_id, page, per_page), versions, build)
+
+    async def crews(self, request: web.Request) -> web.Response:
+        guild_id = _id_param(request, "guild_id")
+        page, per_page = self._page(request)
+        offset = (page - 1) * per_page
+        versions = self.bot.database.versions.snapshot((BALANCES, guild_id), (CREWS, guild_id))
+
+        async def build():
+            totals = await self.bot.admission.cached_read(
+                ("crew_totals", guild_id), lambda: self.bot.database.get_crew_totals(guild_id))
+            crew_roles = self.bot.crew_index.get_crew_roles(guild_id)
+            crews = sorted(
+                (row for row in totals if row[0] in crew_roles), key=lambda row: row[2], reverse=True
+            )
+            return {
+                "page": page,
+                "per_page": per_page,
+                "has_more": len(crews) > offset + per_page,
+                "entries": [
+                    {
+                        "role_id": str(role_id),
+                        "name": crew_roles[role_id],
+                        "members": members,
+                        "balance": balance,
+                        "total_earned": total_earned,
+                    }
+                    for role_id, members, balance, total_earned in crews[offset:offset + per_page]
+                ],
+            }
+
+        return await self._respond(request, ("crews", guild_id, page, per_page), versions, build)
+
+    async def user(self, request: web.Request) -> web.Response:
+        guild_id = _id_param(request, "guild_id")
+        user_id = _id_param(request, "user_id")
+        versions = self.bot.database.versions.snapshot((BALANCES, guild_id), (CREWS, guild_id))
+
+        async def build():
+            balance, total_earned = await self.bot.admission.cached_read(
+                ("user_stats", guild_id, user_id), lambda: self.bot.database.get_user_stats(guild_id, user_id))
+            rank = await self.bot.admission.cached_read(
+                ("rank", guild_id, user_id), lambda: self.bot.database.get_user_rank(guild_id, user_id))
+            return {
+                "guild_id": str(guild_id),
+                "user_id": str(user_id),
+                "balance": balance,
+                "total_earned": total_earned,
+                "rank": rank,
+                "crew": self.bot.crew_index.get_user_crew(guild_id, user_id),
+            }
+
+        return await self._respond(request, ("user", guild_id, user_id), versions, build)
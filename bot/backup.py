@@ -0,0 +1,213 @@
+"""
+Online backups for No Man's Bot
+
+Copies the live database with SQLite's backup API a few pages at a time,
+pausing between steps, while the bot keeps running. The copy reads from a
+single pinned read transaction, so it is consistent and concurrent writes
+don't restart it. Each copy is integrity-checked before it replaces the
+oldest one.
+
+    python -m bot.backup create|list|verify <file>|restore <file> [--db nomansbot.db]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import sqlite3
+import argparse
+from typing import List, Optional, Tuple
+
+from bot.utils.constants import *
+
+logger = logging.getLogger(__name__)
+
+# Tables a backup must contain to be restorable
+REQUIRED_TABLES = ("users", "inventory", "shop_items", "crew_roles")
+
+
+def copy_database(source_path: str, target_path: str, pages: int = BACKUP_PAGES_PER_STEP,
+                  pause: float = BACKUP_STEP_PAUSE, progress=None):
+    """Copy a database in steps of a few pages; blocking, run it in a thread"""
+    source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+    target = sqlite3.connect(target_path)
+    try:
+        # Pin one snapshot so writes from other connections don't restart the copy
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        source.backup(target, pages=pages, progress=progress, sleep=pause)
+        source.rollback()
+        # The copy inherits WAL mode; make it a single self-contained file
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+        source.close()
+
+
+def verify(path: str) -> Tuple[bool, str]:
+    """Check a database file's integrity and that it has the bot's tables"""
+    if not os.path.exists(path):
+        return False, f"{path} does not exist"
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        return False, str(e)
+    if result != "ok":
+        return False, f"integrity check failed: {result}"
+    missing = [table for table in REQUIRED_TABLES if table not in tables]
+    if missing:
+        return False, f"missing tables: {', '.join(missing)}"
+    return True, "ok"
+
+
+def list_backups(directory: str = BACKUP_DIR) -> List[str]:
+    """Backup files, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith("nomansbot-") and name.endswith(".db")
+    )
+
+
+def create_backup(db_path: str, directory: str = BACKUP_DIR, keep: int = BACKUP_KEEP, progress=None) -> str:
+    """Take a verified backup, prune old ones and return its path; blocking"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"nomansbot-{time.strftime('%Y%m%d-%H%M%S')}.db")
+    partial = path + ".partial"
+    try:
+        copy_database(db_path, partial, progress=progress)
+        ok, reason = verify(partial)
+        if not ok:
+            raise RuntimeError(f"Backup failed verification: {reason}")
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    for old in list_backups(directory)[:-keep]:
+        os.remove(old)
+    return path
+
+
+def restore_backup(backup_path: str, db_path: str) -> Optional[str]:
+    """Verify a backup and copy it over the database; returns where the old database was saved
+
+    Stop the bot first. The current database is backed up next to itself
+    before it is overwritten, and the result is verified again afterwards.
+    """
+    ok, reason = verify(backup_path)
+    if not ok:
+        raise RuntimeError(f"Refusing to restore {backup_path}: {reason}")
+
+    saved = f"{db_path}.pre-restore-{time.strftime('%Y%m%d-%H%M%S')}"
+    if not os.path.exists(db_path):
+        saved = None
+    else:
+        copy_database(db_path, saved)
+
+    # The backup API rewrites the target in place, keeping its WAL consistent
+    source = sqlite3.connect(f"file:{backup_path}?mode=ro", uri=True)
+    target = sqlite3.connect(db_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+    ok, reason = verify(db_path)
+    if not ok:
+        raise RuntimeError(f"Restored database failed verification ({reason}); previous copy is at {saved}")
+    return saved
+
+
+class BackupManager:
+    """Takes backups on a schedule or on demand without stopping the bot"""
+
+    def __init__(self, db_path: str, directory: str = BACKUP_DIR, keep: int = BACKUP_KEEP,
+                 interval: float = BACKUP_INTERVAL):
+        self.db_path = db_path
+        self.directory = directory
+        self.keep = keep
+        self.interval = interval
+        self.last_backup: Optional[str] = None
+        # (pages left, total pages) of the backup in progress
+        self.progress: Optional[Tuple[int, int]] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether a backup is in progress"""
+        return self._lock.locked()
+
+    def start(self):
+        """Start the scheduled backups, if an interval is configured"""
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._schedule(), name="backups")
+
+    def stop(self):
+        """Stop the scheduled backups"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _on_progress(self, status, remaining: int, total: int):
+        self.progress = (remaining, total)
+
+    async def backup(self) -> str:
+        """Take a backup now and return its path"""
+        async with self._lock:
+            started = time.monotonic()
+            try:
+                path = await asyncio.to_thread(
+                    create_backup, self.db_path, self.directory, self.keep, self._on_progress
+                )
+            finally:
+                self.progress = None
+            self.last_backup = path
+            logger.info(f"Backed up database to {path} in {time.monotonic() - started:.1f}s")
+            return path
+
+    async def _schedule(self):
+        """Back up every interval"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.backup()
+            except Exception as e:
+                logger.error(f"Scheduled backup failed: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("action", choices=("create", "list", "verify", "restore"))
+    parser.add_argument("file", nargs="?", help="backup file to verify or restore")
+    parser.add_argument("--db", default="nomansbot.db", help="live database path")
+    parser.add_argument("--dir", default=BACKUP_DIR, help="backup directory")
+    args = parser.parse_args()
+
+    if args.action == "create":
+        print(create_backup(args.db, args.dir))
+    elif args.action == "list":
+        for path in list_backups(args.dir):
+            print(f"{path}  {os.path.getsize(path):>12,} bytes")
+    elif not args.file:
+        parser.error(f"{args.action} needs a backup file")
+    elif args.action == "verify":
+        ok, reason = verify(args.file)
+        print(reason)
+        sys.exit(0 if ok else 1)
+    else:
+        saved = restore_backup(args.file, args.db)
+        print(f"Restored {args.file} into {args.db}" + (f"; previous database saved to {saved}" if saved else ""))
+
+
+if __name__ == "__main__":
+    main()
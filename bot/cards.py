@@ -0,0 +1,358 @@
+"""
+Image cards for No Man's Bot
+
+``/leaderboard`` and ``/rank`` can answer with a rendered PNG card instead
+of an embed. Drawing with Pillow is CPU-bound, so cards are rendered in a
+small process pool by the plain functions below, which take only picklable
+data and avatar file paths. Finished cards are kept in memory by the data
+versions they were rendered from, like embeds in the render cache, and
+avatars are downloaded once into a size-limited directory on disk.
+
+Pillow is optional (the ``cards`` extra); without it ``CardRenderer.available``
+is False and the commands answer with their embeds.
+"""
+
+import io
+import os
+import time
+import asyncio
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+import discord
+
+from bot.utils.constants import *
+from bot.utils.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+# Card layout, in pixels
+CARD_WIDTH = 800
+ROW_HEIGHT = 72
+HEADER_HEIGHT = 90
+PADDING = 24
+
+# Colours
+BACKGROUND = (24, 28, 38)
+ROW_BACKGROUND = (34, 40, 54)
+TEXT = (240, 240, 240)
+MUTED = (160, 168, 184)
+GOLD = (255, 184, 28)
+MEDALS = [(255, 196, 40), (200, 204, 212), (205, 127, 50)]
+ACCENT = (0xFF, 0xD7, 0x00)
+
+
+class CardRow(NamedTuple):
+    """One pirate on a leaderboard card"""
+    name: str
+    crew: str
+    balance: int
+    avatar_path: Optional[str]
+
+
+# Fonts loaded by this worker process, by size
+_fonts: Dict[int, Any] = {}
+
+
+def _font(size: int):
+    font = _fonts.get(size)
+    if font is None:
+        try:
+            font = ImageFont.load_default(size=size)
+        except TypeError:
+            # Pillow < 10.1 only has the fixed-size bitmap font
+            font = ImageFont.load_default()
+        _fonts[size] = font
+    return font
+
+
+def _avatar(path: Optional[str], size: int):
+    """A round avatar, or a plain disc if there is none"""
+    mask = Image.new("L", (size, size), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, size - 1, size - 1), fill=255)
+    image = None
+    if path:
+        try:
+            with Image.open(path) as source:
+                image = source.convert("RGBA").resize((size, size))
+        except (OSError, ValueError):
+            image = None
+    if image is None:
+        image = Image.new("RGBA", (size, size), MUTED)
+    image.putalpha(mask)
+    return image
+
+
+def _medal(draw, position: int, center: Tuple[int, int], radius: int):
+    """A medal for the top three, the plain position number below them"""
+    x, y = center
+    if position <= len(MEDALS):
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=MEDALS[position - 1])
+        draw.text((x, y), str(position), font=_font(radius), fill=BACKGROUND, anchor="mm")
+    else:
+        draw.text((x, y), f"{position}.", font=_font(radius), fill=MUTED, anchor="mm")
+
+
+def _fit(draw, text: str, font, width: int) -> str:
+    """Shorten text with an ellipsis until it fits in ``width`` pixels"""
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + "…", font=font) > width:
+        text = text[:-1]
+    return text + "…"
+
+
+def _png(image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def render_leaderboard_card(title: str, rows: List[CardRow]) -> bytes:
+    """Draw a leaderboard card as PNG bytes; runs in a worker process"""
+    height = HEADER_HEIGHT + max(len(rows), 1) * (ROW_HEIGHT + 8) + PADDING
+    image = Image.new("RGBA", (CARD_WIDTH, height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    draw.text((PADDING, HEADER_HEIGHT // 2), title, font=_font(34), fill=ACCENT, anchor="lm")
+
+    if not rows:
+        draw.text((PADDING, HEADER_HEIGHT + ROW_HEIGHT // 2), "No pirates have earned any doubloons yet!",
+                  font=_font(24), fill=MUTED, anchor="lm")
+
+    avatar_size = ROW_HEIGHT - 16
+    for i, row in enumerate(rows):
+        top = HEADER_HEIGHT + i * (ROW_HEIGHT + 8)
+        middle = top + ROW_HEIGHT // 2
+        draw.rounded_rectangle((PADDING, top, CARD_WIDTH - PADDING, top + ROW_HEIGHT), radius=12,
+                               fill=ROW_BACKGROUND)
+        _medal(draw, i + 1, (PADDING + 32, middle), 18)
+        image.alpha_composite(_avatar(row.avatar_path, avatar_size), (PADDING + 64, top + 8))
+
+        text_left = PADDING + 64 + avatar_size + 16
+        text_width = CARD_WIDTH - text_left - 200
+        draw.text((text_left, middle - 12), _fit(draw, row.name, _font(24), text_width), font=_font(24), fill=TEXT,
+                  anchor="lm")
+        draw.text((text_left, middle + 14), _fit(draw, row.crew, _font(18), text_width), font=_font(18), fill=MUTED,
+                  anchor="lm")
+        draw.text((CARD_WIDTH - PADDING - 16, middle), f"{row.balance:,}", font=_font(26), fill=GOLD,
+                  anchor="rm")
+
+    return _png(image)
+
+
+def render_rank_card(name: str, crew: str, rank: Optional[int], balance: int, total_earned: int,
+                     avatar_path: Optional[str]) -> bytes:
+    """Draw one pirate's rank card as PNG bytes; runs in a worker process"""
+    height = 220
+    image = Image.new("RGBA", (CARD_WIDTH, height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    avatar_size = height - 2 * PADDING
+    image.alpha_composite(_avatar(avatar_path, avatar_size), (PADDING, PADDING))
+
+    left = 2 * PADDING + avatar_size
+    text_width = CARD_WIDTH - left - 150
+    draw.text((left, PADDING + 20), _fit(draw, name, _font(36), text_width), font=_font(36), fill=TEXT, anchor="lm")
+    draw.text((left, PADDING + 60), _fit(draw, crew, _font(22), text_width), font=_font(22), fill=MUTED, anchor="lm")
+    draw.text((left, PADDING + 110), f"{balance:,} doubloons", font=_font(30), fill=GOLD, anchor="lm")
+    draw.text((left, PADDING + 148), f"{total_earned:,} earned in total", font=_font(20), fill=MUTED,
+              anchor="lm")
+
+    center = (CARD_WIDTH - PADDING - 56, height // 2)
+    if rank is None:
+        draw.text(center, "Unranked", font=_font(24), fill=MUTED, anchor="mm")
+    elif rank <= len(MEDALS):
+        _medal(draw, rank, center, 48)
+    else:
+        draw.text(center, f"#{rank}", font=_font(44), fill=ACCENT, anchor="mm")
+
+    return _png(image)
+
+
+class AvatarCache:
+    """Avatars downloaded once into a directory, oldest evicted past a size limit"""
+
+    def __init__(self, metrics: Metrics, directory: str = AVATAR_CACHE_DIR, max_bytes: int = AVATAR_CACHE_BYTES):
+        self.metrics = metrics
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Bytes used by the directory, counted on first use
+        self._used: Optional[int] = None
+        self._downloads: Dict[str, "asyncio.Task[Optional[str]]"] = {}
+
+    async def fetch(self, asset: Optional[discord.Asset]) -> Optional[str]:
+        """Path of a local copy of an avatar, downloading it if needed; None on failure"""
+        if asset is None:
+            return None
+        # Avatar keys are content hashes, so a changed avatar gets a new file
+        name = f"{asset.key}-{AVATAR_SIZE}.png"
+        path = os.path.join(self.directory, name)
+        if await asyncio.to_thread(self._touch, path):
+            self.metrics.inc("cards.avatar_hits")
+            return path
+
+        task = self._downloads.get(name)
+        if task is None:
+            task = self._downloads[name] = asyncio.create_task(self._download(asset, path))
+            task.add_done_callback(lambda _: self._downloads.pop(name, None))
+        return await asyncio.shield(task)
+
+    def _touch(self, path: str) -> bool:
+        """Mark a cached avatar as recently used; False if it isn't cached"""
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    async def _download(self, asset: discord.Asset, path: str) -> Optional[str]:
+        try:
+            data = await asset.with_size(AVATAR_SIZE).with_static_format("png").read()
+        except (discord.HTTPException, ValueError) as e:
+            logger.warning(f"Could not download avatar {asset.key}: {e}")
+            return None
+        if len(data) > AVATAR_MAX_BYTES:
+            self.metrics.inc("cards.avatar_too_large")
+            return None
+        self.metrics.inc("cards.avatar_downloads")
+        await asyncio.to_thread(self._store, path, data)
+        return path
+
+    def _store(self, path: str, data: bytes):
+        """Write an avatar and evict the least recently used past the limit; blocking"""
+        os.makedirs(self.directory, exist_ok=True)
+        if self._used is None:
+            self._used = sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.is_file())
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self._used += len(data)
+        if self._used > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.is_file()),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        self._used = sum(entry.stat().st_size for entry in entries)
+        # Down to 90% so one new avatar doesn't trigger another full scan
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if self._used <= target:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self._used -= size
+            self.metrics.inc("cards.avatar_evictions")
+
+
+class _Card(NamedTuple):
+    rendered_at: float
+    versions: Tuple[int, ...]
+    data: Any
+    png: bytes
+
+
+class CardRenderer:
+    """Renders image cards in a process pool and keeps them by data version"""
+
+    def __init__(self, metrics: Metrics, workers: int = CARD_WORKERS, max_entries: int = CARD_CACHE_SIZE,
+                 ttl: float = CARD_CACHE_TTL):
+        self.metrics = metrics
+        self.workers = workers
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.avatars = AvatarCache(metrics)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cache: "OrderedDict[Hashable, _Card]" = OrderedDict()
+        # Renders in progress, so a burst of requests for one card renders it once
+        self._rendering: Dict[Tuple[Hashable, Tuple[int, ...]], "asyncio.Future[bytes]"] = {}
+
+    @property
+    def available(self) -> bool:
+        """Whether cards can be rendered: Pillow is installed and workers are enabled"""
+        return Image is not None and self.workers > 0
+
+    def get(self, key: Hashable, versions: Tuple[int, ...], data: Any = None) -> Optional[bytes]:
+        """A cached card rendered at these versions, or from equal ``data``"""
+        entry = self._cache.get(key)
+        if entry is None or time.monotonic() - entry.rendered_at >= self.ttl:
+            return None
+        if entry.versions != versions:
+            if data is None or entry.data != data:
+                return None
+            self._cache[key] = entry._replace(versions=versions)
+        self._cache.move_to_end(key)
+        self.metrics.inc("cards.hits")
+        return entry.png
+
+    async def render(self, key: Hashable, versions: Tuple[int, ...], data: Any, func, *args) -> Optional[bytes]:
+        """Render a card with ``func(*args)`` in the pool and keep it under ``key``
+
+        Returns None if rendering failed or took too long; callers answer with
+        their embed instead.
+        """
+        if not self.available:
+            raise RuntimeError("Image cards need Pillow; install the 'cards' extra")
+        pending = self._rendering.get((key, versions))
+        if pending is None:
+            pending = self._rendering[(key, versions)] = asyncio.create_task(
+                self._render(key, versions, data, func, args)
+            )
+            pending.add_done_callback(lambda _: self._rendering.pop((key, versions), None))
+        return await asyncio.shield(pending)
+
+    async def _render(self, key: Hashable, versions: Tuple[int, ...], data: Any, func, args) -> Optional[bytes]:
+        if self._pool is None:
+            # Spawned, not forked: the bot process has threads running
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        pool = self._pool
+        started = time.monotonic()
+        try:
+            png = await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(pool, func, *args), CARD_RENDER_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            self.metrics.inc("cards.timeouts")
+            logger.warning(f"Rendering card {key} took over {CARD_RENDER_TIMEOUT}s")
+            return None
+        except BrokenProcessPool as e:
+            # A worker died; the next card starts a fresh pool
+            self.metrics.inc("cards.failures")
+            logger.error(f"Card worker pool broke: {e}")
+            if self._pool is pool:
+                self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            return None
+        except Exception as e:
+            self.metrics.inc("cards.failures")
+            logger.error(f"Rendering card {key} failed: {e}")
+            return None
+        self.metrics.inc("cards.renders")
+        self.metrics.observe("cards.render_seconds", time.monotonic() - started)
+
+        self._cache[key] = _Card(time.monotonic(), versions, data, png)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return png
+
+    def close(self):
+        """Stop the worker processes, abandoning queued renders"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
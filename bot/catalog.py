@@ -0,0 +1,107 @@
+"""
+Shop catalogue index for No Man's Bot
+
+The shop never changes while the bot runs, so it is loaded into memory once
+and indexed by every prefix of each item's name and of each word in it.
+Autocomplete answers from the index (falling back to fuzzy matching for
+typos) and commands resolve what was typed to a catalogue item without a
+database round trip. Commands that can't be undone, like /sell and /use,
+only accept an item's exact name.
+"""
+
+import difflib
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from bot.utils.constants import *
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogItem(NamedTuple):
+    """One shop item"""
+    name: str
+    item_type: str
+    price: int
+    crew_required: int
+    description: str
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class ItemCatalog:
+    """Shop items in memory, with a prefix index and fuzzy fallback"""
+
+    def __init__(self):
+        # Normalized name -> item, in shop order
+        self._items: Dict[str, CatalogItem] = {}
+        # Prefix of a name -> names starting with it
+        self._names: Dict[str, List[str]] = {}
+        # Prefix of any word -> names with a word starting with it
+        self._words: Dict[str, List[str]] = {}
+
+    def load(self, items: Iterable[tuple]):
+        """Index (item_name, item_type, price, crew_required, description) rows"""
+        self._items.clear()
+        self._names.clear()
+        self._words.clear()
+        for row in items:
+            item = CatalogItem(*row)
+            key = _normalize(item.name)
+            self._items[key] = item
+            for end in range(1, len(key) + 1):
+                self._names.setdefault(key[:end], []).append(item.name)
+            for word in key.split()[1:]:
+                for end in range(1, len(word) + 1):
+                    self._words.setdefault(word[:end], []).append(item.name)
+        logger.info(f"Indexed {len(self._items)} shop item(s)")
+
+    def get(self, name: str) -> Optional[CatalogItem]:
+        """The item with exactly this name, ignoring case and spacing"""
+        return self._items.get(_normalize(name))
+
+    def resolve(self, name: str) -> Optional[CatalogItem]:
+        """The item a user meant: an exact name, or the only name it's a prefix of
+
+        Only for actions a user can take back, like buying or equipping; use
+        ``get`` where acting on the wrong item would be permanent.
+        """
+        item = self.get(name)
+        if item:
+            return item
+        matches = self._names.get(_normalize(name), [])
+        if len(matches) == 1:
+            return self._items[_normalize(matches[0])]
+        return None
+
+    def complete(self, query: str, allowed: Optional[Iterable[str]] = None,
+                 limit: int = AUTOCOMPLETE_MAX_CHOICES) -> List[str]:
+        """Item names for a partial query, best first, optionally limited to ``allowed``"""
+        allowed = None if allowed is None else set(allowed)
+        query = _normalize(query)
+        if not query:
+            candidates = [item.name for item in self._items.values()]
+        else:
+            candidates = self._names.get(query, []) + self._words.get(query, [])
+            if len(candidates) < limit:
+                # Typos: closest whole names
+                close = difflib.get_close_matches(query, self._items.keys(), n=limit,
+                                                  cutoff=AUTOCOMPLETE_FUZZY_CUTOFF)
+                candidates += [self._items[key].name for key in close]
+
+        names = []
+        for name in candidates:
+            if name not in names and (allowed is None or name in allowed):
+                names.append(name)
+                if len(names) == limit:
+                    break
+        return names
+
+    def names(self, item_type: Optional[str] = None, crew: bool = True) -> List[str]:
+        """Item names, optionally of one type and without crew items"""
+        return [
+            item.name for item in self._items.values()
+            if (item_type is None or item.item_type == item_type) and (crew or not item.crew_required)
+        ]
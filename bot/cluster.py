@@ -0,0 +1,468 @@
+"""
+Clustered deployment for No Man's Bot
+
+One writer process owns the SQLite file and applies every write it receives
+over a local Unix socket. Worker processes each run a sharded bot for their
+own shard range, read straight from the SQLite file and cache the hot,
+slowly-changing tables locally. Interaction workers, if any, serve slash
+commands over HTTP (``bot/interactions.py``) the same way.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import multiprocessing
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import discord
+
+from bot.database import Database
+from bot.effects import EffectCache
+from bot.writer import urgent_writes
+from bot.utils.constants import *
+
+logger = logging.getLogger(__name__)
+
+
+class WriterServer:
+    """Applies write queries sent by worker processes to the database"""
+
+    def __init__(self, database: Database, socket_path: str = CLUSTER_SOCKET_PATH):
+        self.database = database
+        self.socket_path = socket_path
+        self._server = None
+        # Requests being applied; the loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self):
+        """Start listening on the Unix socket"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(
+            self._handle_client, path=self.socket_path, limit=2 ** 20
+        )
+        logger.info(f"Database writer listening on {self.socket_path}")
+
+    async def serve_forever(self):
+        """Start the server and run until cancelled"""
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one worker connection
+
+        Each request is a ``<id> <length>`` header line followed by that many
+        bytes of JSON, so bulk writes of any size stay one atomic request.
+        Responses go back one JSON object per line. A bad body gets an error
+        response, but a bad header closes the connection: there's no telling
+        where the next request starts, and closing fails the worker's
+        pending writes instead of leaving them waiting.
+        """
+        # This connection's requests still being applied
+        requests: Set[asyncio.Task] = set()
+        try:
+            while True:
+                try:
+                    header = await reader.readline()
+                except ValueError as e:
+                    # Longer than the stream limit
+                    logger.error(f"Closing a worker connection after an oversize request header: {e}")
+                    break
+                if not header:
+                    break
+                try:
+                    request_id, size = map(int, header.split())
+                except ValueError:
+                    logger.error(f"Closing a worker connection after a malformed request header: {header[:80]!r}")
+                    break
+
+                if size > CLUSTER_MAX_REQUEST_BYTES:
+                    await self._discard(reader, size)
+                    self._send(writer, {"id": request_id, "error": f"Request of {size:,} bytes is over the "
+                                                                   f"{CLUSTER_MAX_REQUEST_BYTES:,} byte limit"})
+                    continue
+                body = await reader.readexactly(size)
+                try:
+                    request = json.loads(body)
+                    if not isinstance(request, dict):
+                        raise ValueError("expected a JSON object")
+                except ValueError as e:
+                    self._send(writer, {"id": request_id, "error": f"Malformed request: {e}"})
+                    continue
+                request["id"] = request_id
+
+                # Tasks start in arrival order, so writes from one worker stay ordered
+                task = asyncio.create_task(self._apply(request, writer))
+                for tasks in (self._tasks, requests):
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            # Answer the requests already read before hanging up
+            if requests:
+                await asyncio.wait(requests)
+            writer.close()
+
+    @staticmethod
+    async def _discard(reader: asyncio.StreamReader, size: int):
+        """Skip a request body without holding it in memory"""
+        while size > 0:
+            chunk = await reader.readexactly(min(size, 2 ** 20))
+            size -= len(chunk)
+
+    @staticmethod
+    def _send(writer: asyncio.StreamWriter, response: dict):
+        if not writer.is_closing():
+            writer.write(json.dumps(response).encode() + b"\n")
+
+    async def _apply(self, request: dict, writer: asyncio.StreamWriter):
+        """Apply one atomic group of statements and send the row counts back"""
+        response = {"id": request.get("id")}
+        urgent_writes.set(request.get("urgent", False))
+        try:
+            statements = [
+                (query, [tuple(row) for row in params] if many else tuple(params))
+                for query, params, many in request["statements"]
+            ]
+            response["result"] = await self.database._execute_many(statements)
+        except Exception as e:
+            response["error"] = str(e)
+        self._send(writer, response)
+
+
+class RemoteDatabase(Database):
+    """Database used by worker processes
+
+    Reads run against a local pool of read-only connections to the SQLite
+    file and writes are forwarded to the writer process.
+    """
+
+    def __init__(self, db_path: str = "nomansbot.db", socket_path: str = CLUSTER_SOCKET_PATH,
+                 cache_ttl: float = CLUSTER_CACHE_TTL, effect_ttl: float = EFFECT_CACHE_TTL):
+        super().__init__(db_path)
+        # Other processes' item changes don't invalidate this one's modifiers
+        self.effects = EffectCache(self, ttl=effect_ttl, suggestion_ttl=EFFECT_CACHE_TTL)
+        self.socket_path = socket_path
+        self.cache_ttl = cache_ttl
+        self._cache: Dict[tuple, tuple] = {}
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._connect_lock = asyncio.Lock()
+        self._write_latency = 0.0
+
+    async def initialize(self):
+        """Wait for the writer process to finish migrating and connect to it"""
+        deadline = time.monotonic() + CLUSTER_CONNECT_TIMEOUT
+        while True:
+            # The socket may not exist yet, or be left over from a previous run
+            try:
+                await self._connect()
+                break
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Database writer at {self.socket_path} never came up") from e
+                await asyncio.sleep(0.1)
+        await self._read_pool.start()
+        logger.info(f"Connected to database writer at {self.socket_path}")
+
+    async def close(self):
+        """Close the connection to the writer process and the read pool"""
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        await self._read_pool.close()
+
+    @property
+    def write_queue_depth(self) -> int:
+        """Number of writes sent to the writer and not yet acknowledged"""
+        return len(self._pending)
+
+    @property
+    def write_latency(self) -> float:
+        """Moving average of write round trips to the writer, in seconds"""
+        return self._write_latency
+
+    async def _connect(self):
+        """Open the connection to the writer process"""
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            self._reader, self._writer = await asyncio.open_unix_connection(
+                self.socket_path, limit=2 ** 20
+            )
+            self._reader_task = asyncio.create_task(self._read_responses())
+
+    async def _read_responses(self):
+        """Resolve pending write futures as responses arrive"""
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self._pending.pop(response["id"], None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(sqlite3.OperationalError(response["error"]))
+                else:
+                    future.set_result(response["result"])
+        finally:
+            # Fail anything still in flight so callers don't hang forever
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Lost connection to database writer"))
+            self._pending.clear()
+            self._writer = None
+
+    async def _execute_query(self, query: str, params: tuple = (), fetch: bool = False):
+        """Read locally, forward writes to the writer process"""
+        if fetch:
+            return await super()._execute_query(query, params, fetch=True)
+
+        results = await self._execute_many([(query, params)])
+        return results[0]
+
+    async def _execute_many(self, statements: List[Tuple[str, tuple]]) -> List[int]:
+        """Send statements to the writer process and wait until they are durable"""
+        body = json.dumps({"statements": [
+            [query, list(params), isinstance(params, list)] for query, params in statements
+        ], "urgent": urgent_writes.get()}).encode()
+        if len(body) > CLUSTER_MAX_REQUEST_BYTES:
+            raise ValueError(f"Write of {len(body):,} bytes is over the {CLUSTER_MAX_REQUEST_BYTES:,} byte limit")
+
+        if self._writer is None or self._writer.is_closing():
+            await self._connect()
+
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        started = time.perf_counter()
+        try:
+            self._writer.write(f"{request_id} {len(body)}\n".encode() + body)
+            await self._writer.drain()
+            result = await asyncio.wait_for(future, CLUSTER_WRITE_TIMEOUT)
+        finally:
+            self._pending.pop(request_id, None)
+        self._write_latency = 0.8 * self._write_latency + 0.2 * (time.perf_counter() - started)
+        return result
+
+    async def _cached(self, key: tuple, loader: Callable):
+        """Return a cached read, reloading it once it is older than the TTL"""
+        entry = self._cache.get(key)
+        now = time.monotonic()
+        if entry and now - entry[0] < self.cache_ttl:
+            return entry[1]
+        value = await loader()
+        self._cache[key] = (now, value)
+        return value
+
+    def _invalidate(self, *keys: tuple):
+        """Drop cached reads after a local write touched them"""
+        for key in keys:
+            self._cache.pop(key, None)
+
+    async def get_crew_roles(self, guild_id: int) -> List[int]:
+        """Get list of crew role IDs for a guild (cached)"""
+        return await self._cached(("crew_roles", guild_id), lambda: super(RemoteDatabase, self).get_crew_roles(guild_id))
+
+    async def get_crew_roles_with_names(self, guild_id: int):
+        """Get crew roles with their names (cached)"""
+        return await self._cached(("crew_roles_with_names", guild_id), lambda: super(RemoteDatabase, self).get_crew_roles_with_names(guild_id))
+
+    async def get_shop_items(self, crew_required: int = None):
+        """Get shop items (cached)"""
+        return await self._cached(("shop_items", crew_required), lambda: super(RemoteDatabase, self).get_shop_items(crew_required))
+
+    async def get_item_info(self, item_name: str):
+        """Get information about a specific item (cached)"""
+        return await self._cached(("item_info", item_name), lambda: super(RemoteDatabase, self).get_item_info(item_name))
+
+    async def add_crew_role(self, guild_id: int, role_id: int, role_name: str, captain_role_id: int = None, first_mate_role_id: int = None):
+        """Add a crew role and drop the cached roles for the guild"""
+        await super().add_crew_role(guild_id, role_id, role_name, captain_role_id, first_mate_role_id)
+        self._invalidate(("crew_roles", guild_id), ("crew_roles_with_names", guild_id))
+
+    async def remove_crew_role(self, guild_id: int, role_id: int):
+        """Remove a crew role and drop the cached roles for the guild"""
+        await super().remove_crew_role(guild_id, role_id)
+        self._invalidate(("crew_roles", guild_id), ("crew_roles_with_names", guild_id))
+
+
+def _split_shards(shard_count: int, workers: int) -> List[List[int]]:
+    """Split shard IDs into contiguous ranges, one per worker"""
+    workers = max(1, min(workers, shard_count))
+    per_worker, extra = divmod(shard_count, workers)
+    ranges = []
+    start = 0
+    for i in range(workers):
+        size = per_worker + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+async def _recommended_shard_count(token: str) -> int:
+    """Ask Discord how many shards the bot should run"""
+    http = discord.http.HTTPClient(None)
+    try:
+        await http.static_login(token)
+        shards, _, _ = await http.get_bot_gateway()
+        return shards
+    finally:
+        await http.close()
+
+
+def _writer_main(db_path: str, socket_path: str):
+    """Entry point of the database writer process"""
+    logging.basicConfig(level=logging.INFO, format="[writer] %(levelname)s:%(name)s:%(message)s")
+
+    async def run():
+        # Workers retry until the writer listens; a previous run's socket
+        # would have them connect before migrations finish
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        database = Database(db_path)
+        await database.initialize()
+        await WriterServer(database, socket_path).serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def _worker_main(bot_factory: Callable, token: str, cluster_id: int, shard_ids: List[int],
+                 shard_count: int, db_path: str, socket_path: str):
+    """Entry point of a worker process running one shard range"""
+    logging.basicConfig(level=logging.INFO, format=f"[cluster {cluster_id}] %(levelname)s:%(name)s:%(message)s")
+
+    async def run():
+        bot = bot_factory(
+            database=RemoteDatabase(db_path, socket_path),
+            shard_ids=shard_ids,
+            shard_count=shard_count,
+            cluster_id=cluster_id,
+        )
+        try:
+            await bot.start(token)
+        finally:
+            await bot.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def _interactions_main(bot_factory: Callable, token: Optional[str], worker_id: int, db_path: str,
+                       socket_path: str):
+    """Entry point of a worker process serving the HTTP interactions endpoint"""
+    logging.basicConfig(level=logging.INFO,
+                        format=f"[interactions {worker_id}] %(levelname)s:%(name)s:%(message)s")
+
+    async def run():
+        # No gateway, so no member cache either; any worker may change any
+        # user's items, so compiled modifiers are barely trusted
+        bot = bot_factory(
+            database=RemoteDatabase(db_path, socket_path, effect_ttl=INTERACTIONS_EFFECT_CACHE_TTL),
+            cluster_id=worker_id,
+            low_memory=True,
+            http_interactions=True,
+        )
+        try:
+            if token:
+                await bot.login(token)
+            else:
+                # Local load tests: nothing that needs Discord's REST API will work
+                bot._connection.user = discord.ClientUser(state=bot._connection, data={
+                    "id": "1", "username": "No Man's Bot", "discriminator": "0", "avatar": None, "bot": True
+                })
+                await bot._async_setup_hook()
+                await bot.setup_hook()
+            await bot.interactions.serve_forever()
+        finally:
+            await bot.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def run_cluster(bot_factory: Callable, token: Optional[str], workers: int, shard_count: Optional[int] = None,
+                db_path: str = "nomansbot.db", socket_path: str = CLUSTER_SOCKET_PATH,
+                interaction_workers: int = 0):
+    """Run the writer, the gateway workers and any interaction workers on this machine
+
+    Blocks until interrupted, restarting any process that dies.
+    """
+    shard_ranges = []
+    if workers > 0:
+        if not shard_count:
+            shard_count = asyncio.run(_recommended_shard_count(token))
+        shard_ranges = _split_shards(shard_count, workers)
+    logger.info(f"Starting {len(shard_ranges)} worker(s) for {shard_count or 0} shard(s) "
+                f"and {interaction_workers} interaction worker(s)")
+
+    ctx = multiprocessing.get_context("fork")
+
+    def start_writer():
+        process = ctx.Process(target=_writer_main, args=(db_path, socket_path), name="nmb-writer")
+        process.start()
+        return process
+
+    def start_worker(cluster_id: int):
+        process = ctx.Process(
+            target=_worker_main,
+            args=(bot_factory, token, cluster_id, shard_ranges[cluster_id], shard_count, db_path, socket_path),
+            name=f"nmb-cluster-{cluster_id}",
+        )
+        process.start()
+        return process
+
+    def start_interactions(worker_id: int):
+        process = ctx.Process(
+            target=_interactions_main,
+            args=(bot_factory, token, worker_id, db_path, socket_path),
+            name=f"nmb-interactions-{worker_id}",
+        )
+        process.start()
+        return process
+
+    writer = start_writer()
+    workers_by_id = {i: start_worker(i) for i in range(len(shard_ranges))}
+    interactions_by_id = {i: start_interactions(i) for i in range(interaction_workers)}
+
+    try:
+        while True:
+            time.sleep(5)
+            if not writer.is_alive():
+                logger.error("Database writer died, restarting it")
+                writer = start_writer()
+            for cluster_id, process in list(workers_by_id.items()):
+                if not process.is_alive():
+                    logger.error(f"Cluster {cluster_id} died (exit code {process.exitcode}), restarting it")
+                    workers_by_id[cluster_id] = start_worker(cluster_id)
+            for worker_id, process in list(interactions_by_id.items()):
+                if not process.is_alive():
+                    logger.error(f"Interaction worker {worker_id} died (exit code {process.exitcode}), restarting it")
+                    interactions_by_id[worker_id] = start_interactions(worker_id)
+    except KeyboardInterrupt:
+        logger.info("Shutting down cluster")
+    finally:
+        processes = list(workers_by_id.values()) + list(interactions_by_id.values()) + [writer]
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(timeout=10)
@@ -1,16 +1,28 @@
+import os
+import re
+import time
+import asyncio
+import threading
 import discord
 from discord.ext import commands
 from discord import app_commands
+from typing import List
 from bot.utils.constants import *
+from bot.utils.helpers import format_coins
+from bot.analytics import Snapshot, export_snapshot
+from bot.utils.profiler import SamplingProfiler
+from bot.tree import defer_response, send_response
+from bot.versions import CREWS
 
 class AdminCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self._profiling = False
     
     def is_admin():
         """Check if user has administrator permissions"""
         def predicate(interaction: discord.Interaction) -> bool:
-            return interaction.user.guild_permissions.administrator
+            return interaction.permissions.administrator
         return app_commands.check(predicate)
     
     @app_commands.command(name="crew_roles", description="View all configured crew roles")
@@ -18,7 +30,20 @@ class AdminCommands(commands.Cog):
     async def view_crew_roles(self, interaction: discord.Interaction):
         """View all crew roles"""
         guild_id = interaction.guild.id
-        crew_roles = await self.bot.database.get_crew_roles_with_names(guild_id)
+        
+        # Rendered once per change to this server's crews
+        key = ("crew_roster", guild_id)
+        versions = self.bot.render.versions.snapshot((CREWS, guild_id))
+        embed = self.bot.render.get(key, versions)
+        if embed is None:
+            embed = await self._render_crew_roles(interaction.guild)
+            self.bot.render.put(key, versions, embed)
+        
+        await send_response(interaction, embed=embed)
+    
+    async def _render_crew_roles(self, guild: discord.Guild) -> discord.Embed:
+        """Build the crew roster embed of a guild"""
+        crew_roles = await self.bot.database.get_crew_roles_with_names(guild.id)
         
         embed = discord.Embed(
             title="🏴‍☠️ Crew Roles Configuration",
@@ -30,7 +55,7 @@ class AdminCommands(commands.Cog):
         else:
             role_list = []
             for role_id, role_name in crew_roles:
-                role = interaction.guild.get_role(role_id)
+                role = guild.get_role(role_id)
                 if role:
                     role_list.append(f"• {role.mention} (`{role_id}`)")
                 else:
@@ -40,7 +65,7 @@ class AdminCommands(commands.Cog):
         
         embed.set_footer(text=f"Total crew roles: {len(crew_roles)}")
         
-        await interaction.response.send_message(embed=embed)
+        return embed
     
     @app_commands.command(name="add_crew_role", description="Add a crew role with captain and first mate")
     @app_commands.describe(
@@ -61,11 +86,12 @@ class AdminCommands(commands.Cog):
                 description=f"{crew_role.mention} be already registered as a crew role, cap'n!",
                 color=ERROR_COLOR
             )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await send_response(interaction, embed=embed, ephemeral=True)
             return
         
         # Add the crew role with hierarchy
         await self.bot.database.add_crew_role(guild_id, crew_role.id, crew_role.name, captain_role.id, first_mate_role.id)
+        self.bot.crew_index.add_crew_role(interaction.guild, crew_role.id, crew_role.name)
         
         embed = discord.Embed(
             title="✅ Crew Added to Fleet!",
@@ -79,7 +105,7 @@ class AdminCommands(commands.Cog):
         )
         embed.set_footer(text="Crew members will now earn bonus doubloons and access to exclusive items!")
         
-        await interaction.response.send_message(embed=embed)
+        await send_response(interaction, embed=embed)
     
     @app_commands.command(name="remove_crew_role", description="Remove a role from crew roles")
     @app_commands.describe(role="The role to remove from crew roles")
@@ -96,11 +122,12 @@ class AdminCommands(commands.Cog):
                 description=f"{role.mention} ain't registered as a crew role, cap'n!",
                 color=ERROR_COLOR
             )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await send_response(interaction, embed=embed, ephemeral=True)
             return
         
         # Remove the crew role
         await self.bot.database.remove_crew_role(guild_id, role.id)
+        self.bot.crew_index.remove_crew_role(guild_id, role.id)
         
         embed = discord.Embed(
             title="✅ Crew Role Removed!",
@@ -114,7 +141,7 @@ class AdminCommands(commands.Cog):
         )
         embed.set_footer(text="Members with this role will no longer earn bonus doubloons.")
         
-        await interaction.response.send_message(embed=embed)
+        await send_response(interaction, embed=embed)
     
     @app_commands.command(name="give_coins", description="Give doubloons to a user")
     @app_commands.describe(
@@ -130,21 +157,21 @@ class AdminCommands(commands.Cog):
                 description="Amount must be positive, ye scallywag!",
                 color=ERROR_COLOR
             )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await send_response(interaction, embed=embed, ephemeral=True)
             return
         
-        if amount > 1000000:  # Reasonable limit
+        if amount > MAX_GRANT_AMOUNT:  # Reasonable limit
             embed = discord.Embed(
                 title="⚠️ Too Much Treasure!",
-                description="That be too much treasure for one grant, cap'n! (Max: 1,000,000)",
+                description=f"That be too much treasure for one grant, cap'n! (Max: {MAX_GRANT_AMOUNT:,})",
                 color=ERROR_COLOR
             )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await send_response(interaction, embed=embed, ephemeral=True)
             return
         
-        # Give coins
-        await self.bot.database.add_coins(user.id, amount)
-        new_balance = await self.bot.database.get_user_balance(user.id)
+        # Give coins; a grant isn't the recipient's own activity
+        await self.bot.database.adjust_balances(interaction.guild.id, [user.id], "grant", amount)
+        new_balance = await self.bot.database.get_user_balance(interaction.guild.id, user.id)
         
         embed = discord.Embed(
             title="💰 Treasure Granted!",
@@ -158,20 +185,139 @@ class AdminCommands(commands.Cog):
         )
         embed.set_footer(text=f"Granted by {interaction.user.display_name}")
         
-        await interaction.response.send_message(embed=embed)
+        await send_response(interaction, embed=embed)
+    
+    @app_commands.command(name="bulk_coins", description="Grant, deduct or set doubloons for a whole role, crew or ID list")
+    @app_commands.describe(
+        action="What to do to each pirate's balance",
+        amount="Doubloons to grant or deduct, or the balance to set",
+        role="Every member of this role (or crew)",
+        ids="A text file of user IDs, one per line",
+        dry_run="Preview the change without applying it"
+    )
+    @app_commands.choices(action=[
+        app_commands.Choice(name="Grant", value="grant"),
+        app_commands.Choice(name="Deduct", value="deduct"),
+        app_commands.Choice(name="Set", value="set"),
+    ])
+    @is_admin()
+    async def bulk_coins(self, interaction: discord.Interaction, action: app_commands.Choice[str],
+                         amount: app_commands.Range[int, 0, MAX_GRANT_AMOUNT],
+                         role: discord.Role = None, ids: discord.Attachment = None, dry_run: bool = False):
+        """Adjust many balances in one transaction (admin only)"""
+        if (role is None) == (ids is None):
+            embed = discord.Embed(
+                title="⚠️ Pick Yer Targets",
+                description="Give either a role or an ID list, cap'n - one or the other!",
+                color=ERROR_COLOR
+            )
+            await send_response(interaction, embed=embed, ephemeral=True)
+            return
+        
+        if amount == 0 and action.value != "set":
+            embed = discord.Embed(
+                title="⚠️ Invalid Amount",
+                description="Amount must be positive, ye scallywag!",
+                color=ERROR_COLOR
+            )
+            await send_response(interaction, embed=embed, ephemeral=True)
+            return
+        
+        await defer_response(interaction)
+        
+        # Resolve targets
+        if ids is not None:
+            if ids.size > BULK_ID_FILE_MAX_BYTES:
+                await interaction.followup.send(
+                    f"❌ That list be too heavy (max {BULK_ID_FILE_MAX_BYTES // 1024 // 1024} MB).")
+                return
+            text = (await ids.read()).decode("utf-8", errors="ignore")
+            user_ids = sorted({int(match) for match in re.findall(r"\b\d{15,20}\b", text)})
+            target = f"`{ids.filename}`"
+        else:
+            user_ids = await self._role_member_ids(interaction, role)
+            target = role.mention
+        
+        if not user_ids:
+            await interaction.followup.send(f"🏝️ No pirates found in {target}.")
+            return
+        
+        # Preview from current balances
+        balances = await self.bot.database.get_balances(interaction.guild.id, user_ids)
+        before = sum(balances.values())
+        if action.value == "grant":
+            after = before + amount * len(user_ids)
+        elif action.value == "deduct":
+            after = sum(max(balance - amount, 0) for balance in balances.values())
+        else:
+            after = amount * len(user_ids)
+        
+        embed = discord.Embed(
+            title="🧾 Bulk Adjustment Preview" if dry_run else "💰 Bulk Adjustment Applied",
+            description=f"**{action.name}** {format_coins(amount)} for **{len(user_ids):,}** pirates in {target}",
+            color=EMBED_COLOR if dry_run else SUCCESS_COLOR
+        )
+        embed.add_field(
+            name="📊 Balances",
+            value=f"**Before:** {format_coins(before)}\n**After:** {format_coins(after)}\n"
+                  f"**Change:** {after - before:+,}",
+            inline=True
+        )
+        embed.add_field(
+            name="👥 Pirates",
+            value=f"**Known:** {len(balances):,}\n**New:** {len(user_ids) - len(balances):,}",
+            inline=True
+        )
+        embed.add_field(
+            name="🔎 First Few",
+            value="\n".join(f"<@{user_id}>: {balances.get(user_id, 0):,}" for user_id in user_ids[:BULK_PREVIEW_USERS]),
+            inline=False
+        )
+        
+        if not dry_run:
+            await interaction.edit_original_response(content=f"⏳ Applying to {len(user_ids):,} pirates...")
+            await self.bot.database.adjust_balances(interaction.guild.id, user_ids, action.value, amount)
+            embed.set_footer(text=f"Applied in one transaction by {interaction.user.display_name}")
+        else:
+            embed.set_footer(text="Dry run - nothin' was changed. Run again without dry_run to apply.")
+        
+        await interaction.edit_original_response(content=None, embed=embed)
+    
+    async def _role_member_ids(self, interaction: discord.Interaction, role: discord.Role) -> List[int]:
+        """User IDs holding a role, reporting progress while large guilds are scanned"""
+        guild = interaction.guild
+        if role.id in self.bot.crew_index.get_crew_roles(guild.id):
+            # Crews are indexed, offline members included
+            return await self.bot.database.get_crew_role_members(guild.id, role.id)
+        if not self.bot.low_memory:
+            return [member.id for member in role.members]
+        
+        # Members aren't cached in low-memory mode, so stream the guild
+        user_ids = []
+        scanned = 0
+        last_update = time.monotonic()
+        async for member in guild.fetch_members(limit=None):
+            scanned += 1
+            if role in member.roles:
+                user_ids.append(member.id)
+            if time.monotonic() - last_update >= BULK_PROGRESS_INTERVAL:
+                last_update = time.monotonic()
+                await interaction.edit_original_response(
+                    content=f"⏳ Scanned {scanned:,} of ~{guild.member_count or 0:,} members, "
+                            f"{len(user_ids):,} with {role.name}...")
+        return user_ids
     
     @app_commands.command(name="stats", description="View bot statistics")
     @is_admin()
     async def stats(self, interaction: discord.Interaction):
         """View bot statistics"""
-        # Get leaderboard to count active users
-        leaderboard = await self.bot.database.get_leaderboard(1000)  # Get up to 1000 users
+        guild_id = interaction.guild.id
         
-        total_users = len(leaderboard)
-        total_coins = sum(user[1] for user in leaderboard)  # Sum all balances
-        total_earned = sum(user[2] for user in leaderboard)  # Sum total earned
+        # Totals over this server's whole economy
+        total_users, total_coins, total_earned = await self.bot.admission.cached_read(
+            ("economy_totals", guild_id), lambda: self.bot.database.get_economy_totals(guild_id))
         
-        crew_roles = await self.bot.database.get_crew_roles_with_names(interaction.guild.id)
+        crew_roles = await self.bot.database.get_crew_roles_with_names(guild_id)
         
         embed = discord.Embed(
             title="📊 No Man's Bot Statistics",
@@ -210,7 +356,239 @@ class AdminCommands(commands.Cog):
         
         embed.set_footer(text="These be the numbers, cap'n!")
         
-        await interaction.response.send_message(embed=embed)
+        await send_response(interaction, embed=embed)
+    
+    @app_commands.command(name="economy", description="Analyze wealth and items across this server's pirates")
+    @is_admin()
+    async def economy(self, interaction: discord.Interaction):
+        """Export a columnar snapshot and report wealth, items and crews"""
+        if not self.bot.database.db_path:
+            await send_response(interaction, embed=self._needs_sqlite("Economy analytics"), ephemeral=True)
+            return
+        
+        await defer_response(interaction)
+        
+        def analyze():
+            path = export_snapshot(self.bot.database.db_path)
+            return Snapshot(path).summary(interaction.guild.id)
+        
+        try:
+            summary = await asyncio.to_thread(analyze)
+        except RuntimeError as e:
+            embed = discord.Embed(
+                title="❌ Analytics Unavailable",
+                description=str(e),
+                color=ERROR_COLOR
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+        
+        wealth = summary["wealth"]
+        embed = discord.Embed(
+            title="📜 State of the Seas",
+            description=f"Across all **{wealth['users']:,}** pirates in this server",
+            color=EMBED_COLOR
+        )
+        
+        if wealth["users"]:
+            percentiles = wealth["percentiles"]
+            embed.add_field(
+                name="💰 Wealth",
+                value=f"**In circulation:** {format_coins(wealth['total'])}\n"
+                      f"**Ever earned:** {format_coins(wealth['total_earned'])}\n"
+                      f"**Mean:** {format_coins(int(wealth['mean']))}\n"
+                      f"**Richest:** {format_coins(wealth['max'])}",
+                inline=True
+            )
+            embed.add_field(
+                name="⚖️ Inequality",
+                value=f"**Gini:** {wealth['gini']:.3f}\n"
+                      f"**Top 1% hold:** {wealth['top_1_percent_share']:.1%}\n"
+                      f"**Pirates with coins:** {wealth['holders']:,}",
+                inline=True
+            )
+            embed.add_field(
+                name="📊 Percentiles",
+                value="\n".join(f"**p{q}:** {format_coins(int(v))}" for q, v in percentiles.items()),
+                inline=True
+            )
+        
+        items = sorted(summary["items"].items(), key=lambda item: item[1]["quantity"], reverse=True)
+        if items:
+            embed.add_field(
+                name="📦 Items Held",
+                value="\n".join(
+                    f"**{name}:** {held['quantity']:,} ({held['holders']:,} pirates)" for name, held in items[:10]
+                ),
+                inline=False
+            )
+        
+        crews = sorted(summary["crews"].items(), key=lambda crew: crew[1]["total"], reverse=True)
+        if crews:
+            embed.add_field(
+                name="🏴‍☠️ Crew Wealth",
+                value="\n".join(
+                    f"**{name}:** {format_coins(crew['total'])} across {crew['members']:,} members"
+                    for name, crew in crews[:10]
+                ),
+                inline=False
+            )
+        
+        embed.set_footer(text=f"Snapshot kept in {ANALYTICS_DIR}/")
+        
+        await interaction.followup.send(embed=embed)
+    
+    @app_commands.command(name="backup", description="Back up the database now")
+    @is_admin()
+    async def backup(self, interaction: discord.Interaction):
+        """Take an online backup of the database"""
+        if not self.bot.database.db_path:
+            await send_response(interaction, embed=self._needs_sqlite("Backups"), ephemeral=True)
+            return
+        
+        backups = self.bot.backups
+        if backups.running:
+            progress = backups.progress
+            done = f" ({1 - progress[0] / progress[1]:.0%} copied)" if progress and progress[1] else ""
+            embed = discord.Embed(
+                title="⏳ Backup Underway",
+                description=f"A backup is already bein' taken{done}. Try again when it's done, matey!",
+                color=WARNING_COLOR
+            )
+            await send_response(interaction, embed=embed, ephemeral=True)
+            return
+        
+        await defer_response(interaction)
+        started = time.monotonic()
+        try:
+            path = await backups.backup()
+        except Exception as e:
+            embed = discord.Embed(
+                title="❌ Backup Failed",
+                description=f"The backup couldn't be taken: {e}",
+                color=ERROR_COLOR
+            )
+            await interaction.followup.send(embed=embed)
+            return
+        
+        embed = discord.Embed(
+            title="💾 Database Backed Up",
+            description=f"Stowed a verified copy of the ship's ledger in `{path}`.",
+            color=SUCCESS_COLOR
+        )
+        embed.add_field(name="📦 Size", value=f"{os.path.getsize(path) / 1024 / 1024:.1f} MB", inline=True)
+        embed.add_field(name="⏱️ Took", value=f"{time.monotonic() - started:.1f}s", inline=True)
+        embed.set_footer(text=f"The newest {backups.keep} backups are kept. Restore with: python -m bot.backup restore <file>")
+        
+        await interaction.followup.send(embed=embed)
+    
+    def _needs_sqlite(self, feature: str) -> discord.Embed:
+        """Explain that a feature reads the SQLite file the memory backend doesn't have"""
+        return discord.Embed(
+            title="❌ No Ledger on Disk",
+            description=f"{feature} need the SQLite storage backend; this ship keeps its books in memory.",
+            color=ERROR_COLOR
+        )
+    
+    @app_commands.command(name="profile", description="Profile the bot for a few seconds")
+    @app_commands.describe(seconds="How long to profile for")
+    @is_admin()
+    async def profile(self, interaction: discord.Interaction, seconds: app_commands.Range[int, 1, MAX_PROFILE_SECONDS] = 10):
+        """Sample the event loop for a while and report the hot spots"""
+        if self._profiling:
+            embed = discord.Embed(
+                title="⚠️ Already Profilin'",
+                description="A profile be already runnin', cap'n! Wait for it to finish.",
+                color=WARNING_COLOR
+            )
+            await send_response(interaction, embed=embed, ephemeral=True)
+            return
+        
+        await defer_response(interaction)
+        
+        # Commands run on the event loop thread, so that's the one to sample;
+        # its executor threads (SQLite reads and commits) are sampled alongside
+        self._profiling = True
+        profiler = SamplingProfiler(threading.get_ident())
+        try:
+            profiler.start()
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+            self._profiling = False
+        
+        path = await asyncio.to_thread(profiler.write)
+        summary = profiler.summary()
+        samples = max(profiler.samples, 1)
+        
+        def format_rows(rows):
+            lines = [f"`{count * 100 / samples:5.1f}%` {name[:60]}" for name, count in rows]
+            return "\n".join(lines) or "No samples"
+        
+        embed = discord.Embed(
+            title="🔬 Profile Complete",
+            description=f"Sampled the event loop **{profiler.samples:,}** times over {profiler.duration:.1f}s.",
+            color=EMBED_COLOR
+        )
+        embed.add_field(name="🗺️ Time by Area", value=format_rows(summary["areas"]), inline=False)
+        embed.add_field(name="⚙️ Executor Threads (% of one thread)", value=format_rows(summary["worker_areas"]),
+                        inline=False)
+        embed.add_field(name="🔥 Hot Functions", value=format_rows(summary["functions"]), inline=False)
+        embed.add_field(name="🧵 Hot Coroutines", value=format_rows(summary["coroutines"]), inline=False)
+        embed.set_footer(text="Collapsed stacks attached - feed them to a flame graph tool")
+        
+        await interaction.followup.send(embed=embed, file=discord.File(path))
+    
+    @app_commands.command(name="metrics", description="View event loop and performance metrics")
+    @is_admin()
+    async def metrics(self, interaction: discord.Interaction):
+        """View event loop lag and other metrics"""
+        snapshot = self.bot.metrics.snapshot()
+        lag = snapshot["histograms"].get("event_loop.lag_seconds")
+        
+        embed = discord.Embed(
+            title="📈 Ship's Log",
+            color=EMBED_COLOR
+        )
+        
+        if lag:
+            embed.add_field(
+                name="⏱️ Event Loop Lag",
+                value=f"**p50:** {lag['p50'] * 1000:.1f} ms\n**p95:** {lag['p95'] * 1000:.1f} ms\n"
+                      f"**p99:** {lag['p99'] * 1000:.1f} ms\n**Max:** {lag['max'] * 1000:.1f} ms",
+                inline=True
+            )
+        
+        embed.add_field(
+            name="🚦 Database Load",
+            value=f"**Level:** {self.bot.admission.level().name.title()}\n"
+                  f"**Queued writes:** {self.bot.database.write_queue_depth:,}\n"
+                  f"**Commit time:** {self.bot.database.write_latency * 1000:.1f} ms",
+            inline=True
+        )
+        
+        stalls = self.bot.watchdog.recent_stalls
+        if stalls:
+            embed.add_field(
+                name="🧊 Recent Stalls",
+                value="\n".join(
+                    f"{duration * 1000:.0f} ms in {f'/{command}' if command else '*no command*'}"
+                    for duration, command, _ in list(stalls)[-5:]
+                ),
+                inline=True
+            )
+        
+        counters = snapshot["counters"]
+        if counters:
+            embed.add_field(
+                name="🔢 Counters",
+                value="\n".join(f"`{name}`: {value:,}" for name, value in sorted(counters.items()))[:1024],
+                inline=False
+            )
+        
+        embed.set_footer(text="Stall stacks are written to the logs")
+        
+        await send_response(interaction, embed=embed)
     
     async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
         """Handle command errors"""
@@ -220,11 +598,11 @@ class AdminCommands(commands.Cog):
                 description="Ye need administrator permissions to use this command, matey!",
                 color=ERROR_COLOR
             )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await send_response(interaction, embed=embed, ephemeral=True)
         else:
             embed = discord.Embed(
                 title="❌ Command Error",
                 description="Something went wrong, cap'n! Check the logs.",
                 color=ERROR_COLOR
             )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await send_response(interaction, embed=embed, ephemeral=True)
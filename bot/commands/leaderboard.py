@@ -1,57 +1,105 @@
+import io
+import asyncio
 import discord
 from discord.ext import commands
 from discord import app_commands
+from bot.cards import CardRow, render_leaderboard_card, render_rank_card
 from bot.utils.constants import *
 from bot.utils.helpers import get_user_crew, format_coins
+from bot.tree import send_response
+from bot.versions import BALANCES, CREWS
 
 class LeaderboardCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
     
     @app_commands.command(name="leaderboard", description="View the top pirates and their crews! 🏆")
-    async def leaderboard(self, interaction: discord.Interaction):
+    @app_commands.describe(card="Show the leaderboard as an image card")
+    async def leaderboard(self, interaction: discord.Interaction, card: bool = False):
         """Display the leaderboard"""
-        # Get top 10 users
-        leaderboard_data = await self.bot.database.get_leaderboard(10)
+        guild_id = interaction.guild.id
         
-        if not leaderboard_data:
-            embed = discord.Embed(
-                title="🏆 Pirate Leaderboard",
-                description="No pirates have earned any doubloons yet!\n\nBe the first to claim yer treasure!",
-                color=EMBED_COLOR
-            )
-            await interaction.response.send_message(embed=embed)
-            return
+        # Reuse the last render until this server's balances or crews change
+        key = ("leaderboard", guild_id, 10)
+        versions = self.bot.render.versions.snapshot((BALANCES, guild_id), (CREWS, guild_id))
+        if card and self.bot.cards.available:
+            if await self._send_leaderboard_card(interaction, key, versions):
+                return
         
-        # Get crew roles for this guild
-        crew_roles = await self.bot.database.get_crew_roles(interaction.guild.id)
+        embed = self.bot.render.get(key, versions)
+        if embed is None:
+            # Get this server's top 10 users
+            leaderboard_data = await self.bot.admission.cached_read(
+                ("leaderboard", guild_id, 10), lambda: self.bot.database.get_leaderboard(guild_id, 10))
+            
+            # Most balance changes don't touch the top 10
+            data = (leaderboard_data, versions[-1])
+            embed = self.bot.render.reuse(key, versions, data)
+            if embed is None:
+                embed = await self._render_leaderboard(interaction, leaderboard_data)
+                self.bot.render.put(key, versions, embed, data)
         
-        embed = discord.Embed(
-            title="🏆 Top Pirates of the Seven Seas",
-            description="The most legendary pirates and their crews:",
-            color=EMBED_COLOR
-        )
+        await send_response(interaction, embed=embed)
+    
+    async def _leaderboard_entries(self, interaction: discord.Interaction, leaderboard_data) -> list:
+        """(user or None, display name, crew name, balance) for (user_id, balance, total_earned) rows"""
+        guild_id = interaction.guild.id
         
-        medal_emojis = ["🥇", "🥈", "🥉"]
+        # Get crew roles for this guild
+        crew_roles = await self.bot.database.get_crew_roles(guild_id)
         
-        leaderboard_text = []
+        # Without a member cache, request just these members from the gateway
+        fetched_members = {}
+        if self.bot.low_memory and not self.bot.http_interactions:
+            members = await interaction.guild.query_members(
+                user_ids=[row[0] for row in leaderboard_data], cache=False
+            )
+            fetched_members = {member.id: member for member in members}
         
-        for i, (user_id, balance, total_earned) in enumerate(leaderboard_data):
+        entries = []
+        for user_id, balance, total_earned in leaderboard_data:
             # Try to get the user from the guild
-            user = interaction.guild.get_member(user_id)
+            user = interaction.guild.get_member(user_id) or fetched_members.get(user_id)
             if not user:
                 # If user not in guild, try to fetch from bot
                 try:
                     user = await self.bot.fetch_user(user_id)
                     display_name = user.name
-                    user_crew_name = "*Unknown*"
+                    user_crew_name = self.bot.crew_index.get_user_crew(guild_id, user_id) or "*Unknown*"
                 except:
+                    user = None
                     display_name = f"Unknown User ({user_id})"
                     user_crew_name = "*Unknown*"
             else:
                 display_name = user.display_name
                 user_crew_name = get_user_crew(user, crew_roles) or "*Lone Wolf*"
             
+            entries.append((user, display_name, user_crew_name, balance))
+        
+        return entries
+    
+    async def _render_leaderboard(self, interaction: discord.Interaction, leaderboard_data) -> discord.Embed:
+        """Build the leaderboard embed from (user_id, balance, total_earned) rows"""
+        if not leaderboard_data:
+            embed = discord.Embed(
+                title="🏆 Pirate Leaderboard",
+                description="No pirates have earned any doubloons yet!\n\nBe the first to claim yer treasure!",
+                color=EMBED_COLOR
+            )
+            return embed
+        
+        embed = discord.Embed(
+            title="🏆 Top Pirates of the Seven Seas",
+            description="The most legendary pirates and their crews:",
+            color=EMBED_COLOR
+        )
+        
+        medal_emojis = ["🥇", "🥈", "🥉"]
+        
+        leaderboard_text = []
+        
+        entries = await self._leaderboard_entries(interaction, leaderboard_data)
+        for i, (user, display_name, user_crew_name, balance) in enumerate(entries):
             # Get position emoji
             if i < 3:
                 position_emoji = medal_emojis[i]
@@ -79,16 +127,56 @@ class LeaderboardCommands(commands.Cog):
         embed.set_footer(text="Keep earnin' to climb the ranks, matey! ⚓")
         embed.set_thumbnail(url="https://cdn.jsdelivr.net/gh/twitter/twemoji@latest/assets/svg/1f3c6.svg")
         
-        await interaction.response.send_message(embed=embed)
+        return embed
     
-    @app_commands.command(name="rank", description="Check yer rank among all pirates! 📊")
-    async def rank(self, interaction: discord.Interaction, user: discord.Member = None):
+    async def _send_leaderboard_card(self, interaction: discord.Interaction, key, versions) -> bool:
+        """Answer with the leaderboard drawn as an image, rendered off the event loop
+
+        Returns False without answering if the card couldn't be rendered.
+        """
+        guild_id = interaction.guild.id
+        
+        png = self.bot.cards.get(key, versions)
+        if png is None:
+            leaderboard_data = await self.bot.admission.cached_read(
+                ("leaderboard", guild_id, 10), lambda: self.bot.database.get_leaderboard(guild_id, 10))
+            
+            data = (leaderboard_data, versions[-1])
+            png = self.bot.cards.get(key, versions, data)
+            if png is None:
+                entries = await self._leaderboard_entries(interaction, leaderboard_data)
+                avatar_paths = await asyncio.gather(*(
+                    self.bot.cards.avatars.fetch(user.display_avatar if user else None) for user, *_ in entries
+                ))
+                rows = [
+                    CardRow(display_name, crew_name.strip("*"), balance, avatar_path)
+                    for (user, display_name, crew_name, balance), avatar_path in zip(entries, avatar_paths)
+                ]
+                png = await self.bot.cards.render(key, versions, data, render_leaderboard_card,
+                                                  f"Top Pirates of {interaction.guild.name or 'the Seven Seas'}", rows)
+                if png is None:
+                    return False
+        
+        await self._send_card(interaction, png, "leaderboard.png", "🏆 Top Pirates of the Seven Seas")
+        return True
+    
+    async def _send_card(self, interaction: discord.Interaction, png: bytes, filename: str, title: str):
+        """Send a rendered card as an attachment shown inside an embed"""
+        embed = discord.Embed(title=title, color=EMBED_COLOR)
+        embed.set_image(url=f"attachment://{filename}")
+        await send_response(interaction, embed=embed, file=discord.File(io.BytesIO(png), filename=filename))
+    
+    @app_commands.command(name="rank", description="Check yer rank among this server's pirates! 📊")
+    @app_commands.describe(user="Pirate to check (defaults to you)", card="Show the rank as an image card")
+    async def rank(self, interaction: discord.Interaction, user: discord.Member = None, card: bool = False):
         """Check user's rank"""
+        guild_id = interaction.guild.id
         target_user = user or interaction.user
         user_id = target_user.id
         
         # Get user's balance
-        balance, total_earned = await self.bot.database.get_user_stats(user_id)
+        balance, total_earned = await self.bot.admission.cached_read(
+            ("user_stats", guild_id, user_id), lambda: self.bot.database.get_user_stats(guild_id, user_id))
         
         if balance == 0:
             embed = discord.Embed(
@@ -96,25 +184,36 @@ class LeaderboardCommands(commands.Cog):
                 description=f"{target_user.display_name} hasn't earned any doubloons yet!\n\nStart earnin' to get a rank!",
                 color=EMBED_COLOR
             )
-            await interaction.response.send_message(embed=embed)
+            await send_response(interaction, embed=embed)
             return
         
-        # Get full leaderboard to find rank
-        full_leaderboard = await self.bot.database.get_leaderboard(1000)
-        
-        user_rank = None
-        for i, (lb_user_id, lb_balance, _) in enumerate(full_leaderboard):
-            if lb_user_id == user_id:
-                user_rank = i + 1
-                break
+        # Count the richer pirates in this server from the balance index
+        user_rank = await self.bot.admission.cached_read(
+            ("rank", guild_id, user_id), lambda: self.bot.database.get_user_rank(guild_id, user_id))
         
         if user_rank is None:
             user_rank = "Unranked"
         
         # Get crew info
-        crew_roles = await self.bot.database.get_crew_roles(interaction.guild.id)
+        crew_roles = await self.bot.database.get_crew_roles(guild_id)
         user_crew = get_user_crew(target_user, crew_roles)
         
+        if card and self.bot.cards.available:
+            key = ("rank", guild_id, user_id)
+            versions = self.bot.render.versions.snapshot((BALANCES, guild_id), (CREWS, guild_id))
+            data = (target_user.display_name, target_user.display_avatar.key, user_crew, user_rank, balance,
+                    total_earned)
+            png = self.bot.cards.get(key, versions, data)
+            if png is None:
+                avatar_path = await self.bot.cards.avatars.fetch(target_user.display_avatar)
+                png = await self.bot.cards.render(
+                    key, versions, data, render_rank_card, target_user.display_name, user_crew or "Lone Wolf",
+                    user_rank if isinstance(user_rank, int) else None, balance, total_earned, avatar_path
+                )
+            if png is not None:
+                await self._send_card(interaction, png, "rank.png", f"📊 {target_user.display_name}'s Pirate Rank")
+                return
+        
         embed = discord.Embed(
             title=f"📊 {target_user.display_name}'s Pirate Rank",
             color=EMBED_COLOR
@@ -171,4 +270,4 @@ class LeaderboardCommands(commands.Cog):
         embed.set_thumbnail(url=target_user.display_avatar.url)
         embed.set_footer(text="Keep earnin' to climb the ranks!")
         
-        await interaction.response.send_message(embed=embed)
+        await send_response(interaction, embed=embed)
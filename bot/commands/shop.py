@@ -2,7 +2,9 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from bot.utils.constants import *
-from bot.utils.helpers import get_user_crew, format_coins
+from bot.utils.helpers import get_user_crew, format_coins, inventory_choices
+from bot.admission import Priority
+from bot.tree import send_response
 
 
 class ShopCommands(commands.Cog):
@@ -19,6 +21,23 @@ class ShopCommands(commands.Cog):
         user_crew = get_user_crew(interaction.user, crew_roles)
         is_crew_member = user_crew is not None
 
+        # The catalogue only changes on restart, so each variant renders once
+        key = ("shop", is_crew_member)
+        versions = self.bot.render.versions.snapshot()
+        embed = self.bot.render.get(key, versions)
+        if embed is None:
+            embed = await self._render_shop(is_crew_member)
+            self.bot.render.put(key, versions, embed)
+
+        if is_crew_member:
+            embed.set_footer(text=f"Crew Member: {user_crew}")
+        else:
+            embed.set_footer(text="Join a crew for exclusive items!")
+
+        await send_response(interaction, embed=embed)
+
+    async def _render_shop(self, is_crew_member: bool) -> discord.Embed:
+        """Build the shop embed for crew members or everyone else"""
         # Get shop items
         regular_items = await self.bot.database.get_shop_items(
             0)  # Non-crew items
@@ -85,12 +104,7 @@ class ShopCommands(commands.Cog):
                         value="Use `/buy <item_name>` to purchase items!",
                         inline=False)
 
-        if is_crew_member:
-            embed.set_footer(text=f"Crew Member: {user_crew}")
-        else:
-            embed.set_footer(text="Join a crew for exclusive items!")
-
-        await interaction.response.send_message(embed=embed)
+        return embed
 
     @app_commands.command(name="buy",
                           description="Buy an item from the shop! 💰")
@@ -101,7 +115,9 @@ class ShopCommands(commands.Cog):
                        item: str,
                        quantity: int = 1):
         """Buy an item from the shop"""
+        guild_id = interaction.guild.id
         user_id = interaction.user.id
+        self.bot.admission.set_priority(Priority.PAID)
 
         if quantity <= 0:
             embed = discord.Embed(
@@ -109,8 +125,8 @@ class ShopCommands(commands.Cog):
                 description=
                 "Ye can't buy nothin' or negative items, ye scallywag!",
                 color=ERROR_COLOR)
-            await interaction.response.send_message(embed=embed,
-                                                    ephemeral=True)
+            await send_response(interaction, embed=embed,
+                                ephemeral=True)
             return
 
         if quantity > 50:
@@ -119,84 +135,108 @@ class ShopCommands(commands.Cog):
                 description=
                 "Ye can't buy more than 50 of an item at once, matey!",
                 color=ERROR_COLOR)
-            await interaction.response.send_message(embed=embed,
-                                                    ephemeral=True)
+            await send_response(interaction, embed=embed,
+                                ephemeral=True)
             return
 
         # Get item info
-        item_info = await self.bot.database.get_item_info(item)
+        item_info = self.bot.catalog.resolve(item)
         if not item_info:
+            self.bot.metrics.inc("commands.unknown_item")
             embed = discord.Embed(
                 title="❌ Item Not Found",
                 description=
                 f"**{item}** doesn't exist in our shop! Check `/shop` for available items.",
                 color=ERROR_COLOR)
-            await interaction.response.send_message(embed=embed,
-                                                    ephemeral=True)
+            await send_response(interaction, embed=embed,
+                                ephemeral=True)
             return
 
-        item_type, price, crew_required, description = item_info
-        total_cost = price * quantity
-
-        # Check crew requirement
-        if crew_required:
-            crew_roles = await self.bot.database.get_crew_roles(
-                interaction.guild.id)
-            user_crew = get_user_crew(interaction.user, crew_roles)
+        item, item_type, price, crew_required, description = item_info
+
+        async with self.bot.database.user_locks.acquire(user_id):
+            total_cost = price * quantity
+
+            # Check crew requirement
+            if crew_required:
+                crew_roles = await self.bot.database.get_crew_roles(guild_id)
+                user_crew = get_user_crew(interaction.user, crew_roles)
+
+                if not user_crew:
+                    embed = discord.Embed(
+                        title="🔒 Crew Required",
+                        description=
+                        f"**{item}** is only available to crew members! Join a crew first.",
+                        color=ERROR_COLOR)
+                    await send_response(interaction, embed=embed,
+                                        ephemeral=True)
+                    return
+
+            # Check user's balance
+            user_balance = await self.bot.database.get_user_balance(guild_id, user_id)
+            if user_balance < total_cost:
+                embed = discord.Embed(
+                    title="💸 Insufficient Funds",
+                    description=
+                    f"Ye need {format_coins(total_cost)} but only have {format_coins(user_balance)}!",
+                    color=ERROR_COLOR)
+                await send_response(interaction, embed=embed,
+                                    ephemeral=True)
+                return
 
-            if not user_crew:
+            # Process purchase; the writer re-checks the balance, which another
+            # interaction worker may have spent since we read it
+            if not await self.bot.database.buy_item(guild_id, user_id, item, quantity, total_cost):
+                user_balance = await self.bot.database.get_user_balance(guild_id, user_id)
                 embed = discord.Embed(
-                    title="🔒 Crew Required",
+                    title="💸 Insufficient Funds",
                     description=
-                    f"**{item}** is only available to crew members! Join a crew first.",
+                    f"Ye need {format_coins(total_cost)} but only have {format_coins(user_balance)}!",
                     color=ERROR_COLOR)
-                await interaction.response.send_message(embed=embed,
-                                                        ephemeral=True)
+                await send_response(interaction, embed=embed,
+                                    ephemeral=True)
                 return
 
-        # Check user's balance
-        user_balance = await self.bot.database.get_user_balance(user_id)
-        if user_balance < total_cost:
+            new_balance = await self.bot.database.get_user_balance(guild_id, user_id)
+
             embed = discord.Embed(
-                title="💸 Insufficient Funds",
+                title="✅ Purchase Successful!",
                 description=
-                f"Ye need {format_coins(total_cost)} but only have {format_coins(user_balance)}!",
-                color=ERROR_COLOR)
-            await interaction.response.send_message(embed=embed,
-                                                    ephemeral=True)
-            return
-
-        # Process purchase
-        await self.bot.database.add_coins(user_id, -total_cost)  # Remove coins
-        await self.bot.database.add_to_inventory(user_id, item,
-                                                 quantity)  # Add items
-
-        new_balance = await self.bot.database.get_user_balance(user_id)
-
-        embed = discord.Embed(
-            title="✅ Purchase Successful!",
-            description=
-            f"Ye bought **{quantity}x {item}** for {format_coins(total_cost)}!",
-            color=SUCCESS_COLOR)
-
-        embed.add_field(name="📦 Item Info",
-                        value=f"*{description}*",
-                        inline=False)
+                f"Ye bought **{quantity}x {item}** for {format_coins(total_cost)}!",
+                color=SUCCESS_COLOR)
 
-        embed.add_field(name="💰 Remaining Balance",
-                        value=format_coins(new_balance),
-                        inline=True)
+            embed.add_field(name="📦 Item Info",
+                            value=f"*{description}*",
+                            inline=False)
 
-        if item_type == "weapon":
-            embed.add_field(name="💡 Tip",
-                            value="Use `/equip` to equip this weapon!",
-                            inline=True)
-        elif item_type == "consumable" and item in ["Compass", "Spyglass"]:
-            embed.add_field(name="💡 Tip",
-                            value="Use `/use` to activate this item!",
+            embed.add_field(name="💰 Remaining Balance",
+                            value=format_coins(new_balance),
                             inline=True)
 
-        await interaction.response.send_message(embed=embed)
+            if item_type == "weapon":
+                embed.add_field(name="💡 Tip",
+                                value="Use `/equip` to equip this weapon!",
+                                inline=True)
+            elif item_type == "consumable" and item in ["Compass", "Spyglass"]:
+                embed.add_field(name="💡 Tip",
+                                value="Use `/use` to activate this item!",
+                                inline=True)
+
+            await send_response(interaction, embed=embed)
+
+    @buy_item.autocomplete("item")
+    async def buy_item_autocomplete(self, interaction: discord.Interaction,
+                                    current: str):
+        """Suggest shop items the user can buy, from memory"""
+        crew_roles = self.bot.crew_index.get_crew_roles(interaction.guild_id)
+        is_crew_member = get_user_crew(interaction.user, crew_roles) is not None
+        names = self.bot.catalog.complete(
+            current, self.bot.catalog.names(crew=is_crew_member))
+        return [
+            app_commands.Choice(
+                name=f"{name} ({self.bot.catalog.get(name).price:,} doubloons)",
+                value=name) for name in names
+        ]
 
     @app_commands.command(
         name="sell", description="Sell items for half their shop price! 💸")
@@ -207,66 +247,85 @@ class ShopCommands(commands.Cog):
                         item: str,
                         quantity: int = 1):
         """Sell an item for half shop price"""
+        guild_id = interaction.guild.id
         user_id = interaction.user.id
+        self.bot.admission.set_priority(Priority.PAID)
 
         if quantity <= 0:
             embed = discord.Embed(
                 title="❌ Invalid Quantity",
                 description="Ye can't sell nothin' or negative items!",
                 color=ERROR_COLOR)
-            await interaction.response.send_message(embed=embed,
-                                                    ephemeral=True)
+            await send_response(interaction, embed=embed,
+                                ephemeral=True)
             return
 
-        # Check if user has the item
-        inventory = await self.bot.database.get_user_inventory(user_id)
-        inventory_dict = dict(inventory)
-
-        if item not in inventory_dict or inventory_dict[item] < quantity:
-            available = inventory_dict.get(item, 0)
-            embed = discord.Embed(
-                title="❌ Not Enough Items",
-                description=
-                f"Ye only have {available}x **{item}** but want to sell {quantity}!",
-                color=ERROR_COLOR)
-            await interaction.response.send_message(embed=embed,
-                                                    ephemeral=True)
-            return
-
-        # Get item info for pricing
-        item_info = await self.bot.database.get_item_info(item)
+        # Get item info for pricing; selling can't be undone, so only an exact name will do
+        item_info = self.bot.catalog.get(item)
         if not item_info:
+            self.bot.metrics.inc("commands.unknown_item")
             embed = discord.Embed(
                 title="❌ Unknown Item",
                 description=f"**{item}** is not a valid shop item!",
                 color=ERROR_COLOR)
-            await interaction.response.send_message(embed=embed,
-                                                    ephemeral=True)
+            await send_response(interaction, embed=embed,
+                                ephemeral=True)
             return
 
-        item_type, shop_price, crew_required, description = item_info
-        sell_price = shop_price // 2  # Half of shop price
-        total_earned = sell_price * quantity
+        item, item_type, shop_price, crew_required, description = item_info
 
-        # Process sale
-        await self.bot.database.remove_from_inventory(user_id, item, quantity)
-        await self.bot.database.add_coins(user_id, total_earned)
+        async with self.bot.database.user_locks.acquire(user_id):
+            # Check if user has the item
+            inventory = await self.bot.database.get_user_inventory(guild_id, user_id)
+            inventory_dict = dict(inventory)
 
-        new_balance = await self.bot.database.get_user_balance(user_id)
+            if item not in inventory_dict or inventory_dict[item] < quantity:
+                available = inventory_dict.get(item, 0)
+                embed = discord.Embed(
+                    title="❌ Not Enough Items",
+                    description=
+                    f"Ye only have {available}x **{item}** but want to sell {quantity}!",
+                    color=ERROR_COLOR)
+                await send_response(interaction, embed=embed,
+                                    ephemeral=True)
+                return
 
-        embed = discord.Embed(
-            title="💸 Item Sold!",
-            description=
-            f"Ye sold **{quantity}x {item}** for {format_coins(total_earned)}!",
-            color=SUCCESS_COLOR)
+            sell_price = shop_price // 2  # Half of shop price
+            total_earned = sell_price * quantity
+
+            # Process sale; the writer re-checks the quantity, which another
+            # interaction worker may have sold or used since we read it
+            if not await self.bot.database.sell_item(guild_id, user_id, item, quantity, total_earned):
+                embed = discord.Embed(
+                    title="❌ Not Enough Items",
+                    description=
+                    f"Ye no longer have {quantity}x **{item}** to sell!",
+                    color=ERROR_COLOR)
+                await send_response(interaction, embed=embed,
+                                    ephemeral=True)
+                return
+
+            new_balance = await self.bot.database.get_user_balance(guild_id, user_id)
+
+            embed = discord.Embed(
+                title="💸 Item Sold!",
+                description=
+                f"Ye sold **{quantity}x {item}** for {format_coins(total_earned)}!",
+                color=SUCCESS_COLOR)
+
+            embed.add_field(name="💰 New Balance",
+                            value=format_coins(new_balance),
+                            inline=True)
 
-        embed.add_field(name="💰 New Balance",
-                        value=format_coins(new_balance),
-                        inline=True)
+            embed.add_field(
+                name="📊 Sell Price",
+                value=f"{format_coins(sell_price)} each\n(50% of shop price)",
+                inline=True)
 
-        embed.add_field(
-            name="📊 Sell Price",
-            value=f"{format_coins(sell_price)} each\n(50% of shop price)",
-            inline=True)
+            await send_response(interaction, embed=embed)
 
-        await interaction.response.send_message(embed=embed)
+    @sell_item.autocomplete("item")
+    async def sell_item_autocomplete(self, interaction: discord.Interaction,
+                                     current: str):
+        """Suggest items the user holds, from memory"""
+        return inventory_choices(self.bot, interaction, current)
@@ -0,0 +1,143 @@
+"""
+Crew membership index for No Man's Bot
+
+Keeps track of which members hold a crew role without relying on the
+member cache. Membership is persisted in the ``crew_members`` table and
+mirrored in memory, so both scale with the number of crew members rather
+than with guild size. The index is fed straight from GUILD_MEMBER_UPDATE
+payloads, which still arrive when the member cache is disabled.
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+
+class CrewIndex:
+    """Persisted crew role membership, fed by member update events"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # guild_id -> {role_id: role_name}
+        self._crew_roles: Dict[int, Dict[int, str]] = {}
+        # (guild_id, user_id) -> crew role IDs held by that member
+        self._members: Dict[Tuple[int, int], Set[int]] = {}
+        self._synced_guilds: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def install(self):
+        """Hook the raw member update parser so updates reach the index uncached"""
+        parsers = self.bot._connection.parsers
+        original = parsers['GUILD_MEMBER_UPDATE']
+
+        def parse_guild_member_update(data):
+            self._on_member_update(data)
+            original(data)
+
+        parsers['GUILD_MEMBER_UPDATE'] = parse_guild_member_update
+
+    async def load(self):
+        """Load crew roles and the persisted membership index"""
+        self._crew_roles.clear()
+        self._members.clear()
+        for guild_id, role_id, role_name in await self.bot.database.get_all_crew_roles():
+            self._crew_roles.setdefault(guild_id, {})[role_id] = role_name
+        for guild_id, role_id, user_id in await self.bot.database.get_all_crew_members():
+            self._members.setdefault((guild_id, user_id), set()).add(role_id)
+        logger.info(f"Loaded crew index with {len(self._members)} crew member(s)")
+
+    def get_crew_roles(self, guild_id: int) -> Dict[int, str]:
+        """Get the crew roles of a guild as {role_id: role_name}, from memory"""
+        return self._crew_roles.get(guild_id, {})
+
+    def get_user_crew(self, guild_id: int, user_id: int) -> Optional[str]:
+        """Get the crew name recorded for a member"""
+        role_ids = self._members.get((guild_id, user_id))
+        if not role_ids:
+            return None
+        crew_roles = self._crew_roles.get(guild_id, {})
+        for role_id in role_ids:
+            if role_id in crew_roles:
+                return crew_roles[role_id]
+        return None
+
+    def add_crew_role(self, guild: discord.Guild, role_id: int, role_name: str):
+        """Start tracking a newly registered crew role and seed its members"""
+        self._crew_roles.setdefault(guild.id, {})[role_id] = role_name
+        self._spawn(self.sync_role(guild, role_id))
+
+    def remove_crew_role(self, guild_id: int, role_id: int):
+        """Stop tracking a crew role (its rows are dropped with the role)"""
+        self._crew_roles.get(guild_id, {}).pop(role_id, None)
+        for key in [key for key in self._members if key[0] == guild_id]:
+            self._members[key].discard(role_id)
+            if not self._members[key]:
+                del self._members[key]
+
+    def remove_member(self, guild_id: int, user_id: int):
+        """Forget a member who left the guild"""
+        if self._members.pop((guild_id, user_id), None):
+            self._spawn(self.bot.database.set_member_crew_roles(guild_id, user_id, []))
+
+    async def sync_guild(self, guild: discord.Guild):
+        """Rebuild the index for every crew role in a guild, once per session"""
+        if guild.id in self._synced_guilds or guild.id not in self._crew_roles:
+            return
+        self._synced_guilds.add(guild.id)
+        await self.sync_role(guild, *self._crew_roles[guild.id])
+
+    async def sync_role(self, guild: discord.Guild, *role_ids: int):
+        """Rebuild the index for some crew roles from Discord"""
+        wanted = set(role_ids)
+        holders: Dict[int, List[int]] = {role_id: [] for role_id in wanted}
+
+        if self.bot.low_memory:
+            # Stream members page by page instead of chunking them into the cache
+            async for member in guild.fetch_members(limit=None):
+                for role in member.roles:
+                    if role.id in wanted:
+                        holders[role.id].append(member.id)
+        else:
+            for role_id in wanted:
+                role = guild.get_role(role_id)
+                if role:
+                    holders[role_id] = [member.id for member in role.members]
+
+        for role_id, user_ids in holders.items():
+            await self.bot.database.replace_crew_role_members(guild.id, role_id, user_ids)
+            for key in [key for key in self._members if key[0] == guild.id]:
+                self._members[key].discard(role_id)
+                if not self._members[key]:
+                    del self._members[key]
+            for user_id in user_ids:
+                self._members.setdefault((guild.id, user_id), set()).add(role_id)
+        logger.info(f"Synced crew index for guild {guild.id}")
+
+    def _on_member_update(self, data: dict):
+        """Record crew role changes from a raw GUILD_MEMBER_UPDATE payload"""
+        guild_id = int(data['guild_id'])
+        crew_roles = self._crew_roles.get(guild_id)
+        if not crew_roles:
+            return
+
+        user_id = int(data['user']['id'])
+        held = {int(role_id) for role_id in data.get('roles', ())} & crew_roles.keys()
+        key = (guild_id, user_id)
+        if held == self._members.get(key, set()):
+            return
+
+        if held:
+            self._members[key] = held
+        else:
+            self._members.pop(key, None)
+        self._spawn(self.bot.database.set_member_crew_roles(guild_id, user_id, sorted(held)))
+
+    def _spawn(self, coro):
+        """Run a persistence task in the background and keep a reference to it"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
@@ -2,180 +2,223 @@ import sqlite3
 import asyncio
 import time
 import logging
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from bot import migrations
+from bot.effects import EffectCache
+from bot.read_pool import ReadPool
+from bot.utils.constants import (
+    BULK_QUERY_CHUNK, DB_READ_POOL_SIZE, QUERY_PLAN_CHECK,
+    SEARCH_COMMAND_COOLDOWN, STEAL_COMMAND_COOLDOWN
+)
+from bot.utils.locks import UserLockManager
+from bot.versions import BALANCES, CREWS, DataVersions
+from bot.writer import WriteActor
 
 logger = logging.getLogger(__name__)
 
+# Shop catalogue as (item_name, item_type, price, crew_required, description)
+SHOP_ITEMS = [
+    # Non-crew consumables
+    ("Compass", "consumable", 100, 0, "Increases odds of finding money, breaks over time"),
+    ("Spyglass", "consumable", 150, 0, "Increases odds of finding money, breaks over time"), 
+    ("Rum", "consumable", 50, 0, "Decreases cooldown for search command"),
+    # Non-crew weapons
+    ("Pirate Hook", "weapon", 200, 0, "Basic weapon for stealing"),
+    ("Cutlass", "weapon", 350, 0, "Improved weapon for stealing"),
+    ("Flintlock Pistol", "weapon", 500, 0, "Advanced weapon for stealing"),
+    # Crew consumables
+    ("Ship Maintenance", "consumable", 800, 1, "Greatly increases chances of finding money"),
+    ("Treasure Map", "consumable", 1200, 1, "Increases odds and amount of money found"),
+    ("Barrel", "consumable", 400, 1, "Increases money inventory capacity"),
+    # Crew weapons
+    ("Flintlock Musket", "weapon", 1000, 1, "Crew weapon for stealing"),
+    ("Cannon", "weapon", 1800, 1, "Powerful crew weapon for stealing"),
+    ("Grenade", "weapon", 2500, 1, "Elite crew weapon for stealing")
+]
+
 class Database:
-    def __init__(self, db_path: str = "nomansbot.db"):
+    def __init__(self, db_path: str = "nomansbot.db", read_pool_size: int = DB_READ_POOL_SIZE):
         self.db_path = db_path
+        # Only schema changes take this lock; reads use the pool, writes the writer
         self._lock = asyncio.Lock()
+        self._read_pool = ReadPool(db_path, read_pool_size)
+        self._write_actor = WriteActor(db_path)
+        # Commands hold these around read-check-write sequences on a user
+        self.user_locks = UserLockManager()
+        # Compiled item modifiers; every method that changes items drops the user's entry
+        self.effects = EffectCache(self)
+        # Bumped by every write, so caches of rendered views know when they're stale
+        self.versions = DataVersions()
+        # Background backfill of schema migrations, while one is unfinished
+        self._migration: Optional[asyncio.Task] = None
     
     async def initialize(self):
-        """Initialize the database and create tables"""
+        """Migrate the schema to the latest version and start the connections"""
         async with self._lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create users table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    balance INTEGER DEFAULT 0,
-                    last_passive_earn INTEGER DEFAULT 0,
-                    last_search_command INTEGER DEFAULT 0,
-                    last_steal_attempt INTEGER DEFAULT 0,
-                    total_earned INTEGER DEFAULT 0,
-                    active_compass INTEGER DEFAULT 0,
-                    active_spyglass INTEGER DEFAULT 0,
-                    compass_durability INTEGER DEFAULT 0,
-                    spyglass_durability INTEGER DEFAULT 0,
-                    active_weapon TEXT DEFAULT NULL
-                )
-            """)
-            
-            # Create crew_roles table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS crew_roles (
-                    guild_id INTEGER,
-                    role_id INTEGER,
-                    role_name TEXT,
-                    captain_role_id INTEGER,
-                    first_mate_role_id INTEGER,
-                    PRIMARY KEY (guild_id, role_id)
-                )
-            """)
-            
-            # Create inventory table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS inventory (
-                    user_id INTEGER,
-                    item_name TEXT,
-                    quantity INTEGER DEFAULT 0,
-                    PRIMARY KEY (user_id, item_name)
-                )
-            """)
-            
-            # Create shop table for item definitions
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS shop_items (
-                    item_name TEXT PRIMARY KEY,
-                    item_type TEXT,
-                    price INTEGER,
-                    crew_required INTEGER DEFAULT 0,
-                    description TEXT
+            # Autocommit, so each migration runs in its own explicit transaction
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            try:
+                # WAL lets other processes read while the writer commits
+                conn.execute("PRAGMA journal_mode=WAL")
+                
+                backfills = migrations.migrate(conn)
+                
+                # The catalogue isn't schema; new items appear on every start
+                conn.executemany(
+                    "INSERT OR IGNORE INTO shop_items VALUES (?, ?, ?, ?, ?)",
+                    SHOP_ITEMS
                 )
-            """)
-            
-            # Initialize shop items
-            shop_items = [
-                # Non-crew consumables
-                ("Compass", "consumable", 100, 0, "Increases odds of finding money, breaks over time"),
-                ("Spyglass", "consumable", 150, 0, "Increases odds of finding money, breaks over time"), 
-                ("Rum", "consumable", 50, 0, "Decreases cooldown for search command"),
-                # Non-crew weapons
-                ("Pirate Hook", "weapon", 200, 0, "Basic weapon for stealing"),
-                ("Cutlass", "weapon", 350, 0, "Improved weapon for stealing"),
-                ("Flintlock Pistol", "weapon", 500, 0, "Advanced weapon for stealing"),
-                # Crew consumables
-                ("Ship Maintenance", "consumable", 800, 1, "Greatly increases chances of finding money"),
-                ("Treasure Map", "consumable", 1200, 1, "Increases odds and amount of money found"),
-                ("Barrel", "consumable", 400, 1, "Increases money inventory capacity"),
-                # Crew weapons
-                ("Flintlock Musket", "weapon", 1000, 1, "Crew weapon for stealing"),
-                ("Cannon", "weapon", 1800, 1, "Powerful crew weapon for stealing"),
-                ("Grenade", "weapon", 2500, 1, "Elite crew weapon for stealing")
-            ]
-            
-            cursor.executemany(
-                "INSERT OR IGNORE INTO shop_items VALUES (?, ?, ?, ?, ?)",
-                shop_items
-            )
-            
-            conn.commit()
-            conn.close()
-            logger.info("Database initialized successfully")
+                
+                if QUERY_PLAN_CHECK:
+                    migrations.check_query_plans(conn)
+                logger.info(f"Database schema at version {migrations.schema_version(conn)}")
+            finally:
+                conn.close()
+        
+        await self._read_pool.start()
+        await self._write_actor.start()
+        if backfills:
+            self._migration = asyncio.create_task(migrations.run_backfills(self, backfills), name="schema-backfill")
+        logger.info("Database initialized successfully")
+    
+    async def close(self):
+        """Flush pending writes and close all connections"""
+        if self._migration is not None:
+            # Its reads and writes must stop before their connections close
+            self._migration.cancel()
+            await asyncio.gather(self._migration, return_exceptions=True)
+            self._migration = None
+        await self._write_actor.close()
+        await self._read_pool.close()
+    
+    @property
+    def write_queue_depth(self) -> int:
+        """Number of write operations waiting to be committed"""
+        return self._write_actor.queue_depth
+    
+    @property
+    def write_latency(self) -> float:
+        """Moving average of group commit time, in seconds"""
+        return self._write_actor.commit_latency
+    
+    async def _execute_many(self, statements: List[Tuple[str, tuple]]) -> List[int]:
+        """Apply several write statements atomically through the writer"""
+        return await self._write_actor.submit(statements)
     
     async def _execute_query(self, query: str, params: tuple = (), fetch: bool = False):
-        """Execute a database query safely"""
-        async with self._lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
+        """Execute a database query safely
+        
+        Reads are served by the read pool; writes go through the group-commit writer.
+        """
+        if fetch:
             try:
-                cursor.execute(query, params)
-                
-                if fetch:
-                    result = cursor.fetchall()
-                    conn.close()
-                    return result
-                else:
-                    conn.commit()
-                    conn.close()
-                    return cursor.rowcount
+                return await self._read_pool.fetch(query, params)
             except Exception as e:
-                conn.close()
                 logger.error(f"Database error: {e}")
                 raise
+        
+        results = await self._execute_many([(query, params)])
+        return results[0]
     
-    async def get_user_balance(self, user_id: int) -> int:
+    async def _fetch_snapshot(self, queries: List[Tuple[str, tuple]]) -> List[list]:
+        """Run several reads against one consistent snapshot"""
+        return await self._read_pool.fetch_snapshot(queries)
+    
+    async def get_user_balance(self, guild_id: int, user_id: int) -> int:
         """Get user's coin balance"""
         result = await self._execute_query(
-            "SELECT balance FROM users WHERE user_id = ?",
-            (user_id,),
+            "SELECT balance FROM users WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id),
             fetch=True
         )
         return result[0][0] if result else 0
     
-    async def add_coins(self, user_id: int, amount: int):
-        """Add coins to user's balance"""
-        # First, ensure user exists
-        await self._execute_query(
-            """INSERT OR IGNORE INTO users (user_id, balance, total_earned) 
-               VALUES (?, 0, 0)""",
-            (user_id,)
-        )
-        
-        # Then update balance and total earned
-        await self._execute_query(
-            """UPDATE users 
-               SET balance = balance + ?, total_earned = total_earned + ?
-               WHERE user_id = ?""",
-            (amount, amount, user_id)
-        )
+    async def add_coins(self, guild_id: int, user_id: int, amount: int):
+        """Add coins to user's balance, counting as activity"""
+        current_time = int(time.time())
+        await self._execute_many([
+            # First, ensure user exists
+            ("""INSERT OR IGNORE INTO users (guild_id, user_id, balance, total_earned) 
+                VALUES (?, ?, 0, 0)""",
+             (guild_id, user_id)),
+            # Then update balance and total earned
+            ("""UPDATE users 
+                SET balance = balance + ?, total_earned = total_earned + ?, last_active = ?
+                WHERE guild_id = ? AND user_id = ?""",
+             (amount, amount, current_time, guild_id, user_id))
+        ])
+        self.versions.bump((BALANCES, guild_id))
     
-    async def can_earn_passive(self, user_id: int) -> bool:
-        """Check if user can earn passive coins (rate limiting)"""
-        result = await self._execute_query(
-            "SELECT last_passive_earn FROM users WHERE user_id = ?",
-            (user_id,),
-            fetch=True
-        )
-        
-        if not result:
-            return True
-        
-        last_earn = result[0][0]
+    async def adjust_balances(self, guild_id: int, user_ids: List[int], mode: str, amount: int):
+        """Grant, deduct or set the balance of many users in one transaction
+
+        Deductions stop at zero; grants also count towards total earned.
+        Admin adjustments don't count as the users' activity.
+        """
+        updates = {
+            "grant": """UPDATE users SET balance = balance + ?, total_earned = total_earned + ?
+                        WHERE guild_id = ? AND user_id = ?""",
+            "deduct": "UPDATE users SET balance = MAX(balance - ?, 0) WHERE guild_id = ? AND user_id = ?",
+            "set": "UPDATE users SET balance = ? WHERE guild_id = ? AND user_id = ?",
+        }
+        if mode == "grant":
+            params = [(amount, amount, guild_id, user_id) for user_id in user_ids]
+        else:
+            params = [(amount, guild_id, user_id) for user_id in user_ids]
+        await self._execute_many([
+            ("""INSERT OR IGNORE INTO users (guild_id, user_id, balance, total_earned) 
+                VALUES (?, ?, 0, 0)""",
+             [(guild_id, user_id) for user_id in user_ids]),
+            (updates[mode], params)
+        ])
+        self.versions.bump((BALANCES, guild_id))
+    
+    async def get_balances(self, guild_id: int, user_ids: List[int]) -> Dict[int, int]:
+        """Get the balances of many users at once; users never seen are left out"""
+        queries = [
+            (f"SELECT user_id, balance FROM users WHERE guild_id = ? AND user_id IN ({', '.join('?' * len(chunk))})",
+             (guild_id, *chunk))
+            for chunk in (user_ids[i:i + BULK_QUERY_CHUNK] for i in range(0, len(user_ids), BULK_QUERY_CHUNK))
+        ]
+        if not queries:
+            return {}
+        results = await self._fetch_snapshot(queries)
+        return {user_id: balance for rows in results for user_id, balance in rows}
+    
+    async def award_passive_coins(self, guild_id: int, user_id: int, amount: int):
+        """Add passive coins and restart the passive cooldown in one write"""
         current_time = int(time.time())
-        
-        # 60 seconds cooldown for passive earning
-        return current_time - last_earn >= 60
+        await self._execute_many([
+            ("""INSERT OR IGNORE INTO users (guild_id, user_id, balance, total_earned) 
+                VALUES (?, ?, 0, 0)""",
+             (guild_id, user_id)),
+            ("""UPDATE users 
+                SET balance = balance + ?, total_earned = total_earned + ?, last_passive_earn = ?
+                WHERE guild_id = ? AND user_id = ?""",
+             (amount, amount, current_time, guild_id, user_id))
+        ])
+        self.versions.bump((BALANCES, guild_id))
     
-    async def update_passive_cooldown(self, user_id: int):
-        """Update the passive earning cooldown"""
+    async def award_passive_coins_bulk(self, awards: List[Tuple[int, int, int]]):
+        """Apply many deferred passive awards as (guild_id, user_id, amount) in one write"""
         current_time = int(time.time())
-        await self._execute_query(
-            """INSERT OR REPLACE INTO users (user_id, last_passive_earn, balance, total_earned)
-               VALUES (?, ?, COALESCE((SELECT balance FROM users WHERE user_id = ?), 0),
-                       COALESCE((SELECT total_earned FROM users WHERE user_id = ?), 0))""",
-            (user_id, current_time, user_id, user_id)
-        )
+        await self._execute_many([
+            ("""INSERT OR IGNORE INTO users (guild_id, user_id, balance, total_earned) 
+                VALUES (?, ?, 0, 0)""",
+             [(guild_id, user_id) for guild_id, user_id, _ in awards]),
+            ("""UPDATE users 
+                SET balance = balance + ?, total_earned = total_earned + ?, last_passive_earn = ?
+                WHERE guild_id = ? AND user_id = ?""",
+             [(amount, amount, current_time, guild_id, user_id) for guild_id, user_id, amount in awards])
+        ])
+        self.versions.bump(*{(BALANCES, guild_id) for guild_id, _, _ in awards})
     
-    async def can_use_search_command(self, user_id: int) -> bool:
+    async def can_use_search_command(self, guild_id: int, user_id: int) -> bool:
         """Check if user can use the search command (rate limiting)"""
         result = await self._execute_query(
-            "SELECT last_search_command FROM users WHERE user_id = ?",
-            (user_id,),
+            "SELECT last_search_command FROM users WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id),
             fetch=True
         )
         
@@ -186,71 +229,120 @@ class Database:
         current_time = int(time.time())
         
         # 5 minutes cooldown for search command (reduced by rum)
-        return current_time - last_search >= 300
+        return current_time - last_search >= SEARCH_COMMAND_COOLDOWN
     
-    async def update_search_command_cooldown(self, user_id: int):
+    async def update_search_command_cooldown(self, guild_id: int, user_id: int):
         """Update the search command cooldown"""
         current_time = int(time.time())
         await self._execute_query(
-            """INSERT OR REPLACE INTO users (user_id, last_search_command, balance, total_earned)
-               VALUES (?, ?, COALESCE((SELECT balance FROM users WHERE user_id = ?), 0),
-                       COALESCE((SELECT total_earned FROM users WHERE user_id = ?), 0))""",
-            (user_id, current_time, user_id, user_id)
+            """INSERT INTO users (guild_id, user_id, last_search_command) VALUES (?, ?, ?)
+               ON CONFLICT(guild_id, user_id) DO UPDATE SET last_search_command = excluded.last_search_command""",
+            (guild_id, user_id, current_time)
         )
     
-    async def add_to_inventory(self, user_id: int, item_name: str, quantity: int = 1):
-        """Add items to user's inventory"""
+    async def shorten_search_cooldown(self, guild_id: int, user_id: int, seconds: int):
+        """Move the user's last search back so the cooldown ends sooner"""
         await self._execute_query(
-            """INSERT INTO inventory (user_id, item_name, quantity)
-               VALUES (?, ?, ?)
-               ON CONFLICT(user_id, item_name) 
-               DO UPDATE SET quantity = quantity + ?""",
-            (user_id, item_name, quantity, quantity)
+            """UPDATE users SET last_search_command = last_search_command - ?, last_active = ?
+               WHERE guild_id = ? AND user_id = ?""",
+            (seconds, int(time.time()), guild_id, user_id)
         )
     
-    async def remove_from_inventory(self, user_id: int, item_name: str, quantity: int = 1):
-        """Remove items from user's inventory"""
-        await self._execute_query(
-            """UPDATE inventory 
-               SET quantity = quantity - ?
-               WHERE user_id = ? AND item_name = ?""",
-            (quantity, user_id, item_name)
-        )
-        
-        # Remove item if quantity reaches 0
+    async def add_to_inventory(self, guild_id: int, user_id: int, item_name: str, quantity: int = 1):
+        """Add items to user's inventory"""
         await self._execute_query(
-            "DELETE FROM inventory WHERE user_id = ? AND item_name = ? AND quantity <= 0",
-            (user_id, item_name)
+            """INSERT INTO inventory (guild_id, user_id, item_name, quantity)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(guild_id, user_id, item_name) 
+               DO UPDATE SET quantity = quantity + ?""",
+            (guild_id, user_id, item_name, quantity, quantity)
         )
+        self.effects.invalidate(guild_id, user_id)
     
-    async def get_user_inventory(self, user_id: int) -> List[Tuple[str, int]]:
+    async def remove_from_inventory(self, guild_id: int, user_id: int, item_name: str, quantity: int = 1) -> bool:
+        """Remove items from user's inventory; False, changing nothing, if they hold fewer"""
+        outcomes = await self._execute_many([
+            ("""UPDATE inventory 
+                SET quantity = quantity - ?
+                WHERE guild_id = ? AND user_id = ? AND item_name = ? AND quantity >= ?""",
+             (quantity, guild_id, user_id, item_name, quantity)),
+            # Remove item if quantity reaches 0
+            ("DELETE FROM inventory WHERE guild_id = ? AND user_id = ? AND item_name = ? AND quantity <= 0",
+             (guild_id, user_id, item_name))
+        ])
+        self.effects.invalidate(guild_id, user_id)
+        return outcomes[0] == 1
+    
+    async def buy_item(self, guild_id: int, user_id: int, item_name: str, quantity: int, cost: int) -> bool:
+        """Take the cost from user's balance and add the items in one write
+
+        Returns False, changing nothing, if the balance no longer covers the
+        cost. The writer checks it, so this holds even when another process
+        spent the coins after the caller read the balance.
+        """
+        outcomes = await self._execute_many([
+            ("""UPDATE users 
+                SET balance = balance - ?, total_earned = total_earned - ?, last_active = ?
+                WHERE guild_id = ? AND user_id = ? AND balance >= ?""",
+             (cost, cost, int(time.time()), guild_id, user_id, cost)),
+            # Only if the payment went through
+            ("""INSERT INTO inventory (guild_id, user_id, item_name, quantity)
+                SELECT ?, ?, ?, ? WHERE changes() = 1
+                ON CONFLICT(guild_id, user_id, item_name) 
+                DO UPDATE SET quantity = quantity + excluded.quantity""",
+             (guild_id, user_id, item_name, quantity))
+        ])
+        if outcomes[0] != 1:
+            return False
+        self.effects.invalidate(guild_id, user_id)
+        self.versions.bump((BALANCES, guild_id))
+        return True
+    
+    async def sell_item(self, guild_id: int, user_id: int, item_name: str, quantity: int, price: int) -> bool:
+        """Remove the items from user's inventory and pay them in one write
+
+        Returns False, changing nothing, if they no longer hold that many.
+        """
+        outcomes = await self._execute_many([
+            ("""INSERT OR IGNORE INTO users (guild_id, user_id, balance, total_earned) 
+                VALUES (?, ?, 0, 0)""",
+             (guild_id, user_id)),
+            ("""UPDATE inventory 
+                SET quantity = quantity - ?
+                WHERE guild_id = ? AND user_id = ? AND item_name = ? AND quantity >= ?""",
+             (quantity, guild_id, user_id, item_name, quantity)),
+            # Only if the items were there to sell
+            ("""UPDATE users 
+                SET balance = balance + ?, total_earned = total_earned + ?, last_active = ?
+                WHERE guild_id = ? AND user_id = ? AND changes() = 1""",
+             (price, price, int(time.time()), guild_id, user_id)),
+            ("DELETE FROM inventory WHERE guild_id = ? AND user_id = ? AND item_name = ? AND quantity <= 0",
+             (guild_id, user_id, item_name))
+        ])
+        if outcomes[1] != 1:
+            return False
+        self.effects.invalidate(guild_id, user_id)
+        self.versions.bump((BALANCES, guild_id))
+        return True
+    
+    async def get_user_inventory(self, guild_id: int, user_id: int) -> List[Tuple[str, int]]:
         """Get user's inventory"""
         result = await self._execute_query(
-            "SELECT item_name, quantity FROM inventory WHERE user_id = ? AND quantity > 0",
-            (user_id,),
+            "SELECT item_name, quantity FROM inventory WHERE guild_id = ? AND user_id = ? AND quantity > 0",
+            (guild_id, user_id),
             fetch=True
         )
         return result
     
     async def get_crew_inventory(self, guild_id: int, crew_role_id: int) -> List[Tuple[int, str, str, int]]:
         """Get inventory for all members of a crew"""
-        # Get all users with the crew role
-        crew_members = await self._execute_query(
-            """SELECT DISTINCT u.user_id 
-               FROM users u 
-               WHERE u.user_id IN (
-                   SELECT user_id FROM inventory WHERE quantity > 0
-               )""",
-            fetch=True
-        )
-        
-        # This is a simplified version - in practice, you'd need to track guild members
-        # For now, return inventory for users who have items
         result = await self._execute_query(
             """SELECT i.user_id, 'Unknown', i.item_name, i.quantity 
-               FROM inventory i 
-               WHERE i.quantity > 0
+               FROM crew_members c
+               JOIN inventory i ON i.guild_id = c.guild_id AND i.user_id = c.user_id
+               WHERE c.guild_id = ? AND c.role_id = ? AND i.quantity > 0
                ORDER BY i.user_id, i.item_name""",
+            (guild_id, crew_role_id),
             fetch=True
         )
         return result
@@ -279,77 +371,86 @@ class Database:
         )
         return result[0] if result else None
     
-    async def set_active_consumable(self, user_id: int, consumable_type: str, durability: int = 10):
+    async def set_active_consumable(self, guild_id: int, user_id: int, consumable_type: str, durability: int = 10):
         """Set active consumable (compass or spyglass)"""
+        current_time = int(time.time())
         if consumable_type == "Compass":
             await self._execute_query(
-                """INSERT OR REPLACE INTO users (user_id, active_compass, compass_durability, balance, total_earned)
-                   VALUES (?, 1, ?, COALESCE((SELECT balance FROM users WHERE user_id = ?), 0),
-                           COALESCE((SELECT total_earned FROM users WHERE user_id = ?), 0))""",
-                (user_id, durability, user_id, user_id)
+                """INSERT INTO users (guild_id, user_id, active_compass, compass_durability, last_active)
+                   VALUES (?, ?, 1, ?, ?)
+                   ON CONFLICT(guild_id, user_id) DO UPDATE SET
+                       active_compass = 1, compass_durability = excluded.compass_durability,
+                       last_active = excluded.last_active""",
+                (guild_id, user_id, durability, current_time)
             )
         elif consumable_type == "Spyglass":
             await self._execute_query(
-                """INSERT OR REPLACE INTO users (user_id, active_spyglass, spyglass_durability, balance, total_earned)
-                   VALUES (?, 1, ?, COALESCE((SELECT balance FROM users WHERE user_id = ?), 0),
-                           COALESCE((SELECT total_earned FROM users WHERE user_id = ?), 0))""",
-                (user_id, durability, user_id, user_id)
+                """INSERT INTO users (guild_id, user_id, active_spyglass, spyglass_durability, last_active)
+                   VALUES (?, ?, 1, ?, ?)
+                   ON CONFLICT(guild_id, user_id) DO UPDATE SET
+                       active_spyglass = 1, spyglass_durability = excluded.spyglass_durability,
+                       last_active = excluded.last_active""",
+                (guild_id, user_id, durability, current_time)
             )
+        self.effects.invalidate(guild_id, user_id)
     
-    async def set_active_weapon(self, user_id: int, weapon_name: str):
+    async def set_active_weapon(self, guild_id: int, user_id: int, weapon_name: str):
         """Set active weapon"""
         await self._execute_query(
-            """INSERT OR REPLACE INTO users (user_id, active_weapon, balance, total_earned)
-               VALUES (?, ?, COALESCE((SELECT balance FROM users WHERE user_id = ?), 0),
-                       COALESCE((SELECT total_earned FROM users WHERE user_id = ?), 0))""",
-            (user_id, weapon_name, user_id, user_id)
+            """INSERT INTO users (guild_id, user_id, active_weapon, last_active) VALUES (?, ?, ?, ?)
+               ON CONFLICT(guild_id, user_id) DO UPDATE SET
+                   active_weapon = excluded.active_weapon, last_active = excluded.last_active""",
+            (guild_id, user_id, weapon_name, int(time.time()))
         )
+        self.effects.invalidate(guild_id, user_id)
     
-    async def get_user_effects(self, user_id: int) -> Tuple[int, int, int, int, str]:
+    async def get_user_effects(self, guild_id: int, user_id: int) -> Tuple[int, int, int, int, str]:
         """Get user's active effects (compass, spyglass, durabilities, weapon)"""
         result = await self._execute_query(
-            "SELECT active_compass, active_spyglass, compass_durability, spyglass_durability, active_weapon FROM users WHERE user_id = ?",
-            (user_id,),
+            """SELECT active_compass, active_spyglass, compass_durability, spyglass_durability, active_weapon
+               FROM users WHERE guild_id = ? AND user_id = ?""",
+            (guild_id, user_id),
             fetch=True
         )
         if result:
             return result[0]
         return (0, 0, 0, 0, None)
     
-    async def reduce_consumable_durability(self, user_id: int, consumable_type: str):
+    async def reduce_consumable_durability(self, guild_id: int, user_id: int, consumable_type: str):
         """Reduce durability of active consumable"""
         if consumable_type == "Compass":
             await self._execute_query(
-                "UPDATE users SET compass_durability = compass_durability - 1 WHERE user_id = ?",
-                (user_id,)
+                "UPDATE users SET compass_durability = compass_durability - 1 WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id)
             )
             # Check if durability reached 0
             result = await self._execute_query(
-                "SELECT compass_durability FROM users WHERE user_id = ?",
-                (user_id,),
+                "SELECT compass_durability FROM users WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id),
                 fetch=True
             )
             if result and result[0][0] <= 0:
                 await self._execute_query(
-                    "UPDATE users SET active_compass = 0, compass_durability = 0 WHERE user_id = ?",
-                    (user_id,)
+                    "UPDATE users SET active_compass = 0, compass_durability = 0 WHERE guild_id = ? AND user_id = ?",
+                    (guild_id, user_id)
                 )
         elif consumable_type == "Spyglass":
             await self._execute_query(
-                "UPDATE users SET spyglass_durability = spyglass_durability - 1 WHERE user_id = ?",
-                (user_id,)
+                "UPDATE users SET spyglass_durability = spyglass_durability - 1 WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id)
             )
             # Check if durability reached 0
             result = await self._execute_query(
-                "SELECT spyglass_durability FROM users WHERE user_id = ?",
-                (user_id,),
+                "SELECT spyglass_durability FROM users WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id),
                 fetch=True
             )
             if result and result[0][0] <= 0:
                 await self._execute_query(
-                    "UPDATE users SET active_spyglass = 0, spyglass_durability = 0 WHERE user_id = ?",
-                    (user_id,)
+                    "UPDATE users SET active_spyglass = 0, spyglass_durability = 0 WHERE guild_id = ? AND user_id = ?",
+                    (guild_id, user_id)
                 )
+        self.effects.invalidate(guild_id, user_id)
     
     async def get_crew_roles(self, guild_id: int) -> List[int]:
         """Get list of crew role IDs for a guild"""
@@ -366,13 +467,105 @@ class Database:
             "INSERT OR REPLACE INTO crew_roles (guild_id, role_id, role_name, captain_role_id, first_mate_role_id) VALUES (?, ?, ?, ?, ?)",
             (guild_id, role_id, role_name, captain_role_id, first_mate_role_id)
         )
+        self.versions.bump((CREWS, guild_id))
     
     async def remove_crew_role(self, guild_id: int, role_id: int):
-        """Remove a crew role"""
+        """Remove a crew role and its membership index"""
+        await self._execute_many([
+            ("DELETE FROM crew_roles WHERE guild_id = ? AND role_id = ?",
+             (guild_id, role_id)),
+            ("DELETE FROM crew_members WHERE guild_id = ? AND role_id = ?",
+             (guild_id, role_id))
+        ])
+        self.versions.bump((CREWS, guild_id))
+    
+    async def get_all_crew_roles(self) -> List[Tuple[int, int, str]]:
+        """Get every configured crew role as (guild_id, role_id, role_name)"""
+        result = await self._execute_query(
+            "SELECT guild_id, role_id, role_name FROM crew_roles",
+            fetch=True
+        )
+        return result
+    
+    async def get_all_crew_members(self) -> List[Tuple[int, int, int]]:
+        """Get the whole crew membership index as (guild_id, role_id, user_id)"""
+        result = await self._execute_query(
+            "SELECT guild_id, role_id, user_id FROM crew_members",
+            fetch=True
+        )
+        return result
+    
+    async def get_crew_role_members(self, guild_id: int, role_id: int) -> List[int]:
+        """Get the user IDs recorded for one crew role"""
+        result = await self._execute_query(
+            "SELECT user_id FROM crew_members WHERE guild_id = ? AND role_id = ?",
+            (guild_id, role_id),
+            fetch=True
+        )
+        return [row[0] for row in result]
+    
+    async def set_member_crew_roles(self, guild_id: int, user_id: int, role_ids: List[int]):
+        """Replace the crew roles recorded for one member"""
+        await self._execute_many([
+            ("DELETE FROM crew_members WHERE guild_id = ? AND user_id = ?",
+             (guild_id, user_id)),
+            ("INSERT INTO crew_members (guild_id, role_id, user_id) VALUES (?, ?, ?)",
+             [(guild_id, role_id, user_id) for role_id in role_ids])
+        ])
+        self.versions.bump((CREWS, guild_id))
+    
+    async def replace_crew_role_members(self, guild_id: int, role_id: int, user_ids: List[int]):
+        """Replace every member recorded for one crew role"""
+        await self._execute_many([
+            ("DELETE FROM crew_members WHERE guild_id = ? AND role_id = ?",
+             (guild_id, role_id)),
+            ("INSERT INTO crew_members (guild_id, role_id, user_id) VALUES (?, ?, ?)",
+             [(guild_id, role_id, user_id) for user_id in user_ids])
+        ])
+        self.versions.bump((CREWS, guild_id))
+    
+    async def get_job_state(self, job: str) -> Tuple[int, int, Optional[int]]:
+        """Get a job's last finished run, the start of an unfinished run and its rowid cursor"""
+        result = await self._execute_query(
+            "SELECT last_run, started_at, cursor FROM job_state WHERE job = ?",
+            (job,),
+            fetch=True
+        )
+        return result[0] if result else (0, 0, None)
+    
+    async def start_job(self, job: str, started_at: int, cursor: int):
+        """Record that a job run has started at the beginning of users"""
         await self._execute_query(
-            "DELETE FROM crew_roles WHERE guild_id = ? AND role_id = ?",
-            (guild_id, role_id)
+            """INSERT INTO job_state (job, started_at, cursor) VALUES (?, ?, ?)
+               ON CONFLICT(job) DO UPDATE SET started_at = excluded.started_at, cursor = excluded.cursor""",
+            (job, started_at, cursor)
+        )
+    
+    async def finish_job(self, job: str, finished_at: int):
+        """Record that a job run has finished"""
+        await self._execute_query(
+            """INSERT INTO job_state (job, last_run, started_at, cursor) VALUES (?, ?, 0, NULL)
+               ON CONFLICT(job) DO UPDATE SET last_run = excluded.last_run, started_at = 0, cursor = NULL""",
+            (job, finished_at)
+        )
+    
+    async def get_rowid_bound(self, after: int, limit: int) -> Optional[int]:
+        """Get the last users rowid of the next chunk after a cursor, or None at the end"""
+        result = await self._execute_query(
+            "SELECT MAX(rowid) FROM (SELECT rowid FROM users WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+            (after, limit),
+            fetch=True
         )
+        return result[0][0] if result else None
+    
+    async def run_job_chunk(self, job: str, update: str, params: tuple, lower: int, upper: int) -> int:
+        """Apply a job's update to a rowid range and advance its cursor atomically"""
+        outcomes = await self._execute_many([
+            (update, (*params, lower, upper)),
+            ("UPDATE job_state SET cursor = ? WHERE job = ?", (upper, job))
+        ])
+        self.versions.bump_all()
+        return outcomes[0]
     
     async def get_crew_roles_with_names(self, guild_id: int) -> List[Tuple[int, str]]:
         """Get crew roles with their names"""
@@ -383,29 +576,60 @@ class Database:
         )
         return result
     
-    async def get_leaderboard(self, limit: int = 10) -> List[Tuple[int, int, int]]:
-        """Get top users by balance"""
+    async def get_leaderboard(self, guild_id: int, limit: int = 10, offset: int = 0) -> List[Tuple[int, int, int]]:
+        """Get a guild's top users by balance, skipping the first ``offset``"""
+        result = await self._execute_query(
+            """SELECT user_id, balance, total_earned FROM users
+               WHERE guild_id = ? ORDER BY balance DESC LIMIT ? OFFSET ?""",
+            (guild_id, limit, offset),
+            fetch=True
+        )
+        return result
+    
+    async def get_user_rank(self, guild_id: int, user_id: int) -> Optional[int]:
+        """Get a user's position on their guild's leaderboard, or None without coins"""
+        result = await self._execute_query(
+            """SELECT (SELECT COUNT(*) FROM users WHERE guild_id = u.guild_id AND balance > u.balance) + 1
+               FROM users u WHERE u.guild_id = ? AND u.user_id = ? AND u.balance > 0""",
+            (guild_id, user_id),
+            fetch=True
+        )
+        return result[0][0] if result else None
+    
+    async def get_economy_totals(self, guild_id: int) -> Tuple[int, int, int]:
+        """Get a guild's user count, coins in circulation and coins ever earned"""
+        result = await self._execute_query(
+            "SELECT COUNT(*), COALESCE(SUM(balance), 0), COALESCE(SUM(total_earned), 0) FROM users WHERE guild_id = ?",
+            (guild_id,),
+            fetch=True
+        )
+        return result[0]
+    
+    async def get_crew_totals(self, guild_id: int) -> List[Tuple[int, int, int, int]]:
+        """Get each crew role's member count, coins held and coins ever earned"""
         result = await self._execute_query(
-            "SELECT user_id, balance, total_earned FROM users ORDER BY balance DESC LIMIT ?",
-            (limit,),
+            """SELECT c.role_id, COUNT(*), COALESCE(SUM(u.balance), 0), COALESCE(SUM(u.total_earned), 0)
+               FROM crew_members c LEFT JOIN users u ON u.guild_id = c.guild_id AND u.user_id = c.user_id
+               WHERE c.guild_id = ? GROUP BY c.role_id""",
+            (guild_id,),
             fetch=True
         )
         return result
     
-    async def get_user_stats(self, user_id: int) -> Tuple[int, int]:
+    async def get_user_stats(self, guild_id: int, user_id: int) -> Tuple[int, int]:
         """Get user's balance and total earned"""
         result = await self._execute_query(
-            "SELECT balance, total_earned FROM users WHERE user_id = ?",
-            (user_id,),
+            "SELECT balance, total_earned FROM users WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id),
             fetch=True
         )
         return result[0] if result else (0, 0)
     
-    async def can_use_steal_command(self, user_id: int) -> bool:
+    async def can_use_steal_command(self, guild_id: int, user_id: int) -> bool:
         """Check if user can use the steal command (rate limiting)"""
         result = await self._execute_query(
-            "SELECT last_steal_attempt FROM users WHERE user_id = ?",
-            (user_id,),
+            "SELECT last_steal_attempt FROM users WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id),
             fetch=True
         )
         
@@ -416,44 +640,44 @@ class Database:
         current_time = int(time.time())
         
         # 10 minutes cooldown for steal command
-        return current_time - last_steal >= 600
+        return current_time - last_steal >= STEAL_COMMAND_COOLDOWN
     
-    async def update_steal_cooldown(self, user_id: int):
+    async def update_steal_cooldown(self, guild_id: int, user_id: int):
         """Update the steal command cooldown"""
         current_time = int(time.time())
         await self._execute_query(
-            """INSERT OR REPLACE INTO users (user_id, last_steal_attempt, balance, total_earned)
-               VALUES (?, ?, COALESCE((SELECT balance FROM users WHERE user_id = ?), 0),
-                       COALESCE((SELECT total_earned FROM users WHERE user_id = ?), 0))""",
-            (user_id, current_time, user_id, user_id)
+            """INSERT INTO users (guild_id, user_id, last_steal_attempt) VALUES (?, ?, ?)
+               ON CONFLICT(guild_id, user_id) DO UPDATE SET last_steal_attempt = excluded.last_steal_attempt""",
+            (guild_id, user_id, current_time)
         )
     
-    async def transfer_coins(self, from_user_id: int, to_user_id: int, amount: int):
-        """Transfer coins from one user to another"""
-        # Ensure both users exist
-        await self._execute_query(
-            """INSERT OR IGNORE INTO users (user_id, balance, total_earned) 
-               VALUES (?, 0, 0)""",
-            (from_user_id,)
-        )
-        await self._execute_query(
-            """INSERT OR IGNORE INTO users (user_id, balance, total_earned) 
-               VALUES (?, 0, 0)""",
-            (to_user_id,)
-        )
+    async def transfer_coins(self, guild_id: int, from_user_id: int, to_user_id: int, amount: int) -> bool:
+        """Transfer coins from one user to another within a guild
         
-        # Remove coins from sender
-        await self._execute_query(
-            """UPDATE users 
-               SET balance = balance - ?
-               WHERE user_id = ?""",
-            (amount, from_user_id)
-        )
-        
-        # Add coins to receiver (but don't count as earned)
-        await self._execute_query(
-            """UPDATE users 
-               SET balance = balance + ?
-               WHERE user_id = ?""",
-            (amount, to_user_id)
-        )
+        Returns False, changing nothing, if the sender no longer has the
+        amount. The writer checks it, so this holds even when another process
+        spent the coins after the caller read the balance.
+        """
+        outcomes = await self._execute_many([
+            # Ensure both users exist
+            ("""INSERT OR IGNORE INTO users (guild_id, user_id, balance, total_earned) 
+                VALUES (?, ?, 0, 0)""",
+             (guild_id, from_user_id)),
+            ("""INSERT OR IGNORE INTO users (guild_id, user_id, balance, total_earned) 
+                VALUES (?, ?, 0, 0)""",
+             (guild_id, to_user_id)),
+            # Remove coins from sender, if they still have them
+            ("""UPDATE users 
+                SET balance = balance - ?
+                WHERE guild_id = ? AND user_id = ? AND balance >= ?""",
+             (amount, guild_id, from_user_id, amount)),
+            # Add coins to receiver (but don't count as earned), only if they were removed
+            ("""UPDATE users 
+                SET balance = balance + ?
+                WHERE guild_id = ? AND user_id = ? AND changes() = 1""",
+             (amount, guild_id, to_user_id))
+        ])
+        if outcomes[2] != 1:
+            return False
+        self.versions.bump((BALANCES, guild_id))
+        return True
@@ -0,0 +1,229 @@
+"""
+Item effects for No Man's Bot
+
+Every item's effect on /search and /steal is declared once here. A pirate's
+active consumables, inventory and crew status are compiled into a single
+Modifiers vector, cached per user and dropped whenever their items change,
+so commands read their odds with one lookup. The inventory read to compile
+them is cached alongside, so autocomplete can suggest items without a query.
+
+Invalidation only reaches the process that made the change. Where several
+processes serve one user's commands (interaction workers), modifiers are
+trusted for ``INTERACTIONS_EFFECT_CACHE_TTL`` instead, while suggestions
+keep using cached inventories.
+"""
+
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from bot.utils.constants import *
+
+
+class Effect(NamedTuple):
+    """What one item adds to a pirate's odds"""
+    coin_chance: int = 0
+    coin_multiplier: float = 0.0
+    steal_bonus: int = 0
+    crew_only: bool = False
+
+
+# Consumables switched on with /use; each search wears one use off
+ACTIVE_EFFECTS: Dict[str, Effect] = {
+    "Compass": Effect(coin_chance=15),
+    "Spyglass": Effect(coin_chance=20),
+}
+
+# Consumables the next search spends automatically if they're in the inventory
+AUTO_EFFECTS: Dict[str, Effect] = {
+    "Ship Maintenance": Effect(coin_chance=30, coin_multiplier=0.5, crew_only=True),
+    "Treasure Map": Effect(coin_chance=25, coin_multiplier=1.0, crew_only=True),
+}
+
+# Weapons equipped with /equip
+WEAPON_EFFECTS: Dict[str, Effect] = {
+    "Pirate Hook": Effect(steal_bonus=5),
+    "Cutlass": Effect(steal_bonus=10),
+    "Flintlock Pistol": Effect(steal_bonus=15),
+    "Flintlock Musket": Effect(steal_bonus=20),
+    "Cannon": Effect(steal_bonus=25),
+    "Grenade": Effect(steal_bonus=30),
+}
+
+
+class Modifiers(NamedTuple):
+    """Everything a pirate's items and crew add up to"""
+    coin_chance: int
+    item_chance: int
+    coin_multiplier: float
+    crew_multiplier: float
+    steal_bonus: int
+    # Active consumables as (item, uses left before this search)
+    worn: Tuple[Tuple[str, int], ...]
+    # Inventory items the next search uses up
+    spent: Tuple[str, ...]
+
+
+def weapon_bonus(weapon: Optional[str]) -> int:
+    """Steal success bonus of a weapon, in percent"""
+    return WEAPON_EFFECTS.get(weapon, Effect()).steal_bonus
+
+
+def compile_modifiers(effects: tuple, inventory: Dict[str, int], is_crew_member: bool) -> Modifiers:
+    """Fold a pirate's effects row, inventory and crew status into Modifiers"""
+    active_compass, active_spyglass, compass_dur, spyglass_dur, active_weapon = effects
+    coin_chance = SEARCH_COIN_CHANCE
+    coin_multiplier = 1.0
+    worn = []
+    spent = []
+
+    for item, active, durability in (("Compass", active_compass, compass_dur),
+                                     ("Spyglass", active_spyglass, spyglass_dur)):
+        if active:
+            coin_chance += ACTIVE_EFFECTS[item].coin_chance
+            coin_multiplier += ACTIVE_EFFECTS[item].coin_multiplier
+            worn.append((item, durability))
+
+    for item, effect in AUTO_EFFECTS.items():
+        if inventory.get(item, 0) > 0 and (is_crew_member or not effect.crew_only):
+            coin_chance += effect.coin_chance
+            coin_multiplier += effect.coin_multiplier
+            spent.append(item)
+
+    steal_bonus = weapon_bonus(active_weapon)
+    if is_crew_member:
+        steal_bonus += CREW_STEAL_BONUS
+
+    return Modifiers(
+        coin_chance=coin_chance,
+        item_chance=SEARCH_ITEM_CHANCE,
+        coin_multiplier=coin_multiplier,
+        crew_multiplier=CREW_BONUS_MULTIPLIER if is_crew_member else 1.0,
+        steal_bonus=steal_bonus,
+        worn=tuple(worn),
+        spent=tuple(spent),
+    )
+
+
+class EffectCache:
+    """Compiled Modifiers and inventories per user, dropped when the user's items change"""
+
+    def __init__(self, database, max_users: int = EFFECT_CACHE_SIZE, ttl: float = EFFECT_CACHE_TTL,
+                 suggestion_ttl: Optional[float] = None):
+        self.database = database
+        self.max_users = max_users
+        # How long modifiers, and the inventories compiled into them, are trusted
+        self.ttl = ttl
+        # How long an inventory may be used for autocomplete suggestions
+        self.suggestion_ttl = ttl if suggestion_ttl is None else suggestion_ttl
+        # (guild_id, user_id, is_crew_member) -> (compiled at, modifiers)
+        self._cache: "OrderedDict[Tuple[int, int, bool], Tuple[float, Modifiers]]" = OrderedDict()
+        # (guild_id, user_id) -> (read at, {item_name: quantity})
+        self._inventories: "OrderedDict[Tuple[int, int], Tuple[float, Dict[str, int]]]" = OrderedDict()
+        # Inventory reads started by prefetch_inventory and not finished yet
+        self._prefetching: Dict[Tuple[int, int], asyncio.Task] = {}
+        # So a read that raced an invalidation of the same user isn't stored:
+        # reads in flight per user, invalidations of those users since, and
+        # an epoch bumped by clear()
+        self._reading: Dict[Tuple[int, int], int] = {}
+        self._generations: Dict[Tuple[int, int], int] = {}
+        self._epoch = 0
+
+    def _begin_read(self, user: Tuple[int, int]) -> Tuple[int, int]:
+        """Note a read of a user's items; returns the token _end_read compares"""
+        self._reading[user] = self._reading.get(user, 0) + 1
+        return self._epoch, self._generations.get(user, 0)
+
+    def _end_read(self, user: Tuple[int, int], token: Tuple[int, int]) -> bool:
+        """Finish a read; True if nothing invalidated the user since it began"""
+        fresh = token == (self._epoch, self._generations.get(user, 0))
+        self._reading[user] -= 1
+        if not self._reading[user]:
+            del self._reading[user]
+            self._generations.pop(user, None)
+        return fresh
+
+    async def get(self, guild_id: int, user_id: int, is_crew_member: bool) -> Modifiers:
+        """A user's modifiers in a guild, compiling them on a miss"""
+        key = (guild_id, user_id, is_crew_member)
+        entry = self._cache.get(key)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            self._cache.move_to_end(key)
+            return entry[1]
+
+        token = self._begin_read((guild_id, user_id))
+        try:
+            effects = await self.database.get_user_effects(guild_id, user_id)
+            inventory = await self.get_inventory(guild_id, user_id)
+        finally:
+            fresh = self._end_read((guild_id, user_id), token)
+        modifiers = compile_modifiers(effects, inventory, is_crew_member)
+
+        if fresh:
+            self._cache[key] = (time.monotonic(), modifiers)
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.max_users:
+                self._cache.popitem(last=False)
+        return modifiers
+
+    def _cached_inventory(self, key: Tuple[int, int], ttl: float) -> Optional[Dict[str, int]]:
+        entry = self._inventories.get(key)
+        if entry and time.monotonic() - entry[0] < ttl:
+            self._inventories.move_to_end(key)
+            return entry[1]
+        return None
+
+    def peek_inventory(self, guild_id: int, user_id: int) -> Optional[Dict[str, int]]:
+        """A user's cached inventory for suggestions, or None without reading the database"""
+        return self._cached_inventory((guild_id, user_id), self.suggestion_ttl)
+
+    async def get_inventory(self, guild_id: int, user_id: int) -> Dict[str, int]:
+        """A user's inventory as {item_name: quantity}, reading it on a miss"""
+        key = (guild_id, user_id)
+        inventory = self._cached_inventory(key, self.ttl)
+        if inventory is not None:
+            return inventory
+
+        token = self._begin_read(key)
+        try:
+            inventory = dict(await self.database.get_user_inventory(guild_id, user_id))
+        finally:
+            fresh = self._end_read(key, token)
+        if fresh:
+            self._inventories[key] = (time.monotonic(), inventory)
+            self._inventories.move_to_end(key)
+            if len(self._inventories) > self.max_users:
+                self._inventories.popitem(last=False)
+        return inventory
+
+    def prefetch_inventory(self, guild_id: int, user_id: int):
+        """Read a user's inventory in the background unless it's cached or being read"""
+        key = (guild_id, user_id)
+        if key in self._prefetching or self.peek_inventory(guild_id, user_id) is not None:
+            return
+        task = asyncio.create_task(self.get_inventory(guild_id, user_id))
+        self._prefetching[key] = task
+
+        def done(task: asyncio.Task):
+            del self._prefetching[key]
+            # A failed prefetch just means the next lookup reads it again
+            if not task.cancelled():
+                task.exception()
+
+        task.add_done_callback(done)
+
+    def invalidate(self, guild_id: int, user_id: int):
+        """Forget a user's modifiers after an equip, use, expiry or inventory change"""
+        user = (guild_id, user_id)
+        if user in self._reading:
+            self._generations[user] = self._generations.get(user, 0) + 1
+        self._cache.pop((guild_id, user_id, False), None)
+        self._cache.pop((guild_id, user_id, True), None)
+        self._inventories.pop((guild_id, user_id), None)
+
+    def clear(self):
+        """Forget everyone's modifiers, e.g. after a bulk expiry"""
+        self._epoch += 1
+        self._cache.clear()
+        self._inventories.clear()
@@ -0,0 +1,413 @@
+"""
+HTTP interactions endpoint for No Man's Bot
+
+Instead of receiving slash commands over the gateway, Discord can POST them
+to an Interactions Endpoint URL. In that mode (``INTERACTIONS_WORKERS``)
+several worker processes each run the usual command tree behind
+``POST /interactions`` on the same port (SO_REUSEPORT, so the kernel spreads
+connections between them, or put a local load balancer in front). The
+gateway process keeps handling messages for passive earning, member updates
+for the crew index, and command sync.
+
+Every request is checked against the application's Ed25519 public key. The
+first response a command makes (a message, a defer or autocomplete choices)
+is captured and returned as the HTTP response; if there is none in time the
+endpoint defers, and a later reply edits the deferred message. Followups go
+to Discord's REST API as usual.
+
+PyNaCl is optional (the ``interactions`` extra); without it the endpoint
+raises RuntimeError on start.
+
+    python -m bot.interactions keygen
+    python -m bot.interactions serve --public-key HEX [--workers 4] [--db nomansbot.db]
+    python -m bot.interactions loadtest --seed HEX [--requests 10000] [--concurrency 100]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import secrets
+from typing import Dict, Optional
+
+try:
+    from nacl.exceptions import BadSignatureError
+    from nacl.signing import SigningKey, VerifyKey
+except ImportError:
+    VerifyKey = None
+
+import aiohttp
+import discord
+from aiohttp import web
+from discord.webhook.async_ import AsyncWebhookAdapter, async_context
+
+from bot.utils.constants import *
+
+logger = logging.getLogger(__name__)
+
+# Interaction and response types used here
+PING = 1
+APPLICATION_COMMAND = 2
+AUTOCOMPLETE = 4
+PONG = 1
+CHANNEL_MESSAGE = 4
+DEFERRED_CHANNEL_MESSAGE = 5
+AUTOCOMPLETE_RESULT = 8
+EPHEMERAL = 64
+
+
+def verify_signature(verify_key, signature: str, timestamp: str, body: bytes) -> bool:
+    """Check Discord's Ed25519 signature of ``timestamp + body`` and that it is recent"""
+    try:
+        if abs(time.time() - int(timestamp)) > INTERACTIONS_MAX_SKEW:
+            return False
+        verify_key.verify(timestamp.encode() + body, bytes.fromhex(signature))
+    except (ValueError, BadSignatureError):
+        return False
+    return True
+
+
+class _Pending:
+    """An interaction whose HTTP request is waiting for the command's first response"""
+
+    __slots__ = ("answer", "sent", "application_id", "interaction_type")
+
+    def __init__(self, data: dict):
+        self.answer: "asyncio.Future[dict]" = asyncio.get_running_loop().create_future()
+        self.sent = asyncio.Event()
+        self.application_id = int(data["application_id"])
+        self.interaction_type = data["type"]
+
+
+class HttpInteractionAdapter(AsyncWebhookAdapter):
+    """Webhook adapter that answers HTTP interactions in the HTTP response
+
+    discord.py sends every interaction callback through the adapter in its
+    ``async_context``; commands dispatched by the endpoint inherit this one.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._pending: Dict[int, _Pending] = {}
+
+    def expect(self, data: dict) -> _Pending:
+        pending = self._pending[int(data["id"])] = _Pending(data)
+        return pending
+
+    def forget(self, interaction_id: int):
+        self._pending.pop(interaction_id, None)
+
+    def sent(self, interaction_id: int):
+        """The HTTP response went out; a late reply may still edit it for a while"""
+        pending = self._pending.get(interaction_id)
+        if pending is None:
+            return
+        pending.sent.set()
+        if pending.answer.result()["type"] == DEFERRED_CHANNEL_MESSAGE:
+            asyncio.get_running_loop().call_later(INTERACTIONS_TOKEN_LIFETIME, self._pending.pop, interaction_id, None)
+        else:
+            self._pending.pop(interaction_id, None)
+
+    async def create_interaction_response(self, interaction_id: int, token: str, *, session: aiohttp.ClientSession,
+                                          proxy: Optional[str] = None, proxy_auth: Optional[aiohttp.BasicAuth] = None,
+                                          params):
+        pending = self._pending.get(interaction_id)
+        if pending is None:
+            return await super().create_interaction_response(
+                interaction_id, token, session=session, proxy=proxy, proxy_auth=proxy_auth, params=params
+            )
+
+        payload = params.payload
+        if params.files:
+            payload = json.loads(next(part["value"] for part in params.multipart if part["name"] == "payload_json"))
+        data = payload.get("data") or {}
+
+        if not pending.answer.done() and not params.files:
+            pending.answer.set_result(payload)
+        elif payload["type"] == CHANNEL_MESSAGE:
+            # Too late for the HTTP response, or carries files it can't: defer there, then edit
+            if not pending.answer.done():
+                pending.answer.set_result({"type": DEFERRED_CHANNEL_MESSAGE, "data": {"flags": data.get("flags", 0)}})
+            await pending.sent.wait()
+            self._pending.pop(interaction_id, None)
+            data = {key: value for key, value in data.items() if key != "flags"}
+            multipart = None
+            if params.files:
+                multipart = [{"name": "payload_json", "value": json.dumps(data)}]
+                multipart += [part for part in params.multipart if part["name"] != "payload_json"]
+            await self.edit_original_interaction_response(
+                pending.application_id, token, session=session, proxy=proxy, proxy_auth=proxy_auth,
+                payload=None if params.files else data, multipart=multipart, files=params.files
+            )
+
+        # What Discord's callback endpoint would have returned, minus the message
+        return {
+            "interaction": {
+                "id": str(interaction_id),
+                "type": pending.interaction_type,
+                "response_message_loading": payload["type"] == DEFERRED_CHANNEL_MESSAGE,
+                "response_message_ephemeral": bool(data.get("flags", 0) & EPHEMERAL),
+            }
+        }
+
+
+class InteractionServer:
+    """``POST /interactions``: verifies, dispatches to the command tree, answers over HTTP"""
+
+    def __init__(self, bot, public_key: str, host: str = INTERACTIONS_HOST, port: int = INTERACTIONS_PORT):
+        self.bot = bot
+        self.public_key = public_key
+        self.host = host
+        self.port = port
+        self.adapter = HttpInteractionAdapter()
+        # guild_id -> crew roles last copied into that guild's stand-in
+        self._guild_roles: Dict[int, Dict[int, str]] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._stopped = asyncio.Event()
+
+        self.app = web.Application()
+        self.app.add_routes([web.post("/interactions", self.handle)])
+
+    async def start(self):
+        """Listen on the shared port and keep crew roles fresh"""
+        if VerifyKey is None:
+            raise RuntimeError("The interactions endpoint needs PyNaCl; install the 'interactions' extra")
+        if not self.public_key:
+            raise RuntimeError("Set INTERACTIONS_PUBLIC_KEY to the application's public key")
+        self._verify_key = VerifyKey(bytes.fromhex(self.public_key))
+
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        # Every worker binds the same port; the kernel balances connections between them
+        await web.TCPSite(self._runner, self.host, self.port, reuse_port=True).start()
+        self._refresh_task = asyncio.create_task(self._refresh_crews(), name="interactions-crew-refresh")
+        logger.info(f"Interactions endpoint listening on http://{self.host}:{self.port}/interactions")
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        self._stopped.set()
+
+    async def serve_forever(self):
+        await self._stopped.wait()
+
+    async def _refresh_crews(self):
+        """Reload crew roles and membership written by other workers and the gateway"""
+        while True:
+            await asyncio.sleep(INTERACTIONS_CREW_REFRESH)
+            try:
+                await self.bot.crew_index.load()
+            except Exception as e:
+                logger.error(f"Failed to refresh the crew index: {e}")
+
+    def _prepare_guild(self, data: dict):
+        """Give the interaction a cached stand-in guild that knows the crew roles
+
+        Without the gateway there is no guild cache, so members' role IDs
+        wouldn't resolve and crew checks on ``member.roles`` would fail.
+        """
+        guild_id = int(data.get("guild_id") or 0)
+        if not guild_id:
+            return
+        state = self.bot._connection
+        guild = state._get_guild(guild_id)
+        if guild is None:
+            guild = discord.Guild._create_unavailable(state=state, guild_id=guild_id, data=data.get("guild"))
+            state._add_guild(guild)
+        crew_roles = self.bot.crew_index.get_crew_roles(guild_id)
+        if self._guild_roles.get(guild_id) != crew_roles:
+            guild._roles.clear()
+            for role_id, role_name in crew_roles.items():
+                guild._add_role(discord.Role(guild=guild, state=state, data={"id": role_id, "name": role_name}))
+            self._guild_roles[guild_id] = dict(crew_roles)
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        body = await request.read()
+        signature = request.headers.get("X-Signature-Ed25519", "")
+        timestamp = request.headers.get("X-Signature-Timestamp", "")
+        if not verify_signature(self._verify_key, signature, timestamp, body):
+            self.bot.metrics.inc("interactions.bad_signature")
+            return web.Response(status=401, text="invalid request signature")
+
+        data = json.loads(body)
+        if data["type"] == PING:
+            return web.json_response({"type": PONG})
+        if data["type"] not in (APPLICATION_COMMAND, AUTOCOMPLETE):
+            return web.Response(status=400, text="unsupported interaction type")
+
+        self.bot.metrics.inc("interactions.received")
+        self._prepare_guild(data)
+        pending = self.adapter.expect(data)
+        # The command's task copies this context, and with it the adapter
+        context = async_context.set(self.adapter)
+        try:
+            self.bot._connection.parse_interaction_create(data)
+        except Exception:
+            self.adapter.forget(int(data["id"]))
+            raise
+        finally:
+            async_context.reset(context)
+
+        try:
+            answer = await asyncio.wait_for(asyncio.shield(pending.answer), INTERACTIONS_ANSWER_TIMEOUT)
+        except asyncio.TimeoutError:
+            # The tree's own deadline timer normally defers before this
+            self.bot.metrics.inc("interactions.endpoint_deferred")
+            if data["type"] == AUTOCOMPLETE:
+                answer = {"type": AUTOCOMPLETE_RESULT, "data": {"choices": []}}
+            else:
+                answer = {"type": DEFERRED_CHANNEL_MESSAGE}
+            if not pending.answer.done():
+                pending.answer.set_result(answer)
+            answer = pending.answer.result()
+
+        response = web.json_response(answer)
+        await response.prepare(request)
+        await response.write_eof()
+        self.adapter.sent(int(data["id"]))
+        return response
+
+
+# Local stand-in for Discord: signs interactions and load-tests the endpoint
+
+def _command_payload(command: str, guild_id: int, user_id: int) -> dict:
+    """A minimal application command interaction, as Discord would send it"""
+    return {
+        "id": str(discord.utils.time_snowflake(discord.utils.utcnow()) + random.randrange(1 << 22)),
+        "application_id": "1",
+        "type": APPLICATION_COMMAND,
+        "token": secrets.token_urlsafe(32),
+        "version": 1,
+        "guild_id": str(guild_id),
+        "channel_id": str(guild_id),
+        "channel": {"id": str(guild_id), "type": 0, "guild_id": str(guild_id), "name": "general", "position": 0,
+                    "permission_overwrites": []},
+        "member": {
+            "user": {"id": str(user_id), "username": f"pirate{user_id}", "discriminator": "0", "avatar": None},
+            "roles": [],
+            "joined_at": "2024-01-01T00:00:00+00:00",
+            "deaf": False,
+            "mute": False,
+            "flags": 0,
+            "permissions": "0",
+        },
+        "app_permissions": "0",
+        "attachment_size_limit": 10 * 1024 * 1024,
+        "locale": "en-US",
+        "guild_locale": "en-US",
+        "data": {"id": "1", "name": command, "type": 1, "options": []},
+    }
+
+
+def _sign(signing_key, body: bytes) -> Dict[str, str]:
+    timestamp = str(int(time.time()))
+    signature = signing_key.sign(timestamp.encode() + body).signature.hex()
+    return {"X-Signature-Ed25519": signature, "X-Signature-Timestamp": timestamp,
+            "Content-Type": "application/json"}
+
+
+async def load_test(url: str, seed: str, requests: int, concurrency: int, command: str, guild_id: int, users: int):
+    """Send signed interactions and report throughput, latency and response types"""
+    signing_key = SigningKey(bytes.fromhex(seed))
+    latencies = []
+    outcomes: Dict[str, int] = {}
+    remaining = requests
+
+    async with aiohttp.ClientSession() as session:
+        # A forged request has to be refused before anything else is worth measuring
+        body = json.dumps({"type": PING}).encode()
+        headers = _sign(signing_key, body)
+        headers["X-Signature-Ed25519"] = "00" * 64
+        async with session.post(url, data=body, headers=headers) as response:
+            print(f"Forged signature: HTTP {response.status} (expected 401)")
+
+        async def client():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                if command == "ping":
+                    payload = {"type": PING}
+                else:
+                    payload = _command_payload(command, guild_id, random.randint(1, users))
+                body = json.dumps(payload).encode()
+                started = time.perf_counter()
+                async with session.post(url, data=body, headers=_sign(signing_key, body)) as response:
+                    if response.status == 200:
+                        outcome = f"type {(await response.json())['type']}"
+                    else:
+                        outcome = f"HTTP {response.status}"
+                latencies.append(time.perf_counter() - started)
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    print(f"{requests} /{command} interactions in {elapsed:.2f}s: {requests / elapsed:.0f}/s")
+    print(f"Latency p50 {percentile(0.5):.1f}ms, p95 {percentile(0.95):.1f}ms, p99 {percentile(0.99):.1f}ms, "
+          f"max {latencies[-1] * 1000:.1f}ms")
+    for outcome, count in sorted(outcomes.items()):
+        print(f"  {outcome}: {count}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bot.interactions", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("keygen", help="Generate a key pair for local testing")
+    serve = sub.add_parser("serve", help="Run the endpoint without Discord, for local load tests")
+    serve.add_argument("--public-key", default=os.getenv("INTERACTIONS_PUBLIC_KEY", ""))
+    serve.add_argument("--workers", type=int, default=2)
+    serve.add_argument("--db", default="nomansbot.db")
+    test = sub.add_parser("loadtest", help="Sign interactions and load-test an endpoint")
+    test.add_argument("--url", default=f"http://{INTERACTIONS_HOST}:{INTERACTIONS_PORT}/interactions")
+    test.add_argument("--seed", required=True, help="Signing key seed printed by keygen")
+    test.add_argument("--requests", type=int, default=10000)
+    test.add_argument("--concurrency", type=int, default=100)
+    test.add_argument("--command", default="balance", help="Slash command to send, or 'ping'")
+    test.add_argument("--guild", type=int, default=1)
+    test.add_argument("--users", type=int, default=1000, help="Distinct user IDs to send from")
+    args = parser.parse_args(argv)
+
+    if VerifyKey is None:
+        print("PyNaCl is not installed; install the 'interactions' extra")
+        return 1
+
+    if args.command == "keygen":
+        signing_key = SigningKey.generate()
+        print(f"seed:       {signing_key.encode().hex()}")
+        print(f"public key: {signing_key.verify_key.encode().hex()}")
+        return 0
+
+    if args.command == "serve":
+        if not args.public_key:
+            print("Pass --public-key (or set INTERACTIONS_PUBLIC_KEY)")
+            return 1
+        from bot.cluster import run_cluster
+        from main import NoMansBot
+        # Workers are forked and read the key from the environment
+        os.environ["INTERACTIONS_PUBLIC_KEY"] = args.public_key
+        # No token: workers don't log in, so only replies in the HTTP response work
+        run_cluster(NoMansBot, None, 0, interaction_workers=args.workers, db_path=args.db)
+        return 0
+
+    asyncio.run(load_test(args.url, args.seed, args.requests, args.concurrency, args.command, args.guild,
+                          args.users))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
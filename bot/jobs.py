@@ -0,0 +1,148 @@
+"""
+Scheduled economy jobs for No Man's Bot
+
+Interest, idle decay and item expiry each run as one set-based UPDATE over
+the users table, applied a small rowid range at a time. Each chunk commits
+together with the job's cursor, so a run interrupted by a restart picks up
+where it stopped without applying anything twice. Chunks shrink when group
+commits get slow and jobs wait while writes are queueing up.
+"""
+
+import time
+import random
+import asyncio
+import logging
+from typing import Callable, List, NamedTuple, Optional
+
+from bot.utils.constants import *
+
+logger = logging.getLogger(__name__)
+
+# Most recent activity of any kind, in epoch seconds: last_active is stamped by
+# earning, buying, selling, using and equipping; chat, /search and /steal keep
+# their own timestamps
+LAST_ACTIVE = ("MAX(COALESCE(last_active, 0), COALESCE(last_passive_earn, 0), "
+               "COALESCE(last_search_command, 0), COALESCE(last_steal_attempt, 0))")
+
+DAY = 86400
+
+# Cursor before the first rowid
+START = -(2 ** 63)
+
+
+class Job(NamedTuple):
+    """A periodic set-based update over users"""
+    name: str
+    interval: float
+    # UPDATE ... WHERE <condition> AND rowid > ? AND rowid <= ?
+    update: str
+    # Parameters before the rowid range, from the run's start time
+    params: Callable[[int], tuple]
+
+
+def default_jobs() -> List[Job]:
+    """Interest, idle decay and item expiry, skipping any with a zero interval"""
+    jobs = [
+        Job(
+            "interest", INTEREST_INTERVAL,
+            f"""UPDATE users
+                SET balance = balance + MIN(CAST(balance * ? AS INTEGER), ?),
+                    total_earned = total_earned + MIN(CAST(balance * ? AS INTEGER), ?)
+                WHERE balance > 0 AND {LAST_ACTIVE} >= ? AND rowid > ? AND rowid <= ?""",
+            lambda now: (INTEREST_RATE, INTEREST_MAX_PER_RUN, INTEREST_RATE, INTEREST_MAX_PER_RUN,
+                         now - INTEREST_ACTIVE_DAYS * DAY),
+        ),
+        Job(
+            "idle_decay", DECAY_INTERVAL,
+            f"""UPDATE users
+                SET balance = balance - CAST((balance - ?) * ? AS INTEGER)
+                WHERE balance > ? AND {LAST_ACTIVE} < ? AND rowid > ? AND rowid <= ?""",
+            lambda now: (DECAY_MIN_BALANCE, DECAY_RATE, DECAY_MIN_BALANCE, now - DECAY_IDLE_DAYS * DAY),
+        ),
+        Job(
+            "item_expiry", EXPIRY_INTERVAL,
+            f"""UPDATE users
+                SET active_weapon = NULL, active_compass = 0, compass_durability = 0,
+                    active_spyglass = 0, spyglass_durability = 0
+                WHERE (active_weapon IS NOT NULL OR active_compass = 1 OR active_spyglass = 1)
+                  AND {LAST_ACTIVE} < ? AND rowid > ? AND rowid <= ?""",
+            lambda now: (now - EXPIRY_IDLE_DAYS * DAY,),
+        ),
+    ]
+    return [job for job in jobs if job.interval > 0]
+
+
+class JobScheduler:
+    """Runs economy jobs on their cadence, in small resumable chunks"""
+
+    def __init__(self, bot, jobs: Optional[List[Job]] = None):
+        self.bot = bot
+        self.jobs = default_jobs() if jobs is None else jobs
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Start one loop per job"""
+        for job in self.jobs:
+            self._tasks.append(asyncio.create_task(self._loop(job), name=f"job-{job.name}"))
+
+    def stop(self):
+        """Stop all job loops; unfinished runs resume on the next start"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+    async def _loop(self, job: Job):
+        """Wait until the job is due, run it, repeat"""
+        while True:
+            last_run, started_at, cursor = await self.bot.database.get_job_state(job.name)
+            if not last_run and not started_at:
+                # First deployment: start the clock instead of running straight away
+                await self.bot.database.finish_job(job.name, int(time.time()))
+                continue
+            if not started_at:
+                # Jitter spreads jobs (and clusters sharing a database) apart
+                due = last_run + job.interval + random.uniform(0, job.interval * JOB_JITTER)
+                await asyncio.sleep(max(0.0, due - time.time()))
+            try:
+                await self.run(job, started_at, cursor)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Economy job {job.name} failed, will resume: {e}")
+                await asyncio.sleep(JOB_RETRY_DELAY)
+
+    async def run(self, job: Job, started_at: int = 0, cursor: int = START) -> int:
+        """Run a job to completion, resuming an interrupted run; returns rows changed"""
+        database = self.bot.database
+        if not started_at:
+            started_at, cursor = int(time.time()), START
+            await database.start_job(job.name, started_at, cursor)
+        params = job.params(started_at)
+        chunk = JOB_CHUNK_ROWS
+        changed = 0
+
+        while True:
+            # Economy jobs are the first thing to give way to queued writes; commit
+            # latency only updates on writes, so it sizes chunks rather than gating them
+            while database.write_queue_depth >= ADMISSION_ELEVATED_QUEUE_DEPTH:
+                await asyncio.sleep(JOB_BACKOFF)
+
+            upper = await database.get_rowid_bound(cursor, chunk)
+            if upper is None:
+                break
+            changed += await database.run_job_chunk(job.name, job.update, params, cursor, upper)
+            cursor = upper
+
+            # Keep each chunk's share of a group commit to a few milliseconds
+            if database.write_latency > JOB_CHUNK_TARGET:
+                chunk = max(JOB_MIN_CHUNK_ROWS, chunk // 2)
+            elif database.write_latency < JOB_CHUNK_TARGET / 2:
+                chunk = min(JOB_MAX_CHUNK_ROWS, chunk * 2)
+            await asyncio.sleep(JOB_CHUNK_PAUSE)
+
+        await database.finish_job(job.name, started_at)
+        if job.name == "item_expiry":
+            database.effects.clear()
+        self.bot.metrics.inc(f"jobs.{job.name}.rows", changed)
+        logger.info(f"Economy job {job.name} changed {changed:,} user(s) in {time.time() - started_at:.1f}s")
+        return changed
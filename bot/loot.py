@@ -0,0 +1,121 @@
+"""
+Loot tables for No Man's Bot
+
+Tables are read from ``bot/data/loot_tables.toml`` and compiled into alias
+tables (Vose's method), so drawing an item costs one random number and two
+list lookups however many items a table has.
+"""
+
+import os
+import random
+import logging
+import tomllib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from bot.utils.constants import *
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "data", "loot_tables.toml")
+
+
+class AliasTable:
+    """Weighted choice over a fixed set of items in constant time"""
+
+    def __init__(self, items: Sequence[str], weights: Sequence[float]):
+        if not items or len(items) != len(weights):
+            raise ValueError("A loot table needs one weight per item")
+        if any(weight < 0 for weight in weights) or sum(weights) <= 0:
+            raise ValueError("Loot weights must be non-negative and not all zero")
+
+        count = len(items)
+        total = sum(weights)
+        scaled = [weight * count / total for weight in weights]
+        self.items = list(items)
+        self.weights = list(weights)
+        self._prob = [1.0] * count
+        self._alias = list(range(count))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self._prob[less] = scaled[less]
+            self._alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left is 1.0 up to rounding error
+
+    def sample(self, rng: random.Random = random) -> str:
+        """Draw one item"""
+        # The integer part picks a column, the fractional part flips its coin
+        roll = rng.random() * len(self.items)
+        column = int(roll)
+        if roll - column < self._prob[column]:
+            return self.items[column]
+        return self.items[self._alias[column]]
+
+    def sample_many(self, count: int, rng: random.Random = random) -> List[str]:
+        """Draw several items at once, e.g. for a bulk event"""
+        items, prob, alias = self.items, self._prob, self._alias
+        size = len(items)
+        draw = rng.random
+        results = []
+        for _ in range(count):
+            roll = draw() * size
+            column = int(roll)
+            results.append(items[column] if roll - column < prob[column] else items[alias[column]])
+        return results
+
+
+class LootTables:
+    """Loot tables by tier, with optional per-guild overrides"""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self.tiers: Dict[str, AliasTable] = {}
+        # (guild_id, tier) -> table
+        self.guilds: Dict[Tuple[int, str], AliasTable] = {}
+
+    def load(self):
+        """Read and compile the tables, replacing any loaded before"""
+        with open(self.path, "rb") as f:
+            data = tomllib.load(f)
+
+        tiers = {tier: self._compile(table) for tier, table in data.get("tiers", {}).items()}
+        guilds = {}
+        for guild_id, guild_tiers in data.get("guilds", {}).items():
+            for tier, table in guild_tiers.items():
+                guilds[(int(guild_id), tier)] = self._compile(table)
+
+        if LOOT_TIER_DEFAULT not in tiers:
+            raise ValueError(f"{self.path} has no [tiers.{LOOT_TIER_DEFAULT}] table")
+        self.tiers, self.guilds = tiers, guilds
+        logger.info(f"Loaded {len(tiers)} loot tier(s) and {len(guilds)} guild override(s)")
+
+    @staticmethod
+    def _compile(table: Dict[str, float]) -> AliasTable:
+        """Turn an item -> weight mapping into an alias table"""
+        return AliasTable(list(table.keys()), list(table.values()))
+
+    def validate(self, known_items: Iterable[str]):
+        """Warn about items that don't exist in the shop"""
+        known = set(known_items)
+        for table in list(self.tiers.values()) + list(self.guilds.values()):
+            for item in table.items:
+                if item not in known:
+                    logger.warning(f"Loot table item {item!r} is not a shop item")
+                    known.add(item)
+
+    def table(self, guild_id: Optional[int], tier: str) -> AliasTable:
+        """The table for a tier in a guild, falling back to the default tier"""
+        table = self.guilds.get((guild_id, tier)) or self.tiers.get(tier)
+        return table or self.guilds.get((guild_id, LOOT_TIER_DEFAULT)) or self.tiers[LOOT_TIER_DEFAULT]
+
+    def draw(self, guild_id: Optional[int], tier: str) -> str:
+        """Draw one item for a pirate of the given tier"""
+        return self.table(guild_id, tier).sample()
+
+    def draw_many(self, guild_id: Optional[int], tier: str, count: int) -> List[str]:
+        """Draw many items from one table"""
+        return self.table(guild_id, tier).sample_many(count)
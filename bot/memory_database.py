@@ -0,0 +1,362 @@
+"""
+In-memory storage backend for No Man's Bot
+
+Implements ``EconomyRepository`` with plain dicts, one economy per guild, so
+tests, benchmarks and short-lived event servers run without touching disk.
+Every call completes without yielding, so each one is atomic on the event
+loop just as a single SQLite transaction is. Nothing survives a restart.
+"""
+
+import time
+import heapq
+from typing import Dict, List, Optional, Set, Tuple
+
+from bot.database import SHOP_ITEMS
+from bot.effects import EffectCache
+from bot.repository import ItemInfo, ShopItem, UserEffects
+from bot.utils.constants import *
+from bot.utils.locks import UserLockManager
+from bot.versions import BALANCES, CREWS, DataVersions
+
+
+class _User:
+    """One user's row in one guild's economy"""
+    __slots__ = ("balance", "total_earned", "last_passive_earn", "last_search_command", "last_steal_attempt",
+                 "last_active", "active_compass", "active_spyglass", "compass_durability", "spyglass_durability", "active_weapon")
+
+    def __init__(self):
+        self.balance = 0
+        self.total_earned = 0
+        self.last_passive_earn = 0
+        self.last_search_command = 0
+        self.last_steal_attempt = 0
+        self.last_active = 0
+        self.active_compass = 0
+        self.active_spyglass = 0
+        self.compass_durability = 0
+        self.spyglass_durability = 0
+        self.active_weapon: Optional[str] = None
+
+
+class MemoryDatabase:
+    """Dict-backed storage with the same behaviour as the SQLite Database"""
+
+    db_path = None
+
+    def __init__(self):
+        self.user_locks = UserLockManager()
+        self.effects = EffectCache(self)
+        self.versions = DataVersions()
+        # guild_id -> user_id -> row
+        self._users: Dict[int, Dict[int, _User]] = {}
+        # (guild_id, user_id) -> item_name -> quantity
+        self._inventory: Dict[Tuple[int, int], Dict[str, int]] = {}
+        # guild_id -> role_id -> (role_name, captain_role_id, first_mate_role_id)
+        self._crew_roles: Dict[int, Dict[int, Tuple[str, Optional[int], Optional[int]]]] = {}
+        # guild_id -> role_id -> user IDs
+        self._crew_members: Dict[int, Dict[int, Set[int]]] = {}
+        self._shop = {name: (item_type, price, crew_required, description)
+                      for name, item_type, price, crew_required, description in SHOP_ITEMS}
+
+    async def initialize(self):
+        """Nothing to set up"""
+
+    async def close(self):
+        """Nothing to flush"""
+
+    @property
+    def write_queue_depth(self) -> int:
+        """Writes never queue"""
+        return 0
+
+    @property
+    def write_latency(self) -> float:
+        """Writes take no measurable time"""
+        return 0.0
+
+    def _user(self, guild_id: int, user_id: int) -> _User:
+        """A user's row, created on first write"""
+        guild = self._users.setdefault(guild_id, {})
+        user = guild.get(user_id)
+        if user is None:
+            user = guild[user_id] = _User()
+        return user
+
+    def _find(self, guild_id: int, user_id: int) -> Optional[_User]:
+        """A user's row if they have one"""
+        return self._users.get(guild_id, {}).get(user_id)
+
+    async def get_user_balance(self, guild_id: int, user_id: int) -> int:
+        """Get user's coin balance"""
+        user = self._find(guild_id, user_id)
+        return user.balance if user else 0
+
+    async def get_user_stats(self, guild_id: int, user_id: int) -> Tuple[int, int]:
+        """Get user's balance and total earned"""
+        user = self._find(guild_id, user_id)
+        return (user.balance, user.total_earned) if user else (0, 0)
+
+    async def add_coins(self, guild_id: int, user_id: int, amount: int):
+        """Add coins to user's balance, counting as activity"""
+        user = self._user(guild_id, user_id)
+        user.balance += amount
+        user.total_earned += amount
+        user.last_active = int(time.time())
+        self.versions.bump((BALANCES, guild_id))
+
+    async def transfer_coins(self, guild_id: int, from_user_id: int, to_user_id: int, amount: int) -> bool:
+        """Transfer coins from one user to another within a guild; False if the sender lacks them"""
+        sender = self._user(guild_id, from_user_id)
+        receiver = self._user(guild_id, to_user_id)
+        if sender.balance < amount:
+            return False
+        sender.balance -= amount
+        receiver.balance += amount
+        self.versions.bump((BALANCES, guild_id))
+        return True
+
+    async def adjust_balances(self, guild_id: int, user_ids: List[int], mode: str, amount: int):
+        """Grant, deduct or set the balance of many users at once"""
+        for user_id in user_ids:
+            user = self._user(guild_id, user_id)
+            if mode == "grant":
+                user.balance += amount
+                user.total_earned += amount
+            elif mode == "deduct":
+                user.balance = max(user.balance - amount, 0)
+            else:
+                user.balance = amount
+        self.versions.bump((BALANCES, guild_id))
+
+    async def get_balances(self, guild_id: int, user_ids: List[int]) -> Dict[int, int]:
+        """Get the balances of many users at once; users never seen are left out"""
+        guild = self._users.get(guild_id, {})
+        return {user_id: guild[user_id].balance for user_id in user_ids if user_id in guild}
+
+    async def award_passive_coins(self, guild_id: int, user_id: int, amount: int):
+        """Add passive coins and restart the passive cooldown"""
+        await self.award_passive_coins_bulk([(guild_id, user_id, amount)])
+
+    async def award_passive_coins_bulk(self, awards: List[Tuple[int, int, int]]):
+        """Apply many passive awards as (guild_id, user_id, amount)"""
+        current_time = int(time.time())
+        for guild_id, user_id, amount in awards:
+            user = self._user(guild_id, user_id)
+            user.balance += amount
+            user.total_earned += amount
+            user.last_passive_earn = current_time
+        self.versions.bump(*{(BALANCES, guild_id) for guild_id, _, _ in awards})
+
+    async def get_leaderboard(self, guild_id: int, limit: int = 10, offset: int = 0) -> List[Tuple[int, int, int]]:
+        """Get a guild's top users by balance, skipping the first ``offset``"""
+        top = heapq.nlargest(offset + limit, self._users.get(guild_id, {}).items(), key=lambda item: item[1].balance)
+        return [(user_id, user.balance, user.total_earned) for user_id, user in top[offset:]]
+
+    async def get_user_rank(self, guild_id: int, user_id: int) -> Optional[int]:
+        """Get a user's position on their guild's leaderboard, or None without coins"""
+        user = self._find(guild_id, user_id)
+        if not user or user.balance <= 0:
+            return None
+        return 1 + sum(1 for other in self._users[guild_id].values() if other.balance > user.balance)
+
+    async def get_economy_totals(self, guild_id: int) -> Tuple[int, int, int]:
+        """Get a guild's user count, coins in circulation and coins ever earned"""
+        users = self._users.get(guild_id, {}).values()
+        return len(users), sum(user.balance for user in users), sum(user.total_earned for user in users)
+
+    async def get_crew_totals(self, guild_id: int) -> List[Tuple[int, int, int, int]]:
+        """Get each crew role's member count, coins held and coins ever earned"""
+        totals = []
+        for role_id, user_ids in self._crew_members.get(guild_id, {}).items():
+            if not user_ids:
+                continue
+            users = [user for user in (self._find(guild_id, user_id) for user_id in user_ids) if user]
+            totals.append((role_id, len(user_ids), sum(user.balance for user in users),
+                           sum(user.total_earned for user in users)))
+        return totals
+
+    def _cooldown_over(self, guild_id: int, user_id: int, column: str, cooldown: int) -> bool:
+        """Whether a user's cooldown stamped in a column has run out"""
+        user = self._find(guild_id, user_id)
+        return not user or int(time.time()) - getattr(user, column) >= cooldown
+
+    async def can_use_search_command(self, guild_id: int, user_id: int) -> bool:
+        """Check if user can use the search command (rate limiting)"""
+        return self._cooldown_over(guild_id, user_id, "last_search_command", SEARCH_COMMAND_COOLDOWN)
+
+    async def update_search_command_cooldown(self, guild_id: int, user_id: int):
+        """Update the search command cooldown"""
+        self._user(guild_id, user_id).last_search_command = int(time.time())
+
+    async def shorten_search_cooldown(self, guild_id: int, user_id: int, seconds: int):
+        """Move the user's last search back so the cooldown ends sooner"""
+        user = self._find(guild_id, user_id)
+        if user:
+            user.last_search_command -= seconds
+            user.last_active = int(time.time())
+
+    async def can_use_steal_command(self, guild_id: int, user_id: int) -> bool:
+        """Check if user can use the steal command (rate limiting)"""
+        return self._cooldown_over(guild_id, user_id, "last_steal_attempt", STEAL_COMMAND_COOLDOWN)
+
+    async def update_steal_cooldown(self, guild_id: int, user_id: int):
+        """Update the steal command cooldown"""
+        self._user(guild_id, user_id).last_steal_attempt = int(time.time())
+
+    async def get_shop_items(self, crew_required: Optional[int] = None) -> List[ShopItem]:
+        """Get shop items, optionally filtered by crew requirement"""
+        return [
+            (name, item_type, price, description)
+            for name, (item_type, price, required, description) in self._shop.items()
+            if crew_required is None or required == crew_required
+        ]
+
+    async def get_item_info(self, item_name: str) -> Optional[ItemInfo]:
+        """Get information about a specific item"""
+        return self._shop.get(item_name)
+
+    async def add_to_inventory(self, guild_id: int, user_id: int, item_name: str, quantity: int = 1):
+        """Add items to user's inventory"""
+        items = self._inventory.setdefault((guild_id, user_id), {})
+        items[item_name] = items.get(item_name, 0) + quantity
+        self.effects.invalidate(guild_id, user_id)
+
+    async def remove_from_inventory(self, guild_id: int, user_id: int, item_name: str, quantity: int = 1) -> bool:
+        """Remove items from user's inventory; False, changing nothing, if they hold fewer"""
+        items = self._inventory.get((guild_id, user_id), {})
+        self.effects.invalidate(guild_id, user_id)
+        if items.get(item_name, 0) < quantity:
+            return False
+        items[item_name] -= quantity
+        if items[item_name] <= 0:
+            del items[item_name]
+        return True
+
+    async def buy_item(self, guild_id: int, user_id: int, item_name: str, quantity: int, cost: int) -> bool:
+        """Take the cost from user's balance and add the items; False if the balance falls short"""
+        user = self._find(guild_id, user_id)
+        if not user or user.balance < cost:
+            return False
+        user.balance -= cost
+        user.total_earned -= cost
+        user.last_active = int(time.time())
+        items = self._inventory.setdefault((guild_id, user_id), {})
+        items[item_name] = items.get(item_name, 0) + quantity
+        self.effects.invalidate(guild_id, user_id)
+        self.versions.bump((BALANCES, guild_id))
+        return True
+
+    async def sell_item(self, guild_id: int, user_id: int, item_name: str, quantity: int, price: int) -> bool:
+        """Remove the items from user's inventory and pay them; False if they hold fewer"""
+        if not await self.remove_from_inventory(guild_id, user_id, item_name, quantity):
+            return False
+        user = self._user(guild_id, user_id)
+        user.balance += price
+        user.total_earned += price
+        user.last_active = int(time.time())
+        self.versions.bump((BALANCES, guild_id))
+        return True
+
+    async def get_user_inventory(self, guild_id: int, user_id: int) -> List[Tuple[str, int]]:
+        """Get user's inventory"""
+        items = self._inventory.get((guild_id, user_id), {})
+        return sorted((name, quantity) for name, quantity in items.items() if quantity > 0)
+
+    async def get_crew_inventory(self, guild_id: int, crew_role_id: int) -> List[Tuple[int, str, str, int]]:
+        """Get inventory for all members of a crew"""
+        return [
+            (user_id, 'Unknown', item_name, quantity)
+            for user_id in await self.get_crew_role_members(guild_id, crew_role_id)
+            for item_name, quantity in await self.get_user_inventory(guild_id, user_id)
+        ]
+
+    async def set_active_consumable(self, guild_id: int, user_id: int, consumable_type: str, durability: int = 10):
+        """Set active consumable (compass or spyglass)"""
+        user = self._user(guild_id, user_id)
+        if consumable_type == "Compass":
+            user.active_compass, user.compass_durability = 1, durability
+        elif consumable_type == "Spyglass":
+            user.active_spyglass, user.spyglass_durability = 1, durability
+        user.last_active = int(time.time())
+        self.effects.invalidate(guild_id, user_id)
+
+    async def set_active_weapon(self, guild_id: int, user_id: int, weapon_name: str):
+        """Set active weapon"""
+        user = self._user(guild_id, user_id)
+        user.active_weapon = weapon_name
+        user.last_active = int(time.time())
+        self.effects.invalidate(guild_id, user_id)
+
+    async def get_user_effects(self, guild_id: int, user_id: int) -> UserEffects:
+        """Get user's active effects (compass, spyglass, durabilities, weapon)"""
+        user = self._find(guild_id, user_id)
+        if not user:
+            return (0, 0, 0, 0, None)
+        return (user.active_compass, user.active_spyglass, user.compass_durability,
+                user.spyglass_durability, user.active_weapon)
+
+    async def reduce_consumable_durability(self, guild_id: int, user_id: int, consumable_type: str):
+        """Reduce durability of active consumable"""
+        user = self._find(guild_id, user_id)
+        if user and consumable_type == "Compass":
+            user.compass_durability -= 1
+            if user.compass_durability <= 0:
+                user.active_compass, user.compass_durability = 0, 0
+        elif user and consumable_type == "Spyglass":
+            user.spyglass_durability -= 1
+            if user.spyglass_durability <= 0:
+                user.active_spyglass, user.spyglass_durability = 0, 0
+        self.effects.invalidate(guild_id, user_id)
+
+    async def get_crew_roles(self, guild_id: int) -> List[int]:
+        """Get list of crew role IDs for a guild"""
+        return list(self._crew_roles.get(guild_id, {}))
+
+    async def get_crew_roles_with_names(self, guild_id: int) -> List[Tuple[int, str]]:
+        """Get crew roles with their names"""
+        return [(role_id, role[0]) for role_id, role in self._crew_roles.get(guild_id, {}).items()]
+
+    async def add_crew_role(self, guild_id: int, role_id: int, role_name: str,
+                            captain_role_id: Optional[int] = None, first_mate_role_id: Optional[int] = None):
+        """Add a crew role with captain and first mate roles"""
+        self._crew_roles.setdefault(guild_id, {})[role_id] = (role_name, captain_role_id, first_mate_role_id)
+        self.versions.bump((CREWS, guild_id))
+
+    async def remove_crew_role(self, guild_id: int, role_id: int):
+        """Remove a crew role and its membership index"""
+        self._crew_roles.get(guild_id, {}).pop(role_id, None)
+        self._crew_members.get(guild_id, {}).pop(role_id, None)
+        self.versions.bump((CREWS, guild_id))
+
+    async def get_all_crew_roles(self) -> List[Tuple[int, int, str]]:
+        """Get every configured crew role as (guild_id, role_id, role_name)"""
+        return [
+            (guild_id, role_id, role[0])
+            for guild_id, roles in self._crew_roles.items() for role_id, role in roles.items()
+        ]
+
+    async def get_all_crew_members(self) -> List[Tuple[int, int, int]]:
+        """Get the whole crew membership index as (guild_id, role_id, user_id)"""
+        return [
+            (guild_id, role_id, user_id)
+            for guild_id, roles in self._crew_members.items()
+            for role_id, user_ids in roles.items() for user_id in user_ids
+        ]
+
+    async def get_crew_role_members(self, guild_id: int, role_id: int) -> List[int]:
+        """Get the user IDs recorded for one crew role"""
+        return sorted(self._crew_members.get(guild_id, {}).get(role_id, ()))
+
+    async def set_member_crew_roles(self, guild_id: int, user_id: int, role_ids: List[int]):
+        """Replace the crew roles recorded for one member"""
+        roles = self._crew_members.setdefault(guild_id, {})
+        for user_ids in roles.values():
+            user_ids.discard(user_id)
+        for role_id in role_ids:
+            roles.setdefault(role_id, set()).add(user_id)
+        self.versions.bump((CREWS, guild_id))
+
+    async def replace_crew_role_members(self, guild_id: int, role_id: int, user_ids: List[int]):
+        """Replace every member recorded for one crew role"""
+        self._crew_members.setdefault(guild_id, {})[role_id] = set(user_ids)
+        self.versions.bump((CREWS, guild_id))
@@ -0,0 +1,395 @@
+"""
+Schema migrations for No Man's Bot
+
+The schema is built by an ordered list of migrations, each recorded in
+``schema_version`` once applied. A migration has two parts:
+
+- ``schema``: DDL applied at startup in one transaction together with its
+  version row. Keep it instant (create, rename, add column, index).
+- ``backfill``: optional data movement run in the background once the
+  writer is up, a chunk per transaction, so large tables change while the
+  bot keeps serving. It must be resumable; it is marked done when it
+  returns, unless it returns False to stay pending (e.g. until a setting
+  it needs is configured).
+
+Migrations written before this table existed are idempotent, so databases
+from any earlier release start at version 0 and converge. New migrations
+only ever get appended.
+
+After migrating, startup refreshes the planner's statistics and checks that
+every hot query is served by an index; a full table scan fails startup.
+"""
+
+import os
+import re
+import time
+import asyncio
+import logging
+import sqlite3
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Tuple
+
+from bot.utils.constants import *
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    """One step of the schema"""
+    version: int
+    name: str
+    # Instant DDL, run inside the migration's transaction
+    schema: Callable[[sqlite3.Cursor], None]
+    # Chunked data movement through the writer, run in the background
+    backfill: Optional[Callable[..., Awaitable[Optional[bool]]]] = None
+
+
+def _columns(cursor: sqlite3.Cursor, table: str) -> List[str]:
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+
+
+# Version 1 ------------------------------------------------------------------
+
+def _create_tables(cursor: sqlite3.Cursor):
+    """Tables that predate per-guild economies"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crew_roles (
+            guild_id INTEGER,
+            role_id INTEGER,
+            role_name TEXT,
+            captain_role_id INTEGER,
+            first_mate_role_id INTEGER,
+            PRIMARY KEY (guild_id, role_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crew_members (
+            guild_id INTEGER,
+            role_id INTEGER,
+            user_id INTEGER,
+            PRIMARY KEY (guild_id, role_id, user_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_state (
+            job TEXT PRIMARY KEY,
+            last_run INTEGER DEFAULT 0,
+            started_at INTEGER DEFAULT 0,
+            cursor INTEGER
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS shop_items (
+            item_name TEXT PRIMARY KEY,
+            item_type TEXT,
+            price INTEGER,
+            crew_required INTEGER DEFAULT 0,
+            description TEXT
+        )
+    """)
+
+
+# Version 2 ------------------------------------------------------------------
+
+def _crew_role_hierarchy(cursor: sqlite3.Cursor):
+    """Captain and first mate roles, missing from crew_roles created before them"""
+    columns = _columns(cursor, "crew_roles")
+    for column in ("captain_role_id", "first_mate_role_id"):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE crew_roles ADD COLUMN {column} INTEGER")
+
+
+# Version 3 ------------------------------------------------------------------
+
+# How each column of a pre-guild table merges into a row the user already has
+LEGACY_MERGES = {
+    "users": {
+        "balance": "balance + excluded.balance",
+        "total_earned": "total_earned + excluded.total_earned",
+        "last_passive_earn": "MAX(last_passive_earn, excluded.last_passive_earn)",
+        "last_search_command": "MAX(last_search_command, excluded.last_search_command)",
+        "last_steal_attempt": "MAX(last_steal_attempt, excluded.last_steal_attempt)",
+        "active_compass": "MAX(active_compass, excluded.active_compass)",
+        "active_spyglass": "MAX(active_spyglass, excluded.active_spyglass)",
+        "compass_durability": "MAX(compass_durability, excluded.compass_durability)",
+        "spyglass_durability": "MAX(spyglass_durability, excluded.spyglass_durability)",
+        "active_weapon": "COALESCE(active_weapon, excluded.active_weapon)",
+    },
+    "inventory": {
+        "item_name": None,
+        "quantity": "quantity + excluded.quantity",
+    },
+}
+
+
+def _legacy_merge(table: str, legacy_columns: List[str]) -> str:
+    """INSERT ... SELECT that merges legacy rows up to a rowid into a guild, given first"""
+    merges = LEGACY_MERGES[table]
+    columns = [column for column in merges if column in legacy_columns]
+    selected = [column if column in ("item_name", "active_weapon") else f"COALESCE({column}, 0)" for column in columns]
+    keys = ["guild_id", "user_id"] + (["item_name"] if table == "inventory" else [])
+    updates = [f"{column} = {merges[column]}" for column in columns if merges[column]]
+    return f"""INSERT INTO {table} (guild_id, user_id, {', '.join(columns)})
+               SELECT ?, user_id, {', '.join(selected)} FROM {table}_legacy WHERE rowid <= ?
+               ON CONFLICT({', '.join(keys)}) DO UPDATE SET {', '.join(updates)}"""
+
+
+def _guild_economy(cursor: sqlite3.Cursor):
+    """Per-guild users and inventory; pre-guild tables are renamed aside to drain"""
+    for table in LEGACY_MERGES:
+        columns = _columns(cursor, table)
+        if columns and "guild_id" not in columns:
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            guild_id INTEGER,
+            user_id INTEGER,
+            balance INTEGER DEFAULT 0,
+            last_passive_earn INTEGER DEFAULT 0,
+            last_search_command INTEGER DEFAULT 0,
+            last_steal_attempt INTEGER DEFAULT 0,
+            total_earned INTEGER DEFAULT 0,
+            active_compass INTEGER DEFAULT 0,
+            active_spyglass INTEGER DEFAULT 0,
+            compass_durability INTEGER DEFAULT 0,
+            spyglass_durability INTEGER DEFAULT 0,
+            active_weapon TEXT DEFAULT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    """)
+    # Leaderboards and ranks read a guild's slice in order
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_guild_balance ON users (guild_id, balance)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_guild_total_earned ON users (guild_id, total_earned)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS inventory (
+            guild_id INTEGER,
+            user_id INTEGER,
+            item_name TEXT,
+            quantity INTEGER DEFAULT 0,
+            PRIMARY KEY (guild_id, user_id, item_name)
+        )
+    """)
+
+
+async def drain_table(database, source: str, merge: str, params: tuple = ()) -> int:
+    """Move a table's rows elsewhere a chunk at a time, then drop it; returns rows moved
+
+    ``merge`` copies the rows of ``source`` up to a rowid, given as the last
+    parameter. Each chunk is merged and deleted from ``source`` in one
+    transaction, so the drain resumes where it stopped after a restart and
+    never copies a row twice.
+    """
+    moved = 0
+    while True:
+        result = await database._execute_query(
+            f"SELECT MAX(rowid), COUNT(*) FROM (SELECT rowid FROM {source} ORDER BY rowid LIMIT ?)",
+            (MIGRATION_CHUNK_ROWS,),
+            fetch=True
+        )
+        upper, count = result[0]
+        if upper is None:
+            break
+        await database._execute_many([
+            (merge, params + (upper,)),
+            (f"DELETE FROM {source} WHERE rowid <= ?", (upper,))
+        ])
+        moved += count
+        await asyncio.sleep(MIGRATION_CHUNK_PAUSE)
+    await database._execute_query(f"DROP TABLE {source}")
+    return moved
+
+
+async def _drain_legacy_economy(database) -> bool:
+    """Merge pre-guild users and inventory into LEGACY_GUILD_ID while the bot runs
+
+    No guild has ID 0, so until the operator names the guild the old economy
+    belongs to, the ``*_legacy`` tables are left untouched and this stays pending.
+    """
+    legacy_guild_id = int(os.getenv("LEGACY_GUILD_ID", LEGACY_GUILD_ID))
+    legacy = {}
+    for table in LEGACY_MERGES:
+        result = await database._execute_query(
+            "SELECT name FROM pragma_table_info(?)", (f"{table}_legacy",), fetch=True
+        )
+        if result:
+            legacy[table] = [row[0] for row in result]
+    if legacy and not legacy_guild_id:
+        logger.error(f"Balances and items from before per-guild economies are waiting in "
+                     f"{', '.join(f'{table}_legacy' for table in legacy)}. Set LEGACY_GUILD_ID (environment "
+                     f"or constants) to the guild they belong to and restart to move them there.")
+        return False
+
+    for table, columns in legacy.items():
+        moved = await drain_table(database, f"{table}_legacy", _legacy_merge(table, columns), (legacy_guild_id,))
+        # Merged rows can change anyone's items and balances
+        database.effects.clear()
+        database.versions.bump_all()
+        logger.info(f"Moved {moved:,} pre-guild {table} row(s) into guild {legacy_guild_id}")
+    return True
+
+
+# Version 4 ------------------------------------------------------------------
+
+def _crew_member_lookup(cursor: sqlite3.Cursor):
+    """Role updates replace one member's crews; the primary key leads with role_id"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_crew_members_user ON crew_members (guild_id, user_id)")
+
+
+# Version 5 ------------------------------------------------------------------
+
+def _last_active(cursor: sqlite3.Cursor):
+    """When a user last earned, traded or changed their gear, for the economy jobs"""
+    if "last_active" not in _columns(cursor, "users"):
+        cursor.execute("ALTER TABLE users ADD COLUMN last_active INTEGER DEFAULT 0")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create_tables", _create_tables),
+    Migration(2, "crew_role_hierarchy", _crew_role_hierarchy),
+    Migration(3, "guild_economy", _guild_economy, _drain_legacy_economy),
+    Migration(4, "crew_member_lookup", _crew_member_lookup),
+    Migration(5, "last_active", _last_active),
+]
+
+
+def migrate(conn: sqlite3.Connection, migrations: List[Migration] = MIGRATIONS) -> List[Migration]:
+    """Apply pending schema steps; returns migrations whose backfill hasn't finished
+
+    ``conn`` must be in autocommit mode (``isolation_level=None``) so each
+    migration gets its own transaction.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at INTEGER,
+            backfilled_at INTEGER
+        )
+    """)
+
+    for migration in migrations:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Checked under the write lock in case another process got here first
+            if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (migration.version,)).fetchone():
+                conn.execute("ROLLBACK")
+                continue
+            migration.schema(conn.cursor())
+            conn.execute(
+                "INSERT INTO schema_version (version, name, applied_at, backfilled_at) VALUES (?, ?, ?, ?)",
+                (migration.version, migration.name, int(time.time()),
+                 None if migration.backfill else int(time.time()))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"Applied schema migration {migration.version} ({migration.name})")
+
+    pending = {row[0] for row in conn.execute("SELECT version FROM schema_version WHERE backfilled_at IS NULL")}
+    return [migration for migration in migrations if migration.version in pending and migration.backfill]
+
+
+async def run_backfills(database, migrations: List[Migration]):
+    """Run unfinished backfills in order, marking each done as it completes"""
+    for migration in migrations:
+        started = time.monotonic()
+        try:
+            finished = await migration.backfill(database)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Backfill of schema migration {migration.version} failed, will resume on restart: {e}")
+            return
+        if finished is False:
+            # Waiting on configuration; later backfills must not depend on it
+            continue
+        await database._execute_query(
+            "UPDATE schema_version SET backfilled_at = ? WHERE version = ?",
+            (int(time.time()), migration.version)
+        )
+        logger.info(f"Backfilled schema migration {migration.version} ({migration.name}) "
+                    f"in {time.monotonic() - started:.1f}s")
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """Highest applied migration"""
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+# Queries on the command and message paths, with representative parameters
+HOT_QUERIES: List[Tuple[str, str, tuple]] = [
+    ("user row", "SELECT balance FROM users WHERE guild_id = ? AND user_id = ?", (1, 1)),
+    ("balances", "SELECT user_id, balance FROM users WHERE guild_id = ? AND user_id IN (?, ?)", (1, 1, 2)),
+    ("leaderboard", """SELECT user_id, balance, total_earned FROM users
+                       WHERE guild_id = ? ORDER BY balance DESC LIMIT ? OFFSET ?""", (1, 10, 0)),
+    ("rank", """SELECT (SELECT COUNT(*) FROM users WHERE guild_id = u.guild_id AND balance > u.balance) + 1
+                FROM users u WHERE u.guild_id = ? AND u.user_id = ? AND u.balance > 0""", (1, 1)),
+    ("economy totals", "SELECT COUNT(*), SUM(balance), SUM(total_earned) FROM users WHERE guild_id = ?", (1,)),
+    ("inventory", "SELECT item_name, quantity FROM inventory WHERE guild_id = ? AND user_id = ? AND quantity > 0",
+     (1, 1)),
+    ("inventory item", "UPDATE inventory SET quantity = quantity - ? WHERE guild_id = ? AND user_id = ? AND item_name = ?",
+     (1, 1, 1, "Compass")),
+    ("crew inventory", """SELECT i.user_id, i.item_name, i.quantity FROM crew_members c
+                          JOIN inventory i ON i.guild_id = c.guild_id AND i.user_id = c.user_id
+                          WHERE c.guild_id = ? AND c.role_id = ? AND i.quantity > 0""", (1, 1)),
+    ("crew roles", "SELECT role_id, role_name FROM crew_roles WHERE guild_id = ?", (1,)),
+    ("crew totals", """SELECT c.role_id, COUNT(*), SUM(u.balance), SUM(u.total_earned) FROM crew_members c
+                       LEFT JOIN users u ON u.guild_id = c.guild_id AND u.user_id = c.user_id
+                       WHERE c.guild_id = ? GROUP BY c.role_id""", (1,)),
+    ("crew role members", "SELECT user_id FROM crew_members WHERE guild_id = ? AND role_id = ?", (1, 1)),
+    ("member crews", "DELETE FROM crew_members WHERE guild_id = ? AND user_id = ?", (1, 1)),
+    ("item info", "SELECT item_type, price, crew_required, description FROM shop_items WHERE item_name = ?",
+     ("Compass",)),
+    ("job chunk", "UPDATE users SET balance = balance WHERE rowid > ? AND rowid <= ?", (0, 1000)),
+]
+
+
+# A table a query reads and its alias: FROM/JOIN/UPDATE/INTO <table> [[AS] <alias>]
+TABLE_REFERENCE = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)"
+    r"(?:\s+(?:AS\s+)?(?!(?:WHERE|JOIN|ON|LEFT|INNER|CROSS|GROUP|ORDER|LIMIT|SET|USING|VALUES)\b)(\w+))?",
+    re.IGNORECASE
+)
+
+
+def _scanned_table(detail: str, query: str) -> str:
+    """The table behind a SCAN step, which names it by its alias if it has one"""
+    words = detail.split()
+    # SQLite before 3.36 reports "SCAN TABLE <table> [AS <alias>]"
+    name = words[2] if words[1] == "TABLE" else words[1]
+    tables = {}
+    for table, alias in TABLE_REFERENCE.findall(query):
+        tables[table.lower()] = table
+        if alias:
+            tables[alias.lower()] = table
+    return tables.get(name.lower(), name)
+
+
+def check_query_plans(conn: sqlite3.Connection, queries: List[Tuple[str, str, tuple]] = HOT_QUERIES,
+                      min_rows: int = QUERY_PLAN_MIN_ROWS):
+    """Refresh planner statistics and raise if any hot query scans a whole table
+
+    With fresh statistics the planner rightly scans tables of a few rows
+    instead of using an index, so tables smaller than ``min_rows`` are exempt.
+    """
+    # Sample each index instead of reading it all, so this stays fast on big tables
+    conn.execute(f"PRAGMA analysis_limit = {QUERY_PLAN_ANALYSIS_LIMIT}")
+    conn.execute("ANALYZE")
+
+    scans = []
+    for name, query, params in queries:
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params):
+            detail = row[3]
+            if not detail.startswith("SCAN ") or detail.startswith("SCAN CONSTANT ROW"):
+                continue
+            table = _scanned_table(detail, query)
+            # The first number of each statistic is the table's estimated row count
+            rows = conn.execute(
+                "SELECT COALESCE(MAX(CAST(stat AS INTEGER)), 0) FROM sqlite_stat1 WHERE tbl = ?", (table,)
+            ).fetchone()[0]
+            if rows >= min_rows:
+                scans.append(f"{name}: {detail} (~{rows:,} rows)")
+    if scans:
+        raise RuntimeError("Hot queries fall back to full table scans:\n  " + "\n  ".join(scans))
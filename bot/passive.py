@@ -0,0 +1,63 @@
+"""
+Passive earning pre-filter for No Man's Bot
+
+Decides synchronously, without touching the database, whether a message can
+earn passive coins. Only messages that pass go on to the award step.
+
+Cooldowns live only in this process. Awards still stamp ``last_passive_earn``
+in the database (economy jobs count it as activity), but cooldowns never
+read it back, so a restart forgets running cooldowns: each member can earn
+at most one extra award per restart.
+"""
+
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from bot.utils.constants import *
+
+
+class PassiveFilter:
+    """In-memory eligibility check for passive earning"""
+
+    def __init__(self, cooldown: float = PASSIVE_COOLDOWN,
+                 min_length: int = PASSIVE_MIN_MESSAGE_LENGTH,
+                 channel_allowlist: Optional[Iterable[int]] = PASSIVE_CHANNEL_ALLOWLIST,
+                 max_tracked: int = PASSIVE_MAX_TRACKED_USERS):
+        self.cooldown = cooldown
+        self.min_length = min_length
+        self.channel_allowlist = frozenset(channel_allowlist or ())
+        self.max_tracked = max_tracked
+        # (guild_id, user_id) -> monotonic time of their next eligible message,
+        # since each guild keeps its own economy
+        self._next_eligible: Dict[Tuple[int, int], float] = {}
+
+    def admit(self, message) -> bool:
+        """Return True if the message should earn passive coins
+
+        Admitting a message starts the author's cooldown in that guild straight
+        away, so a burst of messages from one user produces a single award.
+        """
+        author = message.author
+        if author.bot or message.guild is None:
+            return False
+        if self.channel_allowlist and message.channel.id not in self.channel_allowlist:
+            return False
+        if len(message.content) < self.min_length:
+            return False
+
+        key = (message.guild.id, author.id)
+        now = time.monotonic()
+        if self._next_eligible.get(key, 0.0) > now:
+            return False
+
+        if len(self._next_eligible) >= self.max_tracked:
+            self._prune(now)
+        self._next_eligible[key] = now + self.cooldown
+        return True
+
+    def _prune(self, now: float):
+        """Forget members whose cooldown has already expired"""
+        self._next_eligible = {
+            key: ready_at for key, ready_at in self._next_eligible.items()
+            if ready_at > now
+        }
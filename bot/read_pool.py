@@ -0,0 +1,88 @@
+"""
+Read connection pool for No Man's Bot
+
+Read-only SQLite connections that serve queries in worker threads, so reads
+run in parallel with each other and with the writer under WAL.
+"""
+
+import asyncio
+import logging
+import sqlite3
+from typing import List, Tuple
+
+from bot.utils.constants import *
+
+logger = logging.getLogger(__name__)
+
+
+class ReadPool:
+    """A fixed-size pool of read-only connections"""
+
+    def __init__(self, db_path: str, size: int = DB_READ_POOL_SIZE):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._connections: List[sqlite3.Connection] = []
+        self._closing = False
+
+    async def start(self):
+        """Open the pool's connections"""
+        if self._connections:
+            return
+        self._closing = False
+        for _ in range(self.size):
+            conn = sqlite3.connect(
+                f"file:{self.db_path}?mode=ro", uri=True,
+                isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA query_only=1")
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        """Refuse new reads, wait for running ones, then close every connection
+
+        A connection closed under a read still running in its thread crashes
+        the interpreter, so each one is taken back from the pool first.
+        """
+        self._closing = True
+        for _ in self._connections:
+            await self._idle.get()
+        for conn in self._connections:
+            conn.close()
+        self._connections.clear()
+
+    async def fetch(self, query: str, params: tuple = ()) -> list:
+        """Run one read query and return all rows"""
+        results = await self.fetch_snapshot([(query, params)])
+        return results[0]
+
+    async def fetch_snapshot(self, queries: List[Tuple[str, tuple]]) -> List[list]:
+        """Run several read queries against one consistent snapshot"""
+        if self._closing:
+            raise RuntimeError("ReadPool is closed")
+        conn = await self._idle.get()
+        read = asyncio.ensure_future(asyncio.to_thread(self._run, conn, queries))
+
+        def release(read: asyncio.Future):
+            # A cancelled caller stops waiting, but the thread keeps using the
+            # connection until it finishes; only then does it go back
+            self._idle.put_nowait(conn)
+            if not read.cancelled():
+                read.exception()
+
+        read.add_done_callback(release)
+        return await asyncio.shield(read)
+
+    @staticmethod
+    def _run(conn: sqlite3.Connection, queries: List[Tuple[str, tuple]]) -> List[list]:
+        """Run queries inside a single read transaction"""
+        if len(queries) == 1:
+            query, params = queries[0]
+            return [conn.execute(query, params).fetchall()]
+
+        conn.execute("BEGIN")
+        try:
+            return [conn.execute(query, params).fetchall() for query, params in queries]
+        finally:
+            conn.execute("COMMIT")
@@ -0,0 +1,71 @@
+"""
+Rendered view cache for No Man's Bot
+
+Views that many users request and that change slowly (the shop, a guild's
+leaderboard, its crew roster) are built once per variant and kept as
+embeds. Each entry records the data versions it was rendered from and is
+rebuilt once one of them moves on. Views that still have to read their data
+can also pass it in: if it is unchanged the render is reused anyway.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple, Optional, Tuple
+
+import discord
+
+from bot.utils.constants import *
+from bot.utils.metrics import Metrics
+from bot.versions import DataVersions
+
+class _Entry(NamedTuple):
+    rendered_at: float
+    versions: Tuple[int, ...]
+    data: Any
+    embed: discord.Embed
+
+
+class RenderCache:
+    """Prebuilt embeds keyed by (view, variant...), invalidated by data versions"""
+
+    def __init__(self, versions: DataVersions, metrics: Metrics, max_entries: int = RENDER_CACHE_SIZE,
+                 ttl: float = RENDER_CACHE_TTL):
+        self.versions = versions
+        self.metrics = metrics
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._cache: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+
+    def _fresh(self, key: Hashable) -> Optional[_Entry]:
+        entry = self._cache.get(key)
+        if entry is None or time.monotonic() - entry.rendered_at >= self.ttl:
+            return None
+        return entry
+
+    def get(self, key: Hashable, versions: Tuple[int, ...]) -> Optional[discord.Embed]:
+        """A copy of the cached embed if it was rendered at these versions"""
+        entry = self._fresh(key)
+        if entry is None or entry.versions != versions:
+            self.metrics.inc("render.misses")
+            return None
+        self._cache.move_to_end(key)
+        self.metrics.inc("render.hits")
+        return entry.embed.copy()
+
+    def reuse(self, key: Hashable, versions: Tuple[int, ...], data: Any) -> Optional[discord.Embed]:
+        """After a miss: a copy of the cached embed if it was rendered from equal data"""
+        entry = self._fresh(key)
+        if entry is None or entry.data is None or entry.data != data:
+            return None
+        # Written to, but not in a way this view shows
+        self._cache[key] = entry._replace(versions=versions)
+        self._cache.move_to_end(key)
+        self.metrics.inc("render.reused")
+        return entry.embed.copy()
+
+    def put(self, key: Hashable, versions: Tuple[int, ...], embed: discord.Embed, data: Any = None):
+        """Keep an embed rendered from data at ``versions`` (taken before reading it)"""
+        self._cache[key] = _Entry(time.monotonic(), versions, data, embed.copy())
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
@@ -0,0 +1,114 @@
+"""
+Storage interface for No Man's Bot
+
+Everything the cogs, passive earning, admission control and the crew index
+need from storage is declared once here as ``EconomyRepository``. Two
+backends implement it:
+
+- ``sqlite`` (``bot/database.py``): the durable database, with group-commit
+  writes and a read pool; ``RemoteDatabase`` is its clustered variant
+- ``memory`` (``bot/memory_database.py``): plain dicts, for tests,
+  benchmarks and throwaway event servers; nothing survives a restart
+
+Pick one with ``STORAGE_BACKEND`` (or the environment variable of the same
+name). Backups, economy jobs and analytics read the SQLite file directly and
+are only available when ``db_path`` is set.
+"""
+
+from typing import Dict, List, Optional, Protocol, Tuple, runtime_checkable
+
+from bot.effects import EffectCache
+from bot.utils.constants import *
+from bot.utils.locks import UserLockManager
+from bot.versions import DataVersions
+
+# (active_compass, active_spyglass, compass_durability, spyglass_durability, active_weapon)
+UserEffects = Tuple[int, int, int, int, Optional[str]]
+# (item_name, item_type, price, description)
+ShopItem = Tuple[str, str, int, str]
+# (item_type, price, crew_required, description)
+ItemInfo = Tuple[str, int, int, str]
+
+BACKENDS = ("sqlite", "memory")
+
+
+@runtime_checkable
+class EconomyRepository(Protocol):
+    """Storage operations of the bot; every economy method is scoped to a guild"""
+
+    # SQLite file the backend persists to, or None if it keeps nothing on disk
+    db_path: Optional[str]
+    # Commands hold these around read-check-write sequences on a user
+    user_locks: UserLockManager
+    # Compiled item modifiers, dropped by every method that changes items
+    effects: EffectCache
+    # Bumped by every method that changes balances or crews
+    versions: DataVersions
+
+    async def initialize(self) -> None: ...
+    async def close(self) -> None: ...
+
+    @property
+    def write_queue_depth(self) -> int: ...
+    @property
+    def write_latency(self) -> float: ...
+
+    # Balances
+    async def get_user_balance(self, guild_id: int, user_id: int) -> int: ...
+    async def get_user_stats(self, guild_id: int, user_id: int) -> Tuple[int, int]: ...
+    async def add_coins(self, guild_id: int, user_id: int, amount: int) -> None: ...
+    async def transfer_coins(self, guild_id: int, from_user_id: int, to_user_id: int, amount: int) -> bool: ...
+    async def adjust_balances(self, guild_id: int, user_ids: List[int], mode: str, amount: int) -> None: ...
+    async def get_balances(self, guild_id: int, user_ids: List[int]) -> Dict[int, int]: ...
+    async def award_passive_coins(self, guild_id: int, user_id: int, amount: int) -> None: ...
+    async def award_passive_coins_bulk(self, awards: List[Tuple[int, int, int]]) -> None: ...
+
+    # Rankings
+    async def get_leaderboard(self, guild_id: int, limit: int = 10, offset: int = 0) -> List[Tuple[int, int, int]]: ...
+    async def get_user_rank(self, guild_id: int, user_id: int) -> Optional[int]: ...
+    async def get_economy_totals(self, guild_id: int) -> Tuple[int, int, int]: ...
+    async def get_crew_totals(self, guild_id: int) -> List[Tuple[int, int, int, int]]: ...
+
+    # Cooldowns
+    async def can_use_search_command(self, guild_id: int, user_id: int) -> bool: ...
+    async def update_search_command_cooldown(self, guild_id: int, user_id: int) -> None: ...
+    async def shorten_search_cooldown(self, guild_id: int, user_id: int, seconds: int) -> None: ...
+    async def can_use_steal_command(self, guild_id: int, user_id: int) -> bool: ...
+    async def update_steal_cooldown(self, guild_id: int, user_id: int) -> None: ...
+
+    # Items
+    async def get_shop_items(self, crew_required: Optional[int] = None) -> List[ShopItem]: ...
+    async def get_item_info(self, item_name: str) -> Optional[ItemInfo]: ...
+    async def add_to_inventory(self, guild_id: int, user_id: int, item_name: str, quantity: int = 1) -> None: ...
+    async def remove_from_inventory(self, guild_id: int, user_id: int, item_name: str, quantity: int = 1) -> bool: ...
+    async def buy_item(self, guild_id: int, user_id: int, item_name: str, quantity: int, cost: int) -> bool: ...
+    async def sell_item(self, guild_id: int, user_id: int, item_name: str, quantity: int, price: int) -> bool: ...
+    async def get_user_inventory(self, guild_id: int, user_id: int) -> List[Tuple[str, int]]: ...
+    async def get_crew_inventory(self, guild_id: int, crew_role_id: int) -> List[Tuple[int, str, str, int]]: ...
+    async def set_active_consumable(self, guild_id: int, user_id: int, consumable_type: str, durability: int = 10) -> None: ...
+    async def set_active_weapon(self, guild_id: int, user_id: int, weapon_name: str) -> None: ...
+    async def get_user_effects(self, guild_id: int, user_id: int) -> UserEffects: ...
+    async def reduce_consumable_durability(self, guild_id: int, user_id: int, consumable_type: str) -> None: ...
+
+    # Crews
+    async def get_crew_roles(self, guild_id: int) -> List[int]: ...
+    async def get_crew_roles_with_names(self, guild_id: int) -> List[Tuple[int, str]]: ...
+    async def add_crew_role(self, guild_id: int, role_id: int, role_name: str,
+                            captain_role_id: Optional[int] = None, first_mate_role_id: Optional[int] = None) -> None: ...
+    async def remove_crew_role(self, guild_id: int, role_id: int) -> None: ...
+    async def get_all_crew_roles(self) -> List[Tuple[int, int, str]]: ...
+    async def get_all_crew_members(self) -> List[Tuple[int, int, int]]: ...
+    async def get_crew_role_members(self, guild_id: int, role_id: int) -> List[int]: ...
+    async def set_member_crew_roles(self, guild_id: int, user_id: int, role_ids: List[int]) -> None: ...
+    async def replace_crew_role_members(self, guild_id: int, role_id: int, user_ids: List[int]) -> None: ...
+
+
+def create_database(backend: str = STORAGE_BACKEND, db_path: str = "nomansbot.db") -> EconomyRepository:
+    """Build the configured storage backend"""
+    if backend == "sqlite":
+        from bot.database import Database
+        return Database(db_path)
+    if backend == "memory":
+        from bot.memory_database import MemoryDatabase
+        return MemoryDatabase()
+    raise ValueError(f"Unknown storage backend {backend!r} (expected one of {', '.join(BACKENDS)})")
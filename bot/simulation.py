@@ -0,0 +1,314 @@
+"""
+Offline economy simulator for No Man's Bot
+
+Plays the bot's passive earning, /daily, /search and /steal rules for a
+population of simulated pirates one day at a time, with every step
+vectorized across users in NumPy. The rules come from the same constants,
+item effects, loot tables and shop catalogue the bot uses, so a tuning
+change can be tried here before it ships.
+
+NumPy is only needed for the simulator, not the bot:
+
+    pip install numpy
+    python -m bot.simulation [--users 100000] [--days 30] [--set NAME=VALUE] [--price ITEM=N]
+"""
+
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from bot import effects
+from bot.analytics import gini
+from bot.database import SHOP_ITEMS
+from bot.loot import LootTables
+from bot.utils.constants import *
+
+SECONDS_PER_DAY = 86400
+
+
+class Simulation:
+    """A population of pirates and the coins and items they hold"""
+
+    def __init__(self, users: int, crew_share: float = 0.3, messages: float = 40, searches: float = 8,
+                 steals: float = 1, daily: float = 0.5, shopping: float = 0.3,
+                 prices: Dict[str, int] = None, seed: int = None):
+        self.users = users
+        self.messages = messages
+        self.searches = searches
+        self.steals = steals
+        self.daily = daily
+        self.shopping = shopping
+        self.rng = np.random.default_rng(seed)
+
+        # Catalogue, with any price overrides
+        prices = prices or {}
+        self.items: List[str] = [item[0] for item in SHOP_ITEMS]
+        self.column = {item: i for i, item in enumerate(self.items)}
+        self.price = np.array([prices.get(item[0], item[2]) for item in SHOP_ITEMS], dtype=np.int64)
+        self.crew_only = np.array([bool(item[3]) for item in SHOP_ITEMS])
+        self.weapon_bonus = np.array(
+            [effects.weapon_bonus(item[0]) if item[1] == "weapon" else 0 for item in SHOP_ITEMS], dtype=np.int64
+        )
+
+        # Loot tables as item columns and probabilities
+        tables = LootTables()
+        tables.load()
+        self.loot = {}
+        for tier in (LOOT_TIER_DEFAULT, LOOT_TIER_CREW):
+            table = tables.table(None, tier)
+            weights = np.array(table.weights, dtype=np.float64)
+            self.loot[tier] = (np.array([self.column[item] for item in table.items]), weights / weights.sum())
+
+        # Per-user state
+        self.crew = self.rng.random(users) < crew_share
+        self.balance = np.zeros(users, dtype=np.int64)
+        # One row per item so per-item updates touch contiguous memory
+        self.inventory = np.zeros((len(self.items), users), dtype=np.int32)
+        # Uses left on each active consumable
+        self.uses = {item: np.zeros(users, dtype=np.int32) for item in effects.ACTIVE_EFFECTS}
+
+        # Totals over the whole run
+        self.day = 0
+        self.minted: Dict[str, int] = {"passive": 0, "daily": 0, "search": 0}
+        self.spent = 0
+        self.stolen = 0
+        self.found = np.zeros(len(self.items), dtype=np.int64)
+        self.bought = np.zeros(len(self.items), dtype=np.int64)
+        self.money_supply: List[int] = [0]
+
+    def _mint(self, source: str, users: np.ndarray, amounts: np.ndarray):
+        """Create coins for distinct users"""
+        self.balance[users] += amounts
+        self.minted[source] += int(amounts.sum())
+
+    def run(self, days: int):
+        """Simulate a number of days"""
+        for _ in range(days):
+            self.step()
+
+    def step(self):
+        """Simulate one day"""
+        everyone = np.arange(self.users)
+        crew_multiplier = np.where(self.crew, CREW_BONUS_MULTIPLIER, 1.0)
+
+        # Passive earning: at most one award per cooldown, however chatty
+        awards = np.minimum(self.rng.poisson(self.messages, self.users), SECONDS_PER_DAY // PASSIVE_COOLDOWN)
+        per_award = (BASE_PASSIVE_COINS * crew_multiplier).astype(np.int64)
+        self._mint("passive", everyone, awards * per_award)
+
+        # /daily
+        claims = self.rng.random(self.users) < self.daily
+        self._mint("daily", everyone[claims], (DAILY_REWARD * crew_multiplier[claims]).astype(np.int64))
+
+        searches = np.minimum(self.rng.poisson(self.searches, self.users), SECONDS_PER_DAY // SEARCH_COMMAND_COOLDOWN)
+        for slot in range(int(searches.max(initial=0))):
+            self._search(np.nonzero(searches > slot)[0])
+
+        steals = np.minimum(self.rng.poisson(self.steals, self.users), SECONDS_PER_DAY // STEAL_COMMAND_COOLDOWN)
+        for slot in range(int(steals.max(initial=0))):
+            self._steal(np.nonzero(steals > slot)[0])
+
+        self._shop()
+        self.day += 1
+        self.money_supply.append(int(self.balance.sum()))
+
+    def _search(self, users: np.ndarray):
+        """One /search for each of the given users"""
+        crew = self.crew[users]
+        coin_chance = np.full(len(users), SEARCH_COIN_CHANCE, dtype=np.int64)
+        coin_multiplier = np.ones(len(users))
+
+        # Active consumables add their bonus and wear down
+        for item, effect in effects.ACTIVE_EFFECTS.items():
+            uses = self.uses[item]
+            active = uses[users] > 0
+            coin_chance += active * effect.coin_chance
+            coin_multiplier += active * effect.coin_multiplier
+            uses[users[active]] -= 1
+
+        # Auto-used items are spent by the search
+        for item, effect in effects.AUTO_EFFECTS.items():
+            column = self.column[item]
+            held = (self.inventory[column, users] > 0) & (crew | (not effect.crew_only))
+            coin_chance += held * effect.coin_chance
+            coin_multiplier += held * effect.coin_multiplier
+            self.inventory[column, users[held]] -= 1
+
+        # Coins
+        hit = self.rng.integers(1, 101, len(users)) <= coin_chance
+        base = self.rng.integers(SEARCH_MIN_COINS, SEARCH_MAX_COINS + 1, int(hit.sum()))
+        found = (base * coin_multiplier[hit]).astype(np.int64)
+        found = (found * np.where(crew[hit], CREW_BONUS_MULTIPLIER, 1.0)).astype(np.int64)
+        self._mint("search", users[hit], found)
+
+        # Items
+        hit = self.rng.integers(1, 101, len(users)) <= SEARCH_ITEM_CHANCE
+        for tier, in_tier in ((LOOT_TIER_CREW, crew), (LOOT_TIER_DEFAULT, ~crew)):
+            finders = users[hit & in_tier]
+            columns, probabilities = self.loot[tier]
+            drawn = columns[self.rng.choice(len(columns), len(finders), p=probabilities)]
+            self.inventory[drawn, finders] += 1
+            self.found += np.bincount(drawn, minlength=len(self.items))
+
+        self._use_found_consumables(users)
+
+    def _use_found_consumables(self, users: np.ndarray):
+        """Pirates /use a Compass or Spyglass they hold once the last one breaks"""
+        for item in effects.ACTIVE_EFFECTS:
+            column = self.column[item]
+            ready = users[(self.uses[item][users] == 0) & (self.inventory[column, users] > 0)]
+            self.inventory[column, ready] -= 1
+            self.uses[item][ready] = CONSUMABLE_USES
+
+    def _best_weapon_bonus(self, users: np.ndarray) -> np.ndarray:
+        """Steal bonus of the best weapon each user holds (it gets equipped)"""
+        bonus = np.zeros(len(users), dtype=np.int64)
+        for column in np.nonzero(self.weapon_bonus)[0]:
+            held = self.inventory[column, users] > 0
+            bonus = np.where(held, np.maximum(bonus, self.weapon_bonus[column]), bonus)
+        return bonus
+
+    def _steal(self, thieves: np.ndarray):
+        """One /steal for each of the given thieves against a random victim"""
+        victims = self.rng.integers(0, self.users, len(thieves))
+
+        # Each pirate takes part in at most one heist per round, so transfers never overdraw
+        keep = (victims != thieves) & ~np.isin(victims, thieves)
+        thieves, victims = thieves[keep], victims[keep]
+        _, first = np.unique(victims, return_index=True)
+        thieves, victims = thieves[first], victims[first]
+
+        victim_balance = self.balance[victims]
+        worth_it = victim_balance >= MIN_STEAL_AMOUNT
+        thieves, victims, victim_balance = thieves[worth_it], victims[worth_it], victim_balance[worth_it]
+
+        chance = (BASE_STEAL_SUCCESS_CHANCE + self._best_weapon_bonus(thieves)
+                  + self.crew[thieves] * CREW_STEAL_BONUS - self.crew[victims] * CREW_PROTECTION_BONUS)
+        chance = np.clip(chance, MIN_STEAL_SUCCESS_CHANCE, MAX_STEAL_SUCCESS_CHANCE)
+        success = self.rng.integers(1, 101, len(thieves)) <= chance
+
+        # Success: take a share of the victim's balance
+        share = self.rng.uniform(STEAL_MIN_SHARE, STEAL_MAX_SHARE, len(thieves))
+        amount = np.clip((victim_balance * share).astype(np.int64), MIN_STEAL_AMOUNT, MAX_STEAL_AMOUNT)
+        amount = np.minimum(amount, victim_balance)
+
+        # Failure: the thief pays the victim a small penalty, if they can
+        thief_balance = self.balance[thieves]
+        high = np.minimum(STEAL_PENALTY_MAX, thief_balance)
+        penalty = STEAL_PENALTY_MIN + (self.rng.random(len(thieves)) * (high - STEAL_PENALTY_MIN + 1)).astype(np.int64)
+        penalty = np.where(thief_balance >= STEAL_PENALTY_MIN, penalty, 0)
+
+        transfer = np.where(success, amount, -penalty)
+        self.balance[thieves] += transfer
+        self.balance[victims] -= transfer
+        self.stolen += int(amount[success].sum())
+
+    def _shop(self):
+        """Some pirates buy one thing a day: a Compass or Spyglass, else a weapon upgrade"""
+        shoppers = np.nonzero(self.rng.random(self.users) < self.shopping)[0]
+        choice = np.full(len(shoppers), -1)
+        balance = self.balance[shoppers]
+
+        # Weapons first, cheapest to dearest, so the dearest affordable upgrade wins...
+        current = self._best_weapon_bonus(shoppers)
+        for column in np.argsort(self.price):
+            if not self.weapon_bonus[column]:
+                continue
+            allowed = self.crew[shoppers] | (not self.crew_only[column])
+            better = self.weapon_bonus[column] > current
+            choice = np.where(allowed & better & (balance >= self.price[column]), column, choice)
+
+        # ...but a pirate whose Compass or Spyglass has broken replaces it instead
+        for item in effects.ACTIVE_EFFECTS:
+            column = self.column[item]
+            needed = (self.uses[item][shoppers] == 0) & (self.inventory[column, shoppers] == 0)
+            choice = np.where(needed & (balance >= self.price[column]), column, choice)
+
+        buying = choice >= 0
+        buyers, columns = shoppers[buying], choice[buying]
+        cost = self.price[columns]
+        self.balance[buyers] -= cost
+        self.inventory[columns, buyers] += 1
+        self.spent += int(cost.sum())
+        self.bought += np.bincount(columns, minlength=len(self.items))
+        self._use_found_consumables(buyers)
+
+    def report(self) -> str:
+        """Balance distribution, inflation and item supply as text"""
+        balance = self.balance
+        supply = self.money_supply
+        week = min(7, self.day)
+        daily_growth = (supply[-1] / supply[-1 - week]) ** (1 / week) - 1 if week and supply[-1 - week] else 0.0
+        minted = sum(self.minted.values())
+        percentiles = np.percentile(balance, [10, 25, 50, 75, 90, 99])
+
+        lines = [
+            f"{self.users:,} pirates over {self.day} days ({self.crew.mean():.0%} in a crew)",
+            "",
+            "Balances",
+            f"  mean {balance.mean():,.0f}   max {balance.max():,}   gini {gini(balance):.3f}",
+            "  " + "   ".join(f"p{q} {v:,.0f}" for q, v in zip((10, 25, 50, 75, 90, 99), percentiles)),
+            f"  crew median {np.median(balance[self.crew]):,.0f}   others median {np.median(balance[~self.crew]):,.0f}",
+            "",
+            "Money supply",
+            f"  {supply[-1]:,} coins; {daily_growth:.2%}/day over the last {week} day(s)",
+            "  minted " + ", ".join(f"{source} {amount:,} ({amount / minted:.0%})" for source, amount in self.minted.items())
+            if minted else "  minted nothing",
+            f"  spent in the shop {self.spent:,}; stolen {self.stolen:,}",
+            "",
+            f"{'Item supply':<20}{'found':>12}{'bought':>12}{'held':>12}",
+        ]
+        held = self.inventory.sum(axis=1)
+        for column, item in enumerate(self.items):
+            lines.append(f"  {item:<18}{self.found[column]:>12,}{self.bought[column]:>12,}{held[column]:>12,}")
+        return "\n".join(lines)
+
+
+def _parse_pairs(pairs: List[str], cast) -> Dict[str, float]:
+    """Turn NAME=VALUE arguments into a dict"""
+    parsed = {}
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        parsed[name.strip()] = cast(value)
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--crew-share", type=float, default=0.3, help="share of pirates in a crew")
+    parser.add_argument("--messages", type=float, default=40, help="messages per pirate per day")
+    parser.add_argument("--searches", type=float, default=8, help="/search uses per pirate per day")
+    parser.add_argument("--steals", type=float, default=1, help="/steal uses per pirate per day")
+    parser.add_argument("--daily", type=float, default=0.5, help="chance a pirate claims /daily each day")
+    parser.add_argument("--shopping", type=float, default=0.3, help="chance a pirate visits the shop each day")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="override a constant, e.g. BASE_STEAL_SUCCESS_CHANCE=45")
+    parser.add_argument("--price", action="append", default=[], metavar="ITEM=N",
+                        help="override a shop price, e.g. Compass=80")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    # The rules read constants from this module's globals, so overrides land there
+    for name, value in _parse_pairs(args.set, float).items():
+        if name not in globals():
+            parser.error(f"unknown constant {name}")
+        globals()[name] = type(globals()[name])(value)
+
+    simulation = Simulation(
+        args.users, crew_share=args.crew_share, messages=args.messages, searches=args.searches,
+        steals=args.steals, daily=args.daily, shopping=args.shopping,
+        prices=_parse_pairs(args.price, int), seed=args.seed,
+    )
+    start = time.perf_counter()
+    simulation.run(args.days)
+    elapsed = time.perf_counter() - start
+    print(simulation.report())
+    print(f"\nSimulated in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Application command tree for No Man's Bot
+
+Discord drops an interaction that isn't acknowledged within three seconds.
+The tree times every command and acknowledges for it when it can't answer
+in time: commands whose recent p95 is close to the deadline are deferred
+before their callback runs, and any other command still silent near the
+deadline is deferred by a timer. The callback keeps running and completes
+through ``send_response``, which follows up once the interaction has been
+acknowledged. Deferring is public, so an ephemeral reply to a deferred
+command deletes the public "thinking" message and follows up privately.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import discord
+from discord import app_commands
+
+from bot.utils.constants import *
+
+logger = logging.getLogger(__name__)
+
+# Discord's error code for an interaction that expired unacknowledged
+UNKNOWN_INTERACTION = 10062
+
+
+def _command_name(interaction: discord.Interaction) -> str:
+    return interaction.command.qualified_name if interaction.command else "unknown"
+
+
+def _ack_lock(interaction: discord.Interaction) -> asyncio.Lock:
+    """Serializes acknowledgements so a timer's defer can't race the command's reply"""
+    lock = interaction.extras.get("ack_lock")
+    if lock is None:
+        lock = interaction.extras["ack_lock"] = asyncio.Lock()
+    return lock
+
+
+def _ack_timed_out(interaction: discord.Interaction):
+    name = _command_name(interaction)
+    interaction.extras["ack_timed_out"] = True
+    interaction.client.metrics.inc(f"commands.{name}.ack_timeouts")
+    logger.warning(f"/{name} missed Discord's acknowledgement deadline")
+
+
+async def defer_response(interaction: discord.Interaction, *, thinking: bool = True,
+                         ephemeral: bool = False) -> bool:
+    """Acknowledge an interaction unless it already was; returns whether this call did"""
+    async with _ack_lock(interaction):
+        if interaction.response.is_done() or interaction.extras.get("ack_timed_out"):
+            return False
+        try:
+            await interaction.response.defer(thinking=thinking, ephemeral=ephemeral)
+        except discord.NotFound as e:
+            if e.code != UNKNOWN_INTERACTION:
+                raise
+            _ack_timed_out(interaction)
+            return False
+        interaction.extras["deferred_ephemeral"] = ephemeral
+        return True
+
+
+async def send_response(interaction: discord.Interaction, content: Optional[str] = None, **kwargs):
+    """Reply to an interaction, or follow up if it has been deferred
+
+    After a defer the first followup replaces the "thinking" message and
+    keeps the visibility chosen when deferring. An ephemeral reply to a
+    public defer deletes that message first, so it stays private.
+    """
+    async with _ack_lock(interaction):
+        if interaction.extras.get("ack_timed_out"):
+            return
+        if not interaction.response.is_done():
+            try:
+                await interaction.response.send_message(content, **kwargs)
+            except discord.NotFound as e:
+                if e.code != UNKNOWN_INTERACTION:
+                    raise
+                _ack_timed_out(interaction)
+            else:
+                interaction.extras["replied"] = True
+            return
+    if (kwargs.get("ephemeral") and not interaction.extras.get("replied")
+            and not interaction.extras.get("deferred_ephemeral", True)):
+        try:
+            await interaction.delete_original_response()
+        except discord.NotFound:
+            pass
+        interaction.client.metrics.inc(f"commands.{_command_name(interaction)}.private_after_defer")
+    await interaction.followup.send(content, **kwargs)
+    interaction.extras["replied"] = True
+
+
+class NoMansTree(app_commands.CommandTree):
+    """Command tree that times every command and acknowledges slow ones in time"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Command name -> most recent run times, in seconds
+        self._durations: Dict[str, Deque[float]] = {}
+        # Command name -> p95 of those run times
+        self._p95: Dict[str, float] = {}
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        """Runs in the command's own task, right before its callback"""
+        self.client.watchdog.track(interaction)
+        if interaction.type is not discord.InteractionType.application_command:
+            return True
+
+        name = _command_name(interaction)
+        interaction.extras["started"] = time.monotonic()
+        if self._p95.get(name, 0.0) >= AUTO_DEFER_P95:
+            # Recently this command has been too slow to answer directly
+            if await defer_response(interaction):
+                self.client.metrics.inc(f"commands.{name}.auto_deferred")
+        else:
+            age = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+            delay = min(max(0.0, AUTO_DEFER_DEADLINE - age), AUTO_DEFER_DEADLINE)
+            interaction.extras["ack_timer"] = asyncio.get_running_loop().call_later(
+                delay, self._defer_late, interaction
+            )
+        return True
+
+    def _defer_late(self, interaction: discord.Interaction):
+        """Deadline timer: acknowledge for a command that hasn't answered yet"""
+        async def defer():
+            if await defer_response(interaction):
+                self.client.metrics.inc(f"commands.{_command_name(interaction)}.late_deferred")
+
+        interaction.extras["ack_task"] = asyncio.create_task(defer())
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        """Log the error and tell the user, unless the command already answered"""
+        await super().on_error(interaction, error)
+        if interaction.extras.get("replied"):
+            return
+        embed = discord.Embed(
+            title="❌ Command Error",
+            description="Something went wrong, cap'n! Check the logs.",
+            color=ERROR_COLOR
+        )
+        try:
+            await send_response(interaction, embed=embed, ephemeral=True)
+        except discord.HTTPException as e:
+            logger.warning(f"Could not report the error of /{_command_name(interaction)}: {e}")
+
+    async def _call(self, interaction: discord.Interaction):
+        try:
+            await super()._call(interaction)
+        finally:
+            self._finish(interaction)
+
+    def _finish(self, interaction: discord.Interaction):
+        """Stop the deadline timer and record how long the command ran"""
+        timer = interaction.extras.pop("ack_timer", None)
+        if timer is not None:
+            timer.cancel()
+        started = interaction.extras.get("started")
+        if started is None:
+            return
+
+        name = _command_name(interaction)
+        duration = time.monotonic() - started
+        self.client.metrics.observe(f"commands.{name}.seconds", duration)
+        durations = self._durations.get(name)
+        if durations is None:
+            durations = self._durations[name] = deque(maxlen=AUTO_DEFER_WINDOW)
+        durations.append(duration)
+        if len(durations) >= AUTO_DEFER_MIN_SAMPLES:
+            self._p95[name] = sorted(durations)[int(len(durations) * 0.95)]
@@ -19,6 +19,7 @@ DAILY_REWARD = 100  # Daily reward amount
 PASSIVE_COOLDOWN = 60  # 1 minute between passive earnings
 EARN_COMMAND_COOLDOWN = 300  # 5 minutes between /earn commands
 STEAL_COMMAND_COOLDOWN = 600  # 10 minutes between /steal commands
+SEARCH_COMMAND_COOLDOWN = 300  # 5 minutes between /search commands
 DAILY_COOLDOWN = 86400  # 24 hours between daily rewards
 
 # Steal Command Settings
@@ -27,8 +28,156 @@ CREW_STEAL_BONUS = 10  # +10% success if thief has crew role
 CREW_PROTECTION_BONUS = 10  # -10% success if victim has crew role
 MIN_STEAL_AMOUNT = 10  # Minimum coins needed to be stolen from
 MAX_STEAL_AMOUNT = 500  # Maximum coins that can be stolen in one attempt
+STEAL_MIN_SHARE = 0.05  # A successful steal takes at least 5% of the victim's balance
+STEAL_MAX_SHARE = 0.25  # ...and at most 25%
 STEAL_PENALTY_MIN = 5  # Minimum penalty for failed steal
 STEAL_PENALTY_MAX = 15  # Maximum penalty for failed steal
+MIN_STEAL_SUCCESS_CHANCE = 20  # Success chance never drops below 20%
+MAX_STEAL_SUCCESS_CHANCE = 60  # Success chance never rises above 60%
+
+# Search Command Settings
+SEARCH_COIN_CHANCE = 60  # Base 60% chance to find coins
+SEARCH_ITEM_CHANCE = 20  # Base 20% chance to find an item
+SEARCH_MIN_COINS = 15  # Fewest coins a successful search finds
+SEARCH_MAX_COINS = 45  # Most coins a successful search finds
+RUM_COOLDOWN_REDUCTION = 120  # Seconds a Rum takes off the search cooldown
 
 # Bot Settings
 BOT_PREFIX = "!"
+
+# Cluster Settings
+CLUSTER_SOCKET_PATH = "nomansbot-writer.sock"  # Unix socket owned by the database writer process
+CLUSTER_CACHE_TTL = 30  # Seconds worker processes cache crew roles and shop items
+CLUSTER_CONNECT_TIMEOUT = 30  # Seconds a worker keeps retrying the writer while it starts and migrates
+CLUSTER_MAX_REQUEST_BYTES = 256 * 1024 * 1024  # Largest single write a worker may send the writer (bulk grants)
+CLUSTER_WRITE_TIMEOUT = 120  # Seconds a worker waits for the writer to acknowledge a write
+
+# Database Connection Settings
+STORAGE_BACKEND = "sqlite"  # "sqlite" (durable) or "memory" (tests, benchmarks, event servers); env STORAGE_BACKEND overrides
+WRITE_BATCH_INTERVAL = 0.005  # Seconds the writer waits for a group to fill before committing
+WRITE_BATCH_SIZE = 256  # Maximum write operations committed in one group
+DB_READ_POOL_SIZE = 4  # Read-only connections serving read queries in parallel
+USER_LOCK_STRIPES = 1024  # Per-user lock stripes shared by all commands
+LEGACY_GUILD_ID = 0  # Guild that inherits balances and items from before economies were per guild; env LEGACY_GUILD_ID overrides (0 = not set, they wait in *_legacy tables)
+
+# Schema Migration Settings
+MIGRATION_CHUNK_ROWS = 5000  # Rows a background backfill moves per transaction
+MIGRATION_CHUNK_PAUSE = 0.01  # Seconds between backfill chunks
+QUERY_PLAN_CHECK = True  # Fail startup if a hot query would scan a whole table
+QUERY_PLAN_ANALYSIS_LIMIT = 1000  # Rows ANALYZE samples per index at startup (0 = read everything)
+QUERY_PLAN_MIN_ROWS = 10000  # Smaller tables may be scanned; the planner prefers it when they're tiny
+
+# Passive Earning Settings
+PASSIVE_MIN_MESSAGE_LENGTH = 3  # Shorter messages never earn passive coins
+PASSIVE_CHANNEL_ALLOWLIST = []  # Channel IDs that earn passive coins (empty = every channel)
+PASSIVE_MAX_TRACKED_USERS = 100000  # Cooldown entries kept before expired ones are pruned
+
+# Profiling Settings
+PROFILER_INTERVAL = 0.005  # Seconds between stack samples
+PROFILE_DIR = "profiles"  # Where /profile writes its collapsed stacks
+MAX_PROFILE_SECONDS = 120  # Longest profile /profile will run
+
+# Event Loop Watchdog Settings
+LOOP_LAG_INTERVAL = 0.1  # Seconds between event loop lag measurements
+LOOP_LAG_THRESHOLD = 0.25  # Seconds the loop may be blocked before its stack is captured
+
+# Interaction Response Settings
+AUTO_DEFER_P95 = 1.5  # Commands whose recent p95 run time reaches this many seconds are deferred up front
+AUTO_DEFER_DEADLINE = 2.0  # Seconds after an interaction is created that a silent command is deferred (Discord allows 3)
+AUTO_DEFER_WINDOW = 100  # Recent runs per command the p95 is taken over
+AUTO_DEFER_MIN_SAMPLES = 20  # Runs before a command's p95 is trusted
+
+# Admission Control Settings
+ADMISSION_ELEVATED_QUEUE_DEPTH = 512  # Queued writes before passive earnings are deferred
+ADMISSION_OVERLOADED_QUEUE_DEPTH = 2048  # Queued writes before read-only commands are served from cache
+ADMISSION_ELEVATED_LATENCY = 0.05  # Average commit seconds before passive earnings are deferred
+ADMISSION_OVERLOADED_LATENCY = 0.25  # Average commit seconds before read-only commands are served from cache
+ADMISSION_FLUSH_INTERVAL = 1.0  # Seconds between attempts to write deferred passive earnings
+PASSIVE_DEFER_MAX_USERS = 50000  # Users with deferred earnings before further earnings are sampled
+PASSIVE_SAMPLE_RATE = 0.1  # Share of passive earnings still written once deferral is full
+READ_CACHE_MAX_AGE = 60  # Oldest cached read served to read-only commands under load, in seconds
+READ_CACHE_MAX_ENTRIES = 10000  # Cached reads kept for load shedding
+
+# Loot Table Settings
+LOOT_TIER_DEFAULT = "landlubber"  # Loot tier for pirates without a crew
+LOOT_TIER_CREW = "crew"  # Loot tier for crew members
+
+# Item Effect Settings
+CONSUMABLE_USES = 10  # Searches an activated Compass or Spyglass lasts
+EFFECT_CACHE_SIZE = 50000  # Users whose compiled item modifiers are kept in memory
+EFFECT_CACHE_TTL = 30  # Seconds compiled modifiers are trusted (bounds staleness across clusters)
+
+# Render Cache Settings
+RENDER_CACHE_SIZE = 5000  # Rendered views (shop, leaderboards, crew rosters) kept in memory
+RENDER_CACHE_TTL = 30  # Seconds a rendered view is trusted (member names, other clusters' writes)
+
+# Image Card Settings
+CARD_WORKERS = 1  # Processes rendering /leaderboard and /rank image cards (0 disables cards)
+CARD_CACHE_SIZE = 500  # Rendered cards kept in memory
+CARD_CACHE_TTL = 30  # Seconds a rendered card is trusted (member names, other clusters' writes)
+CARD_RENDER_TIMEOUT = 10  # Seconds to wait for a card before giving up on it
+AVATAR_CACHE_DIR = "avatars"  # Directory for downloaded avatars
+AVATAR_CACHE_BYTES = 64 * 1024 * 1024  # Disk space for avatars before the least recently used are deleted
+AVATAR_SIZE = 128  # Pixels avatars are downloaded at
+AVATAR_MAX_BYTES = 512 * 1024  # Larger avatar downloads are not kept
+
+# API Settings
+API_HOST = "127.0.0.1"  # Address the read-only JSON API binds to (keep it local)
+API_PORT = 0  # Port for the JSON API; the API_PORT environment variable overrides it (0 disables the API)
+API_CACHE_SIZE = 10000  # Encoded API responses kept in memory
+API_CACHE_TTL = 30  # Seconds an API response is trusted (other clusters' writes)
+API_MAX_STALENESS = 2  # Seconds an API response is served after a write it doesn't show
+API_PAGE_SIZE = 25  # Default leaderboard and crew entries per page
+API_MAX_PAGE_SIZE = 100  # Most entries one page may ask for
+API_MAX_OFFSET = 10000  # Deepest leaderboard position pages may reach
+
+# HTTP Interactions Settings
+INTERACTIONS_HOST = "127.0.0.1"  # Address interaction workers bind to, behind the local load balancer or tunnel
+INTERACTIONS_PORT = 8090  # Port shared by all interaction workers; the INTERACTIONS_PORT environment variable overrides it
+INTERACTIONS_ANSWER_TIMEOUT = 2.5  # Seconds the endpoint waits for a command's first response before deferring
+INTERACTIONS_MAX_SKEW = 300  # Seconds a signed request's timestamp may be off (replay protection)
+INTERACTIONS_TOKEN_LIFETIME = 900  # Seconds a deferred interaction can still be answered by editing it
+INTERACTIONS_CREW_REFRESH = 60  # Seconds between crew index reloads in interaction workers
+INTERACTIONS_EFFECT_CACHE_TTL = 0  # Seconds interaction workers trust compiled modifiers; another worker may have changed the items (0 = always read)
+
+# Autocomplete Settings
+AUTOCOMPLETE_MAX_CHOICES = 25  # Suggestions per autocomplete response (Discord's limit)
+AUTOCOMPLETE_FUZZY_CUTOFF = 0.6  # Similarity (0-1) a misspelt item name needs to be suggested
+
+# Analytics Settings
+ANALYTICS_DIR = "snapshots"  # Directory for columnar economy snapshots
+ANALYTICS_KEEP_SNAPSHOTS = 3  # Snapshots kept before the oldest is deleted
+
+# Backup Settings
+BACKUP_DIR = "backups"  # Directory for online database backups
+BACKUP_KEEP = 7  # Backups kept before the oldest is deleted
+BACKUP_INTERVAL = 21600  # Seconds between scheduled backups (0 disables them)
+BACKUP_PAGES_PER_STEP = 256  # Database pages copied per backup step
+BACKUP_STEP_PAUSE = 0.005  # Seconds to pause between backup steps
+
+# Bulk Admin Settings
+MAX_GRANT_AMOUNT = 1000000  # Largest amount one admin grant can move per user
+BULK_QUERY_CHUNK = 500  # User IDs per IN (...) list when reading many users
+BULK_PROGRESS_INTERVAL = 2.0  # Seconds between progress updates on large bulk operations
+BULK_ID_FILE_MAX_BYTES = 8 * 1024 * 1024  # Largest ID list attachment accepted
+BULK_PREVIEW_USERS = 10  # Users listed in a bulk operation's preview
+
+# Economy Job Settings
+INTEREST_INTERVAL = 86400  # Seconds between interest payouts (0 disables them)
+INTEREST_RATE = 0.01  # Share of balance paid as interest each run
+INTEREST_MAX_PER_RUN = 500  # Most interest one pirate earns per run
+INTEREST_ACTIVE_DAYS = 7  # Only pirates active this recently earn interest
+DECAY_INTERVAL = 86400  # Seconds between idle decay runs (0 disables them)
+DECAY_RATE = 0.02  # Share of an idle hoard above the floor lost each run
+DECAY_MIN_BALANCE = 1000  # Balances at or below this never decay
+DECAY_IDLE_DAYS = 30  # Pirates idle this long start to decay
+EXPIRY_INTERVAL = 86400  # Seconds between item expiry runs (0 disables them)
+EXPIRY_IDLE_DAYS = 14  # Equipped weapons and active consumables expire after this long idle
+JOB_JITTER = 0.1  # Random delay added to each job run, as a share of its interval
+JOB_CHUNK_ROWS = 1000  # Users updated per chunk to start with
+JOB_MIN_CHUNK_ROWS = 100  # Smallest chunk when commits are slow
+JOB_MAX_CHUNK_ROWS = 20000  # Largest chunk when commits are fast
+JOB_CHUNK_TARGET = 0.005  # Average group commit seconds jobs aim to stay under
+JOB_CHUNK_PAUSE = 0.01  # Seconds between chunks
+JOB_BACKOFF = 1.0  # Seconds jobs wait while the database is under load
+JOB_RETRY_DELAY = 60  # Seconds before a failed job run resumes
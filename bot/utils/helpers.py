@@ -3,6 +3,7 @@ Helper functions for No Man's Bot
 """
 
 import discord
+from discord import app_commands
 from typing import List, Optional
 
 def get_user_crew(user: discord.Member, crew_role_ids: List[int]) -> Optional[str]:
@@ -21,6 +22,38 @@ def get_user_crew(user: discord.Member, crew_role_ids: List[int]) -> Optional[st
             return role.name
     return None
 
+def inventory_choices(bot, interaction: discord.Interaction, current: str,
+                      item_type: Optional[str] = None) -> List[app_commands.Choice[str]]:
+    """
+    Autocomplete choices from the items a user holds, without a database query
+    
+    Args:
+        bot: The bot, for its item catalogue and effect cache
+        interaction: The autocomplete interaction
+        current: What the user has typed so far
+        item_type: Only suggest items of this type
+    
+    Returns:
+        Matching held items with their quantities; catalogue items until the
+        user's inventory is cached
+    """
+    effects = bot.database.effects
+    inventory = effects.peek_inventory(interaction.guild_id, interaction.user.id)
+    if inventory is None:
+        # The next keystroke is answered from the user's inventory
+        effects.prefetch_inventory(interaction.guild_id, interaction.user.id)
+        names = bot.catalog.complete(current, bot.catalog.names(item_type))
+        return [app_commands.Choice(name=name, value=name) for name in names]
+    
+    held = [
+        name for name, quantity in inventory.items()
+        if quantity > 0 and (item_type is None or getattr(bot.catalog.get(name), "item_type", None) == item_type)
+    ]
+    return [
+        app_commands.Choice(name=f"{name} x{inventory[name]}", value=name)
+        for name in bot.catalog.complete(current, held)
+    ]
+
 def format_coins(amount: int) -> str:
     """
     Format coin amount with commas and doubloon emoji
@@ -0,0 +1,156 @@
+"""
+Sampling profiler for No Man's Bot
+
+A background thread periodically snapshots the event loop thread's stack,
+and the stacks of the loop's executor threads whenever they are busy, since
+SQLite reads and group commits run there via ``asyncio.to_thread``.
+Sampling only reads frames, so the bot keeps running at full speed while
+it is being profiled.
+"""
+
+import os
+import sys
+import time
+import inspect
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from bot.utils.constants import *
+
+# Threads of the event loop's default executor are named asyncio_0, asyncio_1, ...
+EXECUTOR_THREAD_PREFIX = "asyncio_"
+
+
+def _categorize(filename: str) -> str:
+    """Attribute a source file to a part of the bot"""
+    path = filename.replace(os.sep, "/")
+    if "/bot/commands/" in path:
+        return "cogs"
+    if path.endswith(("/bot/database.py", "/bot/read_pool.py", "/bot/writer.py")):
+        return "database"
+    if "/discord/" in path:
+        return "discord.py"
+    if "/asyncio/" in path or path.endswith("/selectors.py"):
+        return "event loop"
+    if "/bot/" in path or path.endswith("/main.py"):
+        return "bot"
+    return "other"
+
+
+def _area(stack: tuple) -> str:
+    """Charge a sample to the innermost frame that belongs to a known area"""
+    if stack[-1][1].endswith("Selector.select"):
+        return "idle"
+    for filename, _, _ in reversed(stack):
+        area = _categorize(filename)
+        if area != "other":
+            return area
+    return "other"
+
+
+def _stack(frame) -> tuple:
+    """A frame's call stack, outermost first, as (filename, qualname, is_coroutine)"""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_qualname, bool(code.co_flags & inspect.CO_COROUTINE)))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class SamplingProfiler:
+    """Samples one thread's stack, and its busy executor threads, at a fixed interval"""
+
+    def __init__(self, thread_id: int, interval: float = PROFILER_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        # Executor thread stacks, only while running work; several may be busy per sample
+        self.worker_stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at = 0.0
+        self.duration = 0.0
+
+    def start(self):
+        """Start sampling in a background thread"""
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling"""
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.time() - self.started_at
+
+    def _run(self):
+        """Sampling loop"""
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            frame = frames.get(self.thread_id)
+            if frame is None:
+                continue
+            self.stacks[_stack(frame)] += 1
+            self.samples += 1
+
+            for thread in threading.enumerate():
+                frame = frames.get(thread.ident)
+                if frame is None or not thread.name.startswith(EXECUTOR_THREAD_PREFIX):
+                    continue
+                stack = _stack(frame)
+                # An idle executor thread waits on its queue inside _worker itself
+                if stack[-1][1] != "_worker":
+                    self.worker_stacks[stack] += 1
+
+    def collapsed(self) -> List[str]:
+        """Stacks in collapsed format, one ``frame;frame;frame count`` per line"""
+        lines = []
+        for root, stacks in (("", self.stacks), ("[executor];", self.worker_stacks)):
+            for stack, count in stacks.most_common():
+                frames = ";".join(f"{os.path.basename(filename)}:{name}" for filename, name, _ in stack)
+                lines.append(f"{root}{frames} {count}")
+        return lines
+
+    def summary(self, top: int = 10) -> Dict[str, List[Tuple[str, int]]]:
+        """Top hot functions, coroutines and bot areas by sample count
+
+        ``worker_areas`` counts busy executor thread samples by area; several
+        threads can be busy at once, so they may add up to more than ``samples``.
+        """
+        functions: Counter = Counter()
+        coroutines: Counter = Counter()
+        areas: Counter = Counter()
+        worker_areas: Counter = Counter()
+
+        for stack, count in self.stacks.items():
+            filename, name, _ = stack[-1]
+            functions[f"{os.path.basename(filename)}:{name}"] += count
+
+            # Charge the sample to the innermost coroutine, e.g. a command callback
+            coroutine = next((frame for frame in reversed(stack) if frame[2]), None)
+            coroutines[f"{coroutine[1]}" if coroutine else "(no coroutine)"] += count
+
+            areas[_area(stack)] += count
+
+        for stack, count in self.worker_stacks.items():
+            worker_areas[_area(stack)] += count
+
+        return {
+            "functions": functions.most_common(top),
+            "coroutines": coroutines.most_common(top),
+            "areas": areas.most_common(),
+            "worker_areas": worker_areas.most_common(),
+        }
+
+    def write(self, directory: str = PROFILE_DIR) -> str:
+        """Write the collapsed stacks to a file and return its path"""
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        path = os.path.join(directory, f"profile-{stamp}.folded")
+        with open(path, "w") as f:
+            f.write("\n".join(self.collapsed()) + "\n")
+        return path
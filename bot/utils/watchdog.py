@@ -0,0 +1,100 @@
+"""
+Event loop watchdog for No Man's Bot
+
+A loop task measures how late its wakeups are and feeds the lag into the
+metrics. A companion thread notices when that task stops checking in; when
+the loop has been stuck for longer than the threshold it captures the stack
+of whatever is blocking it, along with the command being run.
+"""
+
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+import weakref
+from collections import deque
+from typing import Deque, Optional
+
+import discord
+
+from bot.utils.constants import *
+from bot.utils.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoopWatchdog:
+    """Measures event loop lag and reports blocking calls"""
+
+    def __init__(self, metrics: Metrics, interval: float = LOOP_LAG_INTERVAL,
+                 threshold: float = LOOP_LAG_THRESHOLD):
+        self.metrics = metrics
+        self.interval = interval
+        self.threshold = threshold
+        # Most recent stalls as (duration, command, stack)
+        self.recent_stalls: Deque[tuple] = deque(maxlen=20)
+        self._commands = weakref.WeakKeyDictionary()
+        self._heartbeat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id = 0
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start measuring; call from the event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._measure(), name="loop-watchdog")
+        self._thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop measuring"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    def track(self, interaction: discord.Interaction):
+        """Remember which command the current task is running"""
+        task = asyncio.current_task()
+        if task is not None and interaction.command is not None:
+            self._commands[task] = interaction.command.qualified_name
+
+    async def _measure(self):
+        """Sleep for a fixed interval and record how late each wakeup is"""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.metrics.observe("event_loop.lag_seconds", lag)
+            self._heartbeat = time.monotonic()
+
+    def _monitor(self):
+        """Watch the heartbeat from outside the loop and capture stalls"""
+        reported = False
+        while not self._stop.wait(self.interval):
+            stalled = time.monotonic() - self._heartbeat - self.interval
+            if stalled < self.threshold:
+                reported = False
+                continue
+            if reported:
+                continue
+            reported = True
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "(no frame)"
+            task = asyncio.current_task(self._loop)
+            command = self._commands.get(task) if task is not None else None
+
+            self.metrics.inc("event_loop.stalls")
+            self.recent_stalls.append((stalled, command, stack))
+            logger.warning(
+                f"Event loop blocked for at least {stalled * 1000:.0f} ms"
+                f" in {f'/{command}' if command else 'no command'}"
+                f" (task {task.get_name() if task else None}):\n{stack}"
+            )
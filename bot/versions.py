@@ -0,0 +1,36 @@
+"""
+Data version counters for No Man's Bot
+
+Storage bumps a counter for every topic a write touches, e.g. a guild's
+balances or its crews. Caches of derived data (rendered views) remember the
+versions they were built from and are stale as soon as one has moved on.
+Counters live in the process, so other cluster workers' writes only show up
+once a cache's TTL expires.
+"""
+
+from typing import Dict, Hashable, Tuple
+
+# Topics bumped by storage
+BALANCES = "balances"
+CREWS = "crews"
+
+
+class DataVersions:
+    """A counter per topic, plus an epoch that invalidates every topic at once"""
+
+    def __init__(self):
+        self._counters: Dict[Hashable, int] = {}
+        self._epoch = 0
+
+    def bump(self, *topics: Hashable):
+        """Record that data under these topics changed"""
+        for topic in topics:
+            self._counters[topic] = self._counters.get(topic, 0) + 1
+
+    def bump_all(self):
+        """Record that data under any topic may have changed, e.g. after a bulk job"""
+        self._epoch += 1
+
+    def snapshot(self, *topics: Hashable) -> Tuple[int, ...]:
+        """Current versions of some topics, to compare against later"""
+        return (self._epoch,) + tuple(self._counters.get(topic, 0) for topic in topics)
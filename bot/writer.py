@@ -0,0 +1,174 @@
+"""
+Group-commit writer for No Man's Bot
+
+A single actor owns the write connection. Callers queue write operations and
+the actor applies them in groups, one transaction per group, so many writes
+share a single fsync. Each caller's awaitable resolves only once the group
+holding its operation has committed.
+"""
+
+import time
+import asyncio
+import logging
+import sqlite3
+import contextvars
+from collections import deque
+from typing import Deque, List, Sequence, Tuple, Union
+
+from bot.utils.constants import *
+
+logger = logging.getLogger(__name__)
+
+# A list of parameter tuples runs the query once per tuple (executemany)
+Statement = Tuple[str, Union[tuple, List[tuple]]]
+
+# Set inside a task whose writes must not wait behind bulk traffic (e.g. /buy)
+urgent_writes = contextvars.ContextVar("urgent_writes", default=False)
+
+
+class WriteActor:
+    """Owns the write connection and commits queued operations in groups"""
+
+    def __init__(self, db_path: str, max_delay: float = WRITE_BATCH_INTERVAL,
+                 max_batch: int = WRITE_BATCH_SIZE):
+        self.db_path = db_path
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._conn = None
+        self._task = None
+        self._closing = False
+        self._ops: Deque[Tuple[Sequence[Statement], asyncio.Future]] = deque()
+        self._urgent: Deque[Tuple[Sequence[Statement], asyncio.Future]] = deque()
+        # Moving average of how long a group takes to commit, in seconds
+        self.commit_latency = 0.0
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of operations waiting for the next group"""
+        return len(self._ops) + len(self._urgent)
+
+    async def start(self):
+        """Open the write connection and start draining the queue"""
+        if self._task is not None:
+            return
+        # Transactions are managed explicitly, one per group
+        self._conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._task = asyncio.create_task(self._run(), name="database-writer")
+
+    async def close(self):
+        """Commit whatever is still queued and close the write connection"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        self._full.set()
+        await self._task
+        self._task = None
+        self._conn.close()
+        self._conn = None
+
+    async def submit(self, statements: Sequence[Statement]) -> List[int]:
+        """Queue statements to run atomically and wait until they are durable
+
+        Returns the row count of each statement.
+        """
+        if self._task is None or self._closing:
+            raise RuntimeError("WriteActor is not running")
+        future = asyncio.get_running_loop().create_future()
+        if urgent_writes.get():
+            # Urgent operations jump the queue and don't wait for the group to fill
+            self._urgent.append((statements, future))
+            self._full.set()
+        else:
+            self._ops.append((statements, future))
+        self._wakeup.set()
+        if self.queue_depth >= self.max_batch:
+            self._full.set()
+        return await future
+
+    def _take_batch(self) -> List[Tuple[Sequence[Statement], asyncio.Future]]:
+        """Pop up to one group's worth of operations, urgent ones first"""
+        batch = []
+        for queue in (self._urgent, self._ops):
+            while queue and len(batch) < self.max_batch:
+                batch.append(queue.popleft())
+        if not self._closing:
+            if self.queue_depth < self.max_batch and not self._urgent:
+                self._full.clear()
+            if not self.queue_depth:
+                self._wakeup.clear()
+        return batch
+
+    async def _run(self):
+        """Collect operations into groups and commit them"""
+        while True:
+            await self._wakeup.wait()
+            if self._closing and not self.queue_depth:
+                return
+
+            # Give the group a few milliseconds to fill up unless it already has
+            if not self._full.is_set() and self.max_delay > 0:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+
+            await self._commit(self._take_batch())
+
+    async def _commit(self, batch: List[Tuple[Sequence[Statement], asyncio.Future]]):
+        """Apply a group in a worker thread and resolve its futures"""
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            outcomes = await asyncio.to_thread(self._apply, [statements for statements, _ in batch])
+            elapsed = time.perf_counter() - started
+            self.commit_latency = 0.8 * self.commit_latency + 0.2 * elapsed
+        except Exception as e:
+            logger.error(f"Database error: group commit of {len(batch)} operation(s) failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), outcome in zip(batch, outcomes):
+            if future.done():
+                continue
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    def _apply(self, operations: List[Sequence[Statement]]) -> list:
+        """Run a group in one transaction, isolating each operation in a savepoint"""
+        conn = self._conn
+        outcomes = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statements in operations:
+                conn.execute("SAVEPOINT op")
+                try:
+                    outcomes.append([self._execute(conn, query, params) for query, params in statements])
+                    conn.execute("RELEASE op")
+                except sqlite3.Error as e:
+                    # Only this operation is undone, the rest of the group still commits
+                    conn.execute("ROLLBACK TO op")
+                    conn.execute("RELEASE op")
+                    logger.error(f"Database error: {e}")
+                    outcomes.append(e)
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return outcomes
+
+    @staticmethod
+    def _execute(conn: sqlite3.Connection, query: str, params) -> int:
+        """Run one statement and return its row count"""
+        if isinstance(params, list):
+            return conn.executemany(query, params).rowcount
+        return conn.execute(query, params).rowcount
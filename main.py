@@ -4,7 +4,22 @@ import discord
 from discord.ext import commands
 import logging
 
-from bot.database import Database
+from bot.admission import AdmissionController
+from bot.api import ApiServer
+from bot.backup import BackupManager
+from bot.cards import CardRenderer
+from bot.catalog import ItemCatalog
+from bot.cluster import run_cluster
+from bot.crew_index import CrewIndex
+from bot.interactions import InteractionServer
+from bot.jobs import JobScheduler
+from bot.loot import LootTables
+from bot.passive import PassiveFilter
+from bot.render import RenderCache
+from bot.repository import EconomyRepository, create_database
+from bot.tree import NoMansTree
+from bot.utils.metrics import Metrics
+from bot.utils.watchdog import LoopWatchdog
 from bot.commands.economy import EconomyCommands
 from bot.commands.admin import AdminCommands
 from bot.commands.leaderboard import LeaderboardCommands
@@ -16,24 +31,69 @@ from bot.utils.constants import *
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class NoMansBot(commands.Bot):
-    def __init__(self):
+class NoMansBot(commands.AutoShardedBot):
+    def __init__(self, database=None, shard_ids=None, shard_count=None, cluster_id=0, low_memory=None,
+                 http_interactions=False):
         intents = discord.Intents.default()
         intents.message_content = True
         intents.guilds = True
         intents.members = True
         
+        if low_memory is None:
+            low_memory = os.getenv('LOW_MEMORY_MODE', '').lower() in ('1', 'true', 'yes')
+        
+        # Low-memory mode keeps no members cached and never chunks whole guilds;
+        # crew membership comes from the crew index instead
+        cache_options = {}
+        if low_memory:
+            cache_options = {
+                'member_cache_flags': discord.MemberCacheFlags.none(),
+                'chunk_guilds_at_startup': False
+            }
+        
         super().__init__(
             command_prefix='!',
             intents=intents,
-            description="Ahoy! No Man's Bot - Your pirate economy companion!"
+            description="Ahoy! No Man's Bot - Your pirate economy companion!",
+            shard_ids=shard_ids,
+            shard_count=shard_count,
+            tree_cls=NoMansTree,
+            **cache_options
         )
         
-        self.database = Database()
+        self.database: EconomyRepository = database or create_database(os.getenv('STORAGE_BACKEND', STORAGE_BACKEND))
+        self.cluster_id = cluster_id
+        self.low_memory = low_memory
+        self.http_interactions = http_interactions
+        self.crew_index = CrewIndex(self)
+        self.crew_index.install()
+        self.passive_filter = PassiveFilter()
+        self.metrics = Metrics()
+        self.watchdog = LoopWatchdog(self.metrics)
+        self.admission = AdmissionController(self.database, self.metrics)
+        self.render = RenderCache(self.database.versions, self.metrics)
+        self.cards = CardRenderer(self.metrics)
+        self.api = ApiServer(self, port=int(os.getenv('API_PORT', API_PORT)))
+        self.interactions = InteractionServer(self, os.getenv('INTERACTIONS_PUBLIC_KEY', ''),
+                                              port=int(os.getenv('INTERACTIONS_PORT', INTERACTIONS_PORT)))
+        self.backups = BackupManager(self.database.db_path)
+        self.jobs = JobScheduler(self)
+        self.catalog = ItemCatalog()
+        self.loot_tables = LootTables()
+        self.loot_tables.load()
         
     async def setup_hook(self):
         """Called when the bot is starting up"""
+        self.watchdog.start()
         await self.database.initialize()
+        await self.crew_index.load()
+        self.catalog.load([
+            (name, item_type, price, crew_required, description)
+            for crew_required in (0, 1)
+            for name, item_type, price, description in await self.database.get_shop_items(crew_required)
+        ])
+        self.loot_tables.validate(self.catalog.names())
+        self.admission.start()
         
         # Add cogs
         await self.add_cog(EconomyCommands(self))
@@ -42,6 +102,20 @@ class NoMansBot(commands.Bot):
         await self.add_cog(InventoryCommands(self))
         await self.add_cog(ShopCommands(self))
         
+        # Interaction workers only serve commands; the gateway process does the rest
+        if self.http_interactions:
+            await self.interactions.start()
+            return
+        
+        # Only one cluster needs to sync slash commands, take backups and run jobs
+        if self.cluster_id != 0:
+            return
+        # Backups and jobs work on the SQLite file; the memory backend has none
+        if self.database.db_path:
+            self.backups.start()
+            self.jobs.start()
+        await self.api.start()
+        
         # Sync slash commands
         try:
             synced = await self.tree.sync()
@@ -49,10 +123,22 @@ class NoMansBot(commands.Bot):
         except Exception as e:
             logger.error(f"Failed to sync commands: {e}")
     
+    async def close(self):
+        """Flush pending database writes before disconnecting"""
+        self.watchdog.stop()
+        self.backups.stop()
+        self.jobs.stop()
+        self.cards.close()
+        await self.api.stop()
+        await self.interactions.stop()
+        await super().close()
+        await self.admission.close()
+        await self.database.close()
+    
     async def on_ready(self):
         """Called when the bot is ready"""
         logger.info(f'{self.user} has come aboard! ⚓')
-        logger.info(f'Bot is in {len(self.guilds)} guild(s)')
+        logger.info(f'Bot is in {len(self.guilds)} guild(s) across shard(s) {sorted(self.shards)}')
         
         # Set bot status
         activity = discord.Activity(
@@ -60,34 +146,32 @@ class NoMansBot(commands.Bot):
             name="the seven seas 🏴‍☠️"
         )
         await self.change_presence(activity=activity)
+        
+        # Bring the crew index up to date with anything missed while offline
+        for guild in self.guilds:
+            await self.crew_index.sync_guild(guild)
+    
+    async def on_raw_member_remove(self, payload):
+        """Drop members who leave from the crew index"""
+        self.crew_index.remove_member(payload.guild_id, payload.user.id)
     
     async def on_message(self, message):
         """Handle message events for passive coin earning"""
-        # Ignore bot messages
-        if message.author.bot:
+        # Cheap synchronous checks first (bots, DMs, channels, length, cooldown);
+        # most messages stop here without touching the database
+        if not self.passive_filter.admit(message):
             return
-            
-        # Only process messages in guilds
-        if not message.guild:
-            return
-            
-        # Process commands first
-        await self.process_commands(message)
         
         # Handle passive coin earning
         await self.handle_passive_earning(message)
     
     async def handle_passive_earning(self, message):
-        """Handle passive coin earning from messages"""
+        """Award passive coins for a message that passed the pre-filter"""
         user_id = message.author.id
         guild_id = message.guild.id
         
-        # Check rate limiting
-        if not await self.database.can_earn_passive(user_id):
-            return
-            
         # Determine if user is in a crew
-        crew_roles = await self.database.get_crew_roles(guild_id)
+        crew_roles = self.crew_index.get_crew_roles(guild_id)
         is_crew_member = False
         user_crew = None
         
@@ -104,9 +188,9 @@ class NoMansBot(commands.Bot):
         else:
             coins = base_coins
         
-        # Award coins
-        await self.database.add_coins(user_id, coins)
-        await self.database.update_passive_cooldown(user_id)
+        # Award coins, unless the database is behind and the award is deferred or shed
+        if self.admission.admit_passive(guild_id, user_id, coins):
+            await self.database.award_passive_coins(guild_id, user_id, coins)
         
         # Optional: Send a subtle notification (uncomment if desired)
         # if random.randint(1, 20) == 1:  # 5% chance
@@ -135,5 +219,30 @@ async def main():
     finally:
         await bot.close()
 
+def run():
+    """Run a single bot process, or a local cluster when CLUSTER_WORKERS or INTERACTIONS_WORKERS is set"""
+    workers = int(os.getenv('CLUSTER_WORKERS', '0'))
+    interaction_workers = int(os.getenv('INTERACTIONS_WORKERS', '0'))
+    if workers <= 0 and interaction_workers <= 0:
+        asyncio.run(main())
+        return
+    
+    token = os.getenv('DISCORD_TOKEN')
+    if not token:
+        logger.error("DISCORD_TOKEN environment variable not found!")
+        return
+    
+    if os.getenv('STORAGE_BACKEND', STORAGE_BACKEND) != "sqlite":
+        logger.error("Clustered deployments share one SQLite database; set STORAGE_BACKEND=sqlite")
+        return
+    
+    if interaction_workers > 0 and not os.getenv('INTERACTIONS_PUBLIC_KEY'):
+        logger.error("INTERACTIONS_PUBLIC_KEY (the application's public key) is needed to verify interactions")
+        return
+    
+    shard_count = int(os.getenv('SHARD_COUNT', '0')) or None
+    # With an interactions endpoint the gateway still earns passively, indexes crews and syncs commands
+    run_cluster(NoMansBot, token, max(workers, 1), shard_count, interaction_workers=interaction_workers)
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    run()
@@ -0,0 +1,28 @@
+import unittest
+
+from bot.catalog import ItemCatalog
+from bot.database import SHOP_ITEMS
+
+
+class ItemCatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.catalog = ItemCatalog()
+        self.catalog.load(SHOP_ITEMS)
+
+    def test_get_ignores_case_and_spacing(self):
+        self.assertEqual(self.catalog.get("  flintlock   PISTOL ").name, "Flintlock Pistol")
+
+    def test_get_rejects_prefixes(self):
+        self.assertIsNotNone(self.catalog.resolve("Cutl"))
+        self.assertIsNone(self.catalog.get("Cutl"))
+
+    def test_resolve_rejects_ambiguous_prefixes(self):
+        self.assertIsNone(self.catalog.resolve("Flintlock"))
+
+    def test_complete_suggests_prefix_and_word_matches(self):
+        self.assertEqual(set(self.catalog.complete("flint")), {"Flintlock Pistol", "Flintlock Musket"})
+        self.assertIn("Flintlock Musket", self.catalog.complete("musk"))
+
+
+if __name__ == "__main__":
+    unittest.main()
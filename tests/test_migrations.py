@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from bot.database import Database
+
+# The schema the shipped nomansbot.db still has, from before per-guild economies
+LEGACY_SCHEMA = """
+    CREATE TABLE users (
+        user_id INTEGER PRIMARY KEY,
+        balance INTEGER DEFAULT 0,
+        last_passive_earn INTEGER DEFAULT 0,
+        last_earn_command INTEGER DEFAULT 0,
+        total_earned INTEGER DEFAULT 0
+    );
+    CREATE TABLE crew_roles (
+        guild_id INTEGER,
+        role_id INTEGER,
+        role_name TEXT,
+        PRIMARY KEY (guild_id, role_id)
+    );
+    CREATE TABLE inventory (
+        user_id INTEGER,
+        item_name TEXT,
+        quantity INTEGER DEFAULT 0,
+        PRIMARY KEY (user_id, item_name)
+    );
+    INSERT INTO users (user_id, balance, total_earned) VALUES (1, 100, 150), (2, 50, 50);
+    INSERT INTO inventory VALUES (1, 'Compass', 2), (2, 'Rum', 1);
+"""
+
+
+class LegacyEconomyMigrationTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "legacy.db")
+        conn = sqlite3.connect(self.path)
+        conn.executescript(LEGACY_SCHEMA)
+        conn.close()
+
+    async def start(self, legacy_guild_id=None) -> Database:
+        """Open the database and wait for its backfills"""
+        environ = {} if legacy_guild_id is None else {"LEGACY_GUILD_ID": str(legacy_guild_id)}
+        with mock.patch.dict(os.environ, environ):
+            if legacy_guild_id is None:
+                os.environ.pop("LEGACY_GUILD_ID", None)
+            database = Database(self.path)
+            await database.initialize()
+            if database._migration is not None:
+                await database._migration
+        self.addAsyncCleanup(database.close)
+        return database
+
+    def query(self, sql: str) -> list:
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def backfilled(self) -> bool:
+        return self.query("SELECT backfilled_at FROM schema_version WHERE version = 3")[0][0] is not None
+
+    async def test_unset_guild_keeps_legacy_rows(self):
+        with self.assertLogs("bot.migrations", "ERROR") as logs:
+            await self.start()
+
+        self.assertIn("LEGACY_GUILD_ID", logs.output[0])
+        self.assertEqual(self.query("SELECT user_id, balance FROM users_legacy ORDER BY user_id"), [(1, 100), (2, 50)])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM inventory_legacy"), [(2,)])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM users"), [(0,)])
+        self.assertFalse(self.backfilled())
+
+    async def test_drains_once_guild_is_set(self):
+        with self.assertLogs("bot.migrations", "ERROR"):
+            database = await self.start()
+        # Played in the legacy guild before the operator set it
+        await database.add_coins(42, 1, 10)
+        await database.close()
+
+        database = await self.start(legacy_guild_id=42)
+
+        self.assertEqual(await database.get_user_stats(42, 1), (110, 160))
+        self.assertEqual(await database.get_user_stats(42, 2), (50, 50))
+        self.assertEqual(sorted(await database.get_user_inventory(42, 1)), [("Compass", 2)])
+        self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE name LIKE '%_legacy'"), [])
+        self.assertTrue(self.backfilled())
+
+    async def test_close_stops_backfill_and_reopen_resumes(self):
+        with mock.patch.dict(os.environ, {"LEGACY_GUILD_ID": "42"}):
+            database = Database(self.path)
+            await database.initialize()
+            await database.close()
+        self.assertIsNone(database._migration)
+
+        database = await self.start(legacy_guild_id=42)
+
+        self.assertEqual(await database.get_user_stats(42, 1), (100, 150))
+        self.assertTrue(self.backfilled())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from types import SimpleNamespace
+
+from bot.passive import PassiveFilter
+
+
+def message(guild_id: int, user_id: int):
+    return SimpleNamespace(
+        author=SimpleNamespace(id=user_id, bot=False),
+        guild=SimpleNamespace(id=guild_id),
+        channel=SimpleNamespace(id=1),
+        content="x" * 50,
+    )
+
+
+class PassiveFilterTest(unittest.TestCase):
+    def test_cooldown_is_per_guild(self):
+        passive = PassiveFilter(cooldown=60, min_length=1)
+        self.assertTrue(passive.admit(message(1, 7)))
+        self.assertFalse(passive.admit(message(1, 7)))
+        self.assertTrue(passive.admit(message(2, 7)))
+
+    def test_prune_keeps_running_cooldowns(self):
+        passive = PassiveFilter(cooldown=60, min_length=1, max_tracked=1)
+        self.assertTrue(passive.admit(message(1, 7)))
+        self.assertTrue(passive.admit(message(2, 7)))
+        self.assertFalse(passive.admit(message(1, 7)))
+        self.assertFalse(passive.admit(message(2, 7)))
+
+
+if __name__ == "__main__":
+    unittest.main()
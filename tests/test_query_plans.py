@@ -0,0 +1,46 @@
+import sqlite3
+import unittest
+
+from bot import migrations
+
+
+class QueryPlanCheckTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", isolation_level=None)
+        self.addCleanup(self.conn.close)
+        self.conn.executescript("""
+            CREATE TABLE ships (guild_id INTEGER, ship_id INTEGER, name TEXT, PRIMARY KEY (guild_id, ship_id));
+            CREATE TABLE logs (ship_id INTEGER, entry TEXT);
+        """)
+        self.conn.executemany("INSERT INTO ships VALUES (1, ?, 'Sloop')", [(i,) for i in range(200)])
+        self.conn.executemany("INSERT INTO logs VALUES (?, 'Ahoy')", [(i,) for i in range(200)])
+
+    def check(self, query: str, params: tuple):
+        migrations.check_query_plans(self.conn, [("query", query, params)], min_rows=100)
+
+    def test_indexed_query_passes(self):
+        self.check("SELECT s.name FROM ships s WHERE s.guild_id = ? AND s.ship_id = ?", (1, 1))
+
+    def test_unindexed_query_fails(self):
+        with self.assertRaisesRegex(RuntimeError, "logs"):
+            self.check("SELECT entry FROM logs WHERE ship_id = ?", (1,))
+
+    def test_unindexed_aliased_query_fails(self):
+        with self.assertRaisesRegex(RuntimeError, "~200 rows"):
+            self.check("""SELECT l.entry FROM ships AS s JOIN logs l ON l.ship_id = s.ship_id
+                          WHERE s.guild_id = ? AND s.ship_id = ?""", (1, 1))
+
+    def test_small_tables_may_be_scanned(self):
+        migrations.check_query_plans(self.conn, [("query", "SELECT entry FROM logs WHERE ship_id = ?", (1,))],
+                                     min_rows=1000)
+
+    def test_hot_queries_pass_on_full_schema(self):
+        migrations.migrate(self.conn)
+        # Spread over guilds, as in production; in a single guild, scanning is the right plan
+        self.conn.executemany("INSERT INTO users (guild_id, user_id, balance) VALUES (?, ?, ?)",
+                              [(i % 20, i, i) for i in range(200)])
+        migrations.check_query_plans(self.conn, min_rows=100)
+
+
+if __name__ == "__main__":
+    unittest.main()
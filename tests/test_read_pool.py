@@ -0,0 +1,43 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from bot.read_pool import ReadPool
+
+
+class ReadPoolTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "reads.db")
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute("CREATE TABLE numbers (n INTEGER)")
+            conn.executemany("INSERT INTO numbers VALUES (?)", [(i,) for i in range(100000)])
+        conn.close()
+        self.pool = ReadPool(path, size=2)
+        await self.pool.start()
+
+    async def test_close_waits_for_running_reads(self):
+        read = asyncio.create_task(self.pool.fetch("SELECT n FROM numbers ORDER BY n DESC"))
+        await asyncio.sleep(0)
+        await self.pool.close()
+        self.assertEqual(len(await read), 100000)
+
+    async def test_cancelled_read_keeps_its_connection_until_done(self):
+        read = asyncio.create_task(self.pool.fetch("SELECT n FROM numbers ORDER BY n DESC"))
+        await asyncio.sleep(0)
+        read.cancel()
+        await self.pool.close()
+        self.assertTrue(read.cancelled())
+
+    async def test_refuses_reads_once_closing(self):
+        await self.pool.close()
+        with self.assertRaises(RuntimeError):
+            await self.pool.fetch("SELECT 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
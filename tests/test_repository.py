@@ -0,0 +1,181 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from bot.database import Database
+from bot.jobs import JobScheduler, default_jobs
+from bot.memory_database import MemoryDatabase
+from bot.repository import EconomyRepository
+from bot.utils.metrics import Metrics
+
+GUILD = 1
+OTHER_GUILD = 2
+
+
+class RepositoryParity:
+    """The same operations and expectations, run against each backend"""
+
+    async def make_database(self) -> EconomyRepository:
+        raise NotImplementedError
+
+    async def asyncSetUp(self):
+        self.database = await self.make_database()
+        self.addAsyncCleanup(self.database.close)
+
+    async def test_implements_repository(self):
+        self.assertIsInstance(self.database, EconomyRepository)
+
+    async def test_balances(self):
+        db = self.database
+        self.assertEqual(await db.get_user_balance(GUILD, 10), 0)
+        self.assertEqual(await db.get_user_stats(GUILD, 10), (0, 0))
+
+        await db.add_coins(GUILD, 10, 100)
+        await db.add_coins(GUILD, 10, 25)
+        await db.add_coins(GUILD, 11, 5)
+        await db.award_passive_coins(GUILD, 11, 3)
+        await db.award_passive_coins_bulk([(GUILD, 11, 2), (OTHER_GUILD, 10, 7)])
+
+        self.assertEqual(tuple(await db.get_user_stats(GUILD, 10)), (125, 125))
+        self.assertEqual(tuple(await db.get_user_stats(GUILD, 11)), (10, 10))
+        self.assertEqual(await db.get_balances(GUILD, [10, 11, 12]), {10: 125, 11: 10})
+        self.assertEqual(await db.get_user_balance(OTHER_GUILD, 10), 7)
+        self.assertEqual(tuple(await db.get_economy_totals(GUILD)), (2, 135, 135))
+
+    async def test_transfer(self):
+        db = self.database
+        await db.add_coins(GUILD, 10, 100)
+        await db.add_coins(OTHER_GUILD, 10, 100)
+
+        await db.transfer_coins(GUILD, 10, 11, 40)
+
+        self.assertEqual(tuple(await db.get_user_stats(GUILD, 10)), (60, 100))
+        # Received coins aren't earned
+        self.assertEqual(tuple(await db.get_user_stats(GUILD, 11)), (40, 0))
+        self.assertEqual(await db.get_user_balance(OTHER_GUILD, 10), 100)
+        self.assertEqual(await db.get_user_balance(OTHER_GUILD, 11), 0)
+
+    async def test_inventory(self):
+        db = self.database
+        await db.add_to_inventory(GUILD, 10, "Compass", 2)
+        await db.add_to_inventory(GUILD, 10, "Rum")
+        await db.add_to_inventory(OTHER_GUILD, 10, "Cannon")
+        await db.remove_from_inventory(GUILD, 10, "Compass")
+        await db.remove_from_inventory(GUILD, 10, "Rum")
+
+        self.assertEqual(sorted(await db.get_user_inventory(GUILD, 10)), [("Compass", 1)])
+        self.assertEqual(sorted(await db.get_user_inventory(OTHER_GUILD, 10)), [("Cannon", 1)])
+        self.assertEqual(await db.effects.get_inventory(GUILD, 10), {"Compass": 1})
+
+        await db.set_active_consumable(GUILD, 10, "Compass", 10)
+        await db.set_active_weapon(GUILD, 10, "Cutlass")
+        await db.reduce_consumable_durability(GUILD, 10, "Compass")
+        self.assertEqual(tuple(await db.get_user_effects(GUILD, 10)), (1, 0, 9, 0, "Cutlass"))
+        self.assertEqual(tuple(await db.get_user_effects(OTHER_GUILD, 10)), (0, 0, 0, 0, None))
+
+    async def test_spending_is_checked_by_the_write(self):
+        db = self.database
+        await db.add_coins(GUILD, 10, 100)
+        await db.add_to_inventory(GUILD, 10, "Rum", 2)
+
+        # As if another process spent the coins and items after they were checked
+        self.assertFalse(await db.transfer_coins(GUILD, 10, 11, 101))
+        self.assertFalse(await db.buy_item(GUILD, 10, "Compass", 1, 101))
+        self.assertFalse(await db.sell_item(GUILD, 10, "Rum", 3, 30))
+        self.assertFalse(await db.remove_from_inventory(GUILD, 10, "Rum", 3))
+        self.assertEqual(await db.get_balances(GUILD, [10, 11]), {10: 100, 11: 0})
+        self.assertEqual(sorted(await db.get_user_inventory(GUILD, 10)), [("Rum", 2)])
+
+        self.assertTrue(await db.buy_item(GUILD, 10, "Compass", 2, 60))
+        self.assertTrue(await db.sell_item(GUILD, 10, "Rum", 2, 20))
+        self.assertTrue(await db.transfer_coins(GUILD, 10, 11, 60))
+        self.assertTrue(await db.remove_from_inventory(GUILD, 10, "Compass", 1))
+        self.assertEqual(await db.get_balances(GUILD, [10, 11]), {10: 0, 11: 60})
+        self.assertEqual(sorted(await db.get_user_inventory(GUILD, 10)), [("Compass", 1)])
+        self.assertEqual(await db.effects.get_inventory(GUILD, 10), {"Compass": 1})
+
+    async def test_bulk_adjust(self):
+        db = self.database
+        await db.add_coins(GUILD, 10, 100)
+
+        await db.adjust_balances(GUILD, [10, 11, 12], "grant", 50)
+        self.assertEqual(await db.get_balances(GUILD, [10, 11, 12]), {10: 150, 11: 50, 12: 50})
+        self.assertEqual(tuple(await db.get_user_stats(GUILD, 11)), (50, 50))
+
+        # Deductions stop at zero
+        await db.adjust_balances(GUILD, [10, 11], "deduct", 80)
+        self.assertEqual(await db.get_balances(GUILD, [10, 11, 12]), {10: 70, 11: 0, 12: 50})
+
+        await db.adjust_balances(GUILD, [12, 13], "set", 7)
+        self.assertEqual(await db.get_balances(GUILD, [10, 11, 12, 13]), {10: 70, 11: 0, 12: 7, 13: 7})
+        self.assertEqual(await db.get_balances(OTHER_GUILD, [10, 11, 12, 13]), {})
+
+    async def test_leaderboard_and_rank(self):
+        db = self.database
+        for user_id, amount in ((10, 300), (11, 200), (12, 100)):
+            await db.add_coins(GUILD, user_id, amount)
+        await db.update_steal_cooldown(GUILD, 13)
+        await db.add_coins(OTHER_GUILD, 14, 1000)
+
+        self.assertEqual([tuple(row) for row in await db.get_leaderboard(GUILD, limit=2)],
+                         [(10, 300, 300), (11, 200, 200)])
+        self.assertEqual([tuple(row) for row in await db.get_leaderboard(GUILD, limit=2, offset=1)],
+                         [(11, 200, 200), (12, 100, 100)])
+        self.assertEqual(await db.get_user_rank(GUILD, 12), 3)
+        # No coins, no rank
+        self.assertIsNone(await db.get_user_rank(GUILD, 13))
+        self.assertIsNone(await db.get_user_rank(GUILD, 14))
+        self.assertEqual(await db.get_user_rank(OTHER_GUILD, 14), 1)
+
+    async def test_jobs(self):
+        await self.run_jobs()
+
+
+class SQLiteRepositoryTest(RepositoryParity, unittest.IsolatedAsyncioTestCase):
+    async def make_database(self) -> Database:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "economy.db")
+        database = Database(self.path)
+        await database.initialize()
+        # A fresh file still runs the pre-guild backfill; let it finish first
+        if database._migration is not None:
+            await database._migration
+        return database
+
+    async def run_jobs(self):
+        db = self.database
+        await db.add_coins(GUILD, 10, 10000)
+        await db.add_coins(GUILD, 11, 2000)
+        await db.set_active_weapon(GUILD, 11, "Cutlass")
+        await db.add_coins(OTHER_GUILD, 11, 2000)
+        # Guild 1's user 11 hasn't done anything for a year
+        conn = sqlite3.connect(self.path)
+        with conn:
+            conn.execute("UPDATE users SET last_active = 0 WHERE guild_id = ? AND user_id = 11", (GUILD,))
+        conn.close()
+
+        scheduler = JobScheduler(SimpleNamespace(database=db, metrics=Metrics()))
+        for job in default_jobs():
+            await scheduler.run(job)
+
+        # Interest for the active, decay above the floor and expiry for the idle
+        self.assertEqual(await db.get_balances(GUILD, [10, 11]), {10: 10100, 11: 1980})
+        self.assertEqual(await db.get_user_balance(OTHER_GUILD, 11), 2020)
+        self.assertEqual(tuple(await db.get_user_effects(GUILD, 11)), (0, 0, 0, 0, None))
+
+
+class MemoryRepositoryTest(RepositoryParity, unittest.IsolatedAsyncioTestCase):
+    async def make_database(self) -> MemoryDatabase:
+        database = MemoryDatabase()
+        await database.initialize()
+        return database
+
+    async def run_jobs(self):
+        self.skipTest("economy jobs update the SQLite file and don't run on the memory backend")
+
+
+if __name__ == "__main__":
+    unittest.main()
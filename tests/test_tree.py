@@ -0,0 +1,60 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from bot.tree import defer_response, send_response
+from bot.utils.metrics import Metrics
+
+
+def interaction():
+    deferred = {"done": False}
+
+    async def defer(**kwargs):
+        deferred["done"] = True
+
+    return SimpleNamespace(
+        extras={},
+        command=SimpleNamespace(qualified_name="buy"),
+        client=SimpleNamespace(metrics=Metrics()),
+        response=SimpleNamespace(is_done=lambda: deferred["done"], defer=mock.AsyncMock(side_effect=defer),
+                                 send_message=mock.AsyncMock()),
+        followup=SimpleNamespace(send=mock.AsyncMock()),
+        delete_original_response=mock.AsyncMock(),
+    )
+
+
+class SendResponseTest(unittest.IsolatedAsyncioTestCase):
+    async def test_ephemeral_reply_after_public_defer_stays_private(self):
+        it = interaction()
+        await defer_response(it)
+        await send_response(it, "Not enough doubloons", ephemeral=True)
+
+        it.delete_original_response.assert_awaited_once()
+        it.followup.send.assert_awaited_once_with("Not enough doubloons", ephemeral=True)
+
+    async def test_public_reply_after_public_defer_replaces_thinking(self):
+        it = interaction()
+        await defer_response(it)
+        await send_response(it, "Bought")
+
+        it.delete_original_response.assert_not_awaited()
+        it.followup.send.assert_awaited_once_with("Bought")
+
+    async def test_ephemeral_reply_after_ephemeral_defer(self):
+        it = interaction()
+        await defer_response(it, ephemeral=True)
+        await send_response(it, "Not enough doubloons", ephemeral=True)
+
+        it.delete_original_response.assert_not_awaited()
+
+    async def test_later_ephemeral_followup_keeps_first_reply(self):
+        it = interaction()
+        await defer_response(it)
+        await send_response(it, "Bought")
+        await send_response(it, "Psst", ephemeral=True)
+
+        it.delete_original_response.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()